@@ -1,12 +1,15 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Extractors and the Firebase exporter are imported lazily (see registry.py), so PyInstaller
+# can't find them by following imports from main.py
+hiddenimports = ['document', 'photo', 'pngfile', 'video', 'database']
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
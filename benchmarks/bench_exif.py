@@ -0,0 +1,62 @@
+"""
+Compare the header-only EXIF reader with the exifread path used before it.
+
+    python benchmarks/bench_exif.py PHOTO_DIR [--repeat 5]
+
+Both paths are timed through PhotoMetadata.read_tags on every JPEG found, and
+per-file latency statistics are printed for each.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from photo import PhotoMetadata  # noqa: E402
+from scanner import scan_paths  # noqa: E402
+from source import FileSource  # noqa: E402
+
+
+def time_path(file_paths: list, fast: bool, repeat: int) -> list:
+    # Return the per-file latency in milliseconds, taking the best of `repeat` runs
+    latencies = []
+    for file_path in file_paths:
+        extractor = PhotoMetadata(file_path, fast=fast)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with FileSource(file_path) as source:
+                extractor.read_tags(source)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best)
+    return latencies
+
+
+def summarize(name: str, latencies: list):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<10} files={len(ordered)} mean={statistics.mean(ordered):.3f}ms "
+          f"median={statistics.median(ordered):.3f}ms p95={p95:.3f}ms total={sum(ordered):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='JPEG files or directories containing them')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per file; the fastest is kept')
+    args = parser.parse_args()
+
+    file_paths = list(scan_paths(args.paths, {'.jpg', '.jpeg'}))
+    if not file_paths:
+        parser.error("No JPEG files found")
+    exifread_latencies = time_path(file_paths, False, args.repeat)
+    fast_latencies = time_path(file_paths, True, args.repeat)
+    summarize('exifread', exifread_latencies)
+    summarize('fast', fast_latencies)
+    print(f"speedup: {sum(exifread_latencies) / max(sum(fast_latencies), 1e-9):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Time the Firebase export against a local stand-in for the Realtime Database REST API.
+
+    python benchmarks/bench_export.py [--files 2000] [--fields 30] [--fail-rate 0.1]
+
+A small HTTP server applies the multi-path PATCH requests the Firebase SDK sends
+when FIREBASE_DATABASE_EMULATOR_HOST points at it, failing a fraction of them
+with 503 to exercise the retries. Synthetic metadata for --files files is
+exported through Database.export_metadata. The script reports requests, bytes
+and wall time, and checks that the stored tree matches what was sent.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInDatabase:
+    """In-memory JSON tree that applies REST PATCH bodies the way the Realtime Database does"""
+
+    def __init__(self, fail_rate: float):
+        self.tree = {}
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+        self.bytes = 0
+        self.largest = 0
+        self.lock = threading.Lock()
+
+    def patch(self, path: str, body: dict):
+        with self.lock:
+            node = self.tree
+            for segment in filter(None, path.split('/')):
+                node = node.setdefault(segment, {})
+            # Each key of a PATCH body is a path relative to the target; only those children are replaced
+            for key, value in body.items():
+                *parents, leaf = key.split('/')
+                child = node
+                for segment in parents:
+                    child = child.setdefault(segment, {})
+                child[leaf] = value
+
+
+def make_handler(database: StandInDatabase):
+    class Handler(BaseHTTPRequestHandler):
+        def do_PATCH(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            with database.lock:
+                database.requests += 1
+                database.bytes += len(body)
+                database.largest = max(database.largest, len(body))
+                fail = random.random() < database.fail_rate
+                if fail:
+                    database.failures += 1
+            if fail:
+                self.send_response(503)
+                self.end_headers()
+                return
+            path = unquote(urlsplit(self.path).path)
+            database.patch(path[:-len('.json')] if path.endswith('.json') else path, json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def synthetic_results(files: int, fields: int) -> dict:
+    # Metadata shaped like the extractors' output: mostly short strings, some numbers
+    results = {}
+    for index in range(files):
+        metadata = {'File Size': f"{random.randint(10, 9000)} KB", 'Page Count': random.randint(1, 400)}
+        for field in range(fields - len(metadata)):
+            metadata[f"Field {field}"] = f"value {index}.{field} " + 'x' * random.randint(0, 60)
+        results[f"/data/file_{index:06d}.pdf"] = metadata
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000, help='Number of synthetic files to export')
+    parser.add_argument('--fields', type=int, default=30, help='Metadata fields per file')
+    parser.add_argument('--fail-rate', type=float, default=0.1, help='Fraction of requests answered with 503')
+    parser.add_argument('--max-payload', type=int, default=512 * 1024, help='Database.max_payload_bytes')
+    parser.add_argument('--workers', type=int, default=4, help='Database.max_workers')
+    args = parser.parse_args()
+    random.seed(1)
+
+    stand_in = StandInDatabase(args.fail_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(stand_in))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['FIREBASE_DATABASE_EMULATOR_HOST'] = f"127.0.0.1:{server.server_address[1]}"
+
+    from database import Database, firebase_key  # noqa: E402
+    database = Database(max_payload_bytes=args.max_payload, max_workers=args.workers, backoff=0.05)
+    results = synthetic_results(args.files, args.fields)
+    exported = []
+
+    start = time.perf_counter()
+    failed = database.export_metadata(results, on_exported=exported.append)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stored = stand_in.tree.get('Metadata Analysis', {})
+    expected = {firebase_key(os.path.basename(path)): {firebase_key(key): value for key, value in metadata.items()}
+                for path, metadata in results.items()}
+    print(f"files={args.files} exported={len(exported)} failed={len(failed)} time={elapsed:.2f}s "
+          f"({args.files / elapsed:.0f} files/s)")
+    print(f"requests={stand_in.requests} (503s={stand_in.failures}) bytes={stand_in.bytes / 1024:.0f}KB "
+          f"largest={stand_in.largest / 1024:.0f}KB limit={args.max_payload / 1024:.0f}KB")
+    print(f"stored tree matches: {stored == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Measure build time and query latency of the in-memory metadata index.
+
+    python benchmarks/bench_index.py [--files 1000000] [--repeat 200]
+
+Synthetic photo and PDF results with realistic tag cardinalities are added to
+a MetadataIndex one file at a time. Each query is then timed `repeat` times,
+and the median and p95 latencies are printed along with the number of hits.
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import MetadataIndex, Query  # noqa: E402
+
+QUERIES = [
+    'Camera Model = ILCE-7M3',
+    'Extension = pdf AND Author = Author 42',
+    'Camera Make = Can*',
+    'ISO >= 3200 AND ISO <= 6400 AND Camera Model = Model 7',
+    'Page Count > 990',
+    'Title = Report 12345*',
+]
+
+
+def synthetic_results(files: int):
+    # Mostly photos, some PDFs, with a few high-cardinality fields like a real library
+    makes = ['Canon', 'Nikon', 'Sony', 'Fujifilm', 'Apple', 'Google']
+    for index in range(files):
+        if index % 4:
+            yield f"/photos/{index // 1000:04d}/IMG_{index:07d}.jpg", {
+                'File Size': f"{random.randint(500, 12000) / 100:.2f} MB",
+                'Camera Make': random.choice(makes),
+                'Camera Model': 'ILCE-7M3' if index % 997 == 0 else f"Model {random.randint(0, 300)}",
+                'ISO': random.choice([100, 200, 400, 800, 1600, 3200, 6400, 12800]),
+                'Date and Time': f"2023:{index % 12 + 1:02d}:{index % 28 + 1:02d} 12:{index % 60:02d}:00",
+                'Resolution': random.choice(['6000 x 4000', '4032 x 3024', '8256 x 5504']),
+            }
+        else:
+            yield f"/documents/{index // 1000:04d}/doc_{index:07d}.pdf", {
+                'Author': f"Author {random.randint(0, 5000)}",
+                'Title': f"Report {index}",
+                'Page Count': random.randint(1, 1000),
+                'Producer': random.choice(['Acrobat', 'LibreOffice', 'pdfTeX']),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000000, help='Number of synthetic results to index')
+    parser.add_argument('--repeat', type=int, default=200, help='Timed runs per query')
+    args = parser.parse_args()
+    random.seed(1)
+
+    index = MetadataIndex()
+    start = time.perf_counter()
+    for file_path, metadata in synthetic_results(args.files):
+        index.add(file_path, metadata)
+    build = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"indexed {len(index)} files in {build:.1f}s ({len(index) / build:.0f} files/s), peak RSS {rss:.0f}MB")
+
+    for text in QUERIES:
+        query = Query(text)
+        # The first run pays for sorting new values and numbers; report it separately
+        start = time.perf_counter()
+        hits = len(index.search_ids(query))
+        first = (time.perf_counter() - start) * 1000
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            index.search_ids(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{text:<58} hits={hits:<7} first={first:8.3f}ms "
+              f"median={statistics.median(latencies):.3f}ms p95={p95:.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Measure cold-start import time of the GUI and CLI entry modules.
+
+    python benchmarks/bench_startup.py [--module gui] [--repeat 5] [--top 15]
+
+Each run starts a fresh interpreter with `python -X importtime -c "import MODULE"`
+and parses the per-module timings it prints to stderr. The median total and
+the slowest modules (by cumulative time) are reported, along with any of the
+heavy optional dependencies that got imported at startup.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load once a file actually needs them
+HEAVY_MODULES = ('pikepdf', 'openpyxl', 'docx', 'pptx', 'pymediainfo', 'exifread', 'firebase_admin')
+
+
+def import_times(module: str) -> dict:
+    # Return {module name: cumulative microseconds} for one fresh interpreter
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='gui', help='Module to import (gui for the desktop app, metaxtractor for the CLI)')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to start; the median is reported')
+    parser.add_argument('--top', type=int, default=15, help='How many of the slowest modules to list')
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    totals = [run[args.module] / 1000 for run in runs]
+    print(f"import {args.module}: median={statistics.median(totals):.1f}ms "
+          f"min={min(totals):.1f}ms max={max(totals):.1f}ms runs={len(totals)}")
+
+    last = runs[-1]
+    print("\nslowest modules (cumulative, last run):")
+    for name, cumulative in sorted(last.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+    loaded = sorted(name for name in HEAVY_MODULES if name in last)
+    print(f"\nheavy dependencies imported at startup: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
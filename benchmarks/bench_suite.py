@@ -0,0 +1,345 @@
+"""
+Run the extraction benchmarks on a generated corpus and write the results as JSON.
+
+    python benchmarks/bench_suite.py [--corpus DIR] [--count 20] [--scale 1] [--output results.json]
+                                     [--concurrency 1,2,4,8] [--backends thread,process,hybrid]
+                                     [--database] [--compare BASELINE.json] [--threshold 0.1]
+
+The corpus is made by corpus.py (in a temporary directory unless --corpus
+names one; an existing corpus with a manifest.json is reused as is). Then:
+
+  latency      every file is parsed `repeat` times in the calling thread through
+               parse_file with the extractor for its type, after one warm-up pass
+               that pays for imports; p50/p90/p99 and mean per type, plus files/s
+               and MB/s of a single worker
+  concurrency  MetadataExtractor.extract_metadata over the whole corpus with the
+               cache disabled, for each backend and worker count; the median of
+               `repeat` runs as files/s and MB/s
+  end_to_end   extract_metadata with default settings and an empty cache, then
+               again with that cache warm
+  database     (--database) Database.build_updates, and export_metadata against
+               the local stand-in from bench_export.py
+
+MB/s counts the full size of the files processed even though most extractors
+only read headers, so it is comparable between runs rather than a disk figure.
+Peak RSS (this process and its children) is recorded after each stage. With
+--compare, per-metric ratios against an earlier results file are printed and
+the exit status is 1 if any got worse than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import metadata  # noqa: E402
+from cache import MetadataCache  # noqa: E402
+from corpus import TYPES, generate_corpus  # noqa: E402
+from metadata import MetadataExtractor, parse_file  # noqa: E402
+from registry import registry  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+# Metrics compared by --compare: (section, key, metric, True if higher is better)
+COMPARED_METRICS = (
+    ('latency', None, 'p50_ms', False),
+    ('latency', None, 'p90_ms', False),
+    ('concurrency', None, 'files_per_second', True),
+    ('end_to_end', None, 'files_per_second', True),
+    ('database', None, 'files_per_second', True),
+)
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    unit = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+def load_corpus(args) -> list:
+    # Reuse a corpus that already has a manifest, otherwise generate one
+    manifest_path = os.path.join(args.corpus, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        types = set(args.types)
+        return [entry for entry in manifest['files'] if entry['type'] in types]
+    start = time.perf_counter()
+    manifest = generate_corpus(args.corpus, args.count, args.scale, args.seed, args.types)
+    print(f"generated {len(manifest)} files in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return manifest
+
+
+def bench_latency(files: list, repeat: int) -> dict:
+    """Per-type latency of parse_file in the calling thread"""
+    by_type = {}
+    for entry in files:
+        by_type.setdefault(entry['type'], []).append(entry)
+    results = {}
+    for file_type, entries in by_type.items():
+        extractor = registry.for_extension('.' + file_type)
+        # The first file pays for importing the extractor and its libraries; report it on its own
+        start = time.perf_counter()
+        parse_file(extractor, entries[0]['path'])
+        first_call = (time.perf_counter() - start) * 1000
+        for entry in entries[1:]:
+            parse_file(extractor, entry['path'])
+
+        latencies, errors = [], 0
+        for _ in range(repeat):
+            for entry in entries:
+                start = time.perf_counter()
+                _, result = parse_file(extractor, entry['path'])
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += 'error' in result
+        ordered = sorted(latencies)
+        total_seconds = sum(ordered) / 1000
+        total_bytes = sum(entry['size'] for entry in entries) * repeat
+        results[file_type] = {
+            'extractor': extractor.__name__ if extractor is not None else None,
+            'files': len(entries),
+            'samples': len(ordered),
+            'errors': errors // repeat,
+            'first_call_ms': round(first_call, 3),
+            'mean_ms': round(statistics.mean(ordered), 4),
+            'p50_ms': round(percentile(ordered, 0.50), 4),
+            'p90_ms': round(percentile(ordered, 0.90), 4),
+            'p99_ms': round(percentile(ordered, 0.99), 4),
+            'max_ms': round(ordered[-1], 4),
+            'files_per_second': round(len(ordered) / total_seconds, 1),
+            'mb_per_second': round(total_bytes / 1024 ** 2 / total_seconds, 1),
+        }
+        print(f"latency {file_type:<5} p50={results[file_type]['p50_ms']:.3f}ms "
+              f"p90={results[file_type]['p90_ms']:.3f}ms p99={results[file_type]['p99_ms']:.3f}ms "
+              f"errors={results[file_type]['errors']}", file=sys.stderr)
+    return results
+
+
+def _extract_all(paths: list, **options) -> tuple:
+    # Wall time and error count of one extract_metadata call over every path
+    with MetadataExtractor(paths, **options) as extractor:
+        start = time.perf_counter()
+        results = extractor.extract_metadata()
+        elapsed = time.perf_counter() - start
+    return elapsed, sum('error' in result for result in results.values()), results
+
+
+def _rates(files: int, total_bytes: int, elapsed: float) -> dict:
+    return {
+        'seconds': round(elapsed, 4),
+        'files_per_second': round(files / elapsed, 1),
+        'mb_per_second': round(total_bytes / 1024 ** 2 / elapsed, 1),
+    }
+
+
+def bench_concurrency(files: list, backends: list, worker_counts: list, repeat: int) -> list:
+    """Throughput of extract_metadata per backend and worker count, cache disabled"""
+    paths = [entry['path'] for entry in files]
+    total_bytes = sum(entry['size'] for entry in files)
+    results = []
+    for backend in backends:
+        for workers in worker_counts:
+            # The process pool is sized when it is created, so start a new one for each worker count
+            metadata._discard_process_pool()
+            _extract_all(paths, cache=False, backend=backend, max_workers=workers)  # warm up pools and imports
+            runs = [_extract_all(paths, cache=False, backend=backend, max_workers=workers) for _ in range(repeat)]
+            elapsed = statistics.median(elapsed for elapsed, _, _ in runs)
+            entry = {'key': f"{backend}/{workers}", 'backend': backend, 'workers': workers,
+                     'errors': runs[0][1], **_rates(len(paths), total_bytes, elapsed)}
+            results.append(entry)
+            print(f"concurrency {entry['key']:<10} {entry['files_per_second']:>9.1f} files/s "
+                  f"{entry['mb_per_second']:>8.1f} MB/s", file=sys.stderr)
+    metadata._discard_process_pool()
+    return results
+
+
+def bench_end_to_end(files: list) -> tuple:
+    """Default extract_metadata with a new cache, cold and then warm; also returns the results"""
+    paths = [entry['path'] for entry in files]
+    total_bytes = sum(entry['size'] for entry in files)
+    results = {}
+    extracted = None
+    with tempfile.TemporaryDirectory() as directory:
+        cache = MetadataCache(os.path.join(directory, 'cache.sqlite3'))
+        for state in ('cold', 'warm'):
+            elapsed, errors, extracted = _extract_all(paths, cache=cache)
+            results[state] = {'key': state, 'errors': errors, **_rates(len(paths), total_bytes, elapsed)}
+            print(f"end_to_end {state:<5} {results[state]['files_per_second']:>9.1f} files/s", file=sys.stderr)
+        cache.close()
+    return list(results.values()), extracted
+
+
+def bench_database(extracted: dict, repeat: int) -> list:
+    """Database.build_updates alone, and export_metadata against the local stand-in server"""
+    from http.server import ThreadingHTTPServer
+    from bench_export import StandInDatabase, make_handler
+
+    stand_in = StandInDatabase(fail_rate=0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(stand_in))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['FIREBASE_DATABASE_EMULATOR_HOST'] = f"127.0.0.1:{server.server_address[1]}"
+    from database import Database
+    database = Database()
+    results = []
+    try:
+        # Every run overwrites the same keys, so repeated exports send identical requests
+        for key, run in (('build_updates', lambda: sum(1 for _ in database.build_updates(extracted))),
+                         ('export_metadata', lambda: database.export_metadata(extracted))):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            elapsed = statistics.median(timings)
+            results.append({'key': key, 'seconds': round(elapsed, 4),
+                            'files_per_second': round(len(extracted) / elapsed, 1)})
+            print(f"database {key:<15} {results[-1]['files_per_second']:>9.1f} files/s", file=sys.stderr)
+    finally:
+        server.shutdown()
+    results.append({'key': 'requests', 'requests': stand_in.requests, 'bytes': stand_in.bytes})
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def _metrics(report: dict) -> dict:
+    # {(section, entry key, metric): (value, higher is better)} for the comparable metrics of a report
+    metrics = {}
+    for section, _, metric, higher in COMPARED_METRICS:
+        entries = report.get(section) or {}
+        items = entries.items() if isinstance(entries, dict) else ((entry.get('key'), entry) for entry in entries)
+        for key, entry in items:
+            if isinstance(entry.get(metric), (int, float)):
+                metrics[(section, key, metric)] = (entry[metric], higher)
+    return metrics
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Print the change of every metric present in both reports and return the regressions"""
+    current, previous = _metrics(report), _metrics(baseline)
+    for section in ('corpus', 'config'):
+        if report.get(section) != baseline.get(section):
+            print(f"warning: the baseline was run with a different {section}; throughput is not comparable",
+                  file=sys.stderr)
+    regressions = []
+    for name in sorted(current.keys() & previous.keys(), key=str):
+        (value, higher), (old, _) = current[name], previous[name]
+        if not old or not value:
+            continue
+        # Ratio > 1 means better, whichever way the metric points
+        ratio = value / old if higher else old / value
+        flag = 'REGRESSION' if ratio < 1 - threshold else ('improved' if ratio > 1 + threshold else '')
+        print(f"{'/'.join(map(str, name)):<50} {old:>12.4g} -> {value:<12.4g} {ratio:6.2f}x {flag}",
+              file=sys.stderr)
+        if flag == 'REGRESSION':
+            regressions.append({'metric': '/'.join(map(str, name)), 'baseline': old, 'current': value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', help='Corpus directory to reuse or generate into (default: a temporary one)')
+    parser.add_argument('--count', type=int, default=20, help='Files of each type when generating')
+    parser.add_argument('--scale', type=float, default=1.0, help='Content size multiplier when generating')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--types', default=','.join(TYPES), help='Comma-separated subset of ' + ', '.join(TYPES))
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs of each measurement')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='Comma-separated worker counts')
+    parser.add_argument('--backends', default='thread,hybrid', help='Comma-separated execution backends')
+    parser.add_argument('--database', action='store_true', help='Also time Database exports against a local stand-in')
+    parser.add_argument('-o', '--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown reported as a regression')
+    args = parser.parse_args()
+    args.types = [file_type.strip() for file_type in args.types.split(',') if file_type.strip()]
+    unknown = set(args.types) - set(TYPES)
+    if unknown:
+        parser.error(f"Unknown types: {', '.join(sorted(unknown))}")
+    worker_counts = [int(count) for count in args.concurrency.split(',') if count.strip()]
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    for backend in backends:
+        if backend not in MetadataExtractor.BACKENDS:
+            parser.error(f"Unknown backend: {backend}")
+
+    temporary = None
+    if args.corpus is None:
+        temporary = tempfile.TemporaryDirectory(prefix='metaxtractor-corpus-')
+        args.corpus = temporary.name
+    try:
+        files = load_corpus(args)
+        if not files:
+            parser.error("The corpus has no files of the selected types")
+        report = {
+            'schema': SCHEMA_VERSION,
+            'environment': environment(),
+            'config': {'count': args.count, 'scale': args.scale, 'seed': args.seed, 'types': args.types,
+                       'repeat': args.repeat, 'concurrency': worker_counts, 'backends': backends},
+            'corpus': {file_type: {'files': sum(entry['type'] == file_type for entry in files),
+                                   'bytes': sum(entry['size'] for entry in files if entry['type'] == file_type)}
+                       for file_type in args.types},
+            'peak_rss_mb': {},
+        }
+        report['latency'] = bench_latency(files, args.repeat)
+        report['peak_rss_mb']['latency'] = peak_rss_mb()
+        report['concurrency'] = bench_concurrency(files, backends, worker_counts, args.repeat)
+        report['peak_rss_mb']['concurrency'] = peak_rss_mb()
+        report['end_to_end'], extracted = bench_end_to_end(files)
+        report['peak_rss_mb']['end_to_end'] = peak_rss_mb()
+        if args.database:
+            report['database'] = bench_database(extracted, args.repeat)
+            report['peak_rss_mb']['database'] = peak_rss_mb()
+    finally:
+        if temporary is not None:
+            temporary.cleanup()
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    text = json.dumps(report, indent=1)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
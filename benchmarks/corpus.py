@@ -0,0 +1,344 @@
+"""
+Generate a deterministic corpus of files for the benchmarks.
+
+    python benchmarks/corpus.py OUT_DIR [--count 20] [--scale 1] [--seed 1] [--types jpg,pdf,...]
+
+Writes `count` files of each type into OUT_DIR/<type>/ along with a
+manifest.json listing every file, its type and size. The same seed, count and
+scale always produce byte-identical files, so results from different runs and
+machines can be compared. `scale` grows the content of each file: image
+dimensions, document paragraphs, spreadsheet rows, slides, PDF pages and the
+media payload of MP4/MKV files.
+
+Types: jpg (EXIF with camera, exposure and GPS tags), png (text chunks), docx,
+xlsx, pptx, pdf, mp4 and mkv. JPEG/PNG need Pillow and the Office formats
+python-docx, openpyxl and python-pptx, the same packages the extractors use;
+PDF, MP4 and MKV files are written directly.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import struct
+import zipfile
+from datetime import datetime
+
+TYPES = ('jpg', 'png', 'docx', 'xlsx', 'pptx', 'pdf', 'mp4', 'mkv')
+
+# Fixed timestamp for document properties and zip entries so output doesn't depend on the clock
+FIXED_TIME = datetime(2023, 6, 1, 12, 0, 0)
+MODIFIED_PATTERN = re.compile(rb'(<dcterms:modified[^>]*>)[^<]*(</dcterms:modified>)')
+
+MAKES = {
+    'Canon': ['Canon EOS R5', 'Canon EOS 5D Mark IV'],
+    'NIKON CORPORATION': ['NIKON Z 6_2', 'NIKON D850'],
+    'SONY': ['ILCE-7M3', 'ILCE-7RM4'],
+    'Apple': ['iPhone 14 Pro', 'iPhone 15'],
+}
+WORDS = ('metadata', 'archive', 'report', 'quarterly', 'survey', 'camera', 'ingest', 'budget', 'review', 'draft')
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _normalize_zip(path: str):
+    # Rewrite an OOXML package with fixed entry timestamps so it is byte-for-byte reproducible
+    with zipfile.ZipFile(path) as source:
+        entries = [(info.filename, source.read(info)) for info in source.infolist()]
+    # openpyxl stamps the save time as the modification date whatever the properties say
+    stamp = FIXED_TIME.strftime('%Y-%m-%dT%H:%M:%SZ').encode()
+    entries = [(name, MODIFIED_PATTERN.sub(rb'\g<1>' + stamp + rb'\g<2>', data) if name == 'docProps/core.xml' else data)
+               for name, data in entries]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, FIXED_TIME.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            target.writestr(info, data)
+
+
+def _rational(value: float, denominator: int = 10000):
+    from PIL.TiffImagePlugin import IFDRational
+    return IFDRational(round(value * denominator), denominator)
+
+
+def _degrees(value: float) -> tuple:
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = (value - degrees - minutes / 60) * 3600
+    return _rational(degrees, 1), _rational(minutes, 1), _rational(seconds, 100)
+
+
+def _image(rng: random.Random, scale: float, mode: str = 'RGB'):
+    # Seeded low-resolution noise scaled up smoothly compresses like a photo rather than like flat colour
+    from PIL import Image
+    width, height = int(640 * scale ** 0.5), int(480 * scale ** 0.5)
+    tile = (max(1, width // 8), max(1, height // 8))
+    image = Image.frombytes('RGB', tile, rng.randbytes(tile[0] * tile[1] * 3)).resize((width, height), Image.BILINEAR)
+    return image.convert(mode) if mode != 'RGB' else image
+
+
+def make_jpg(path: str, rng: random.Random, scale: float, index: int):
+    image = _image(rng, scale)
+    exif = image.getexif()
+    make = rng.choice(sorted(MAKES))
+    exif[0x010F] = make
+    exif[0x0110] = rng.choice(MAKES[make])
+    exif[0x0131] = 'MetaXtractor corpus'
+    exif[0x0132] = f"2023:{index % 12 + 1:02d}:{index % 28 + 1:02d} 10:{index % 60:02d}:00"
+    details = exif.get_ifd(0x8769)
+    details[0x8827] = rng.choice([100, 200, 400, 800, 1600, 3200, 6400])
+    details[0x829A] = _rational(1 / rng.choice([60, 125, 250, 500, 1000]), 100000)
+    details[0x829D] = _rational(rng.choice([1.8, 2.8, 4.0, 5.6, 8.0]), 10)
+    details[0x920A] = _rational(rng.choice([24, 35, 50, 85, 200]), 1)
+    details[0x9003] = exif[0x0132]
+    details[0xA002], details[0xA003] = image.size
+    gps = exif.get_ifd(0x8825)
+    latitude, longitude = rng.uniform(-60, 70), rng.uniform(-180, 180)
+    gps[1], gps[2] = ('N' if latitude >= 0 else 'S'), _degrees(latitude)
+    gps[3], gps[4] = ('E' if longitude >= 0 else 'W'), _degrees(longitude)
+    gps[5], gps[6] = 0, _rational(rng.uniform(0, 2500), 10)
+    image.save(path, 'JPEG', quality=85, exif=exif)
+
+
+def make_png(path: str, rng: random.Random, scale: float, index: int):
+    from PIL.PngImagePlugin import PngInfo
+    info = PngInfo()
+    info.add_text('Author', f"Author {rng.randint(1, 50)}")
+    info.add_text('Title', f"Image {index}")
+    info.add_text('Description', _sentence(rng, 12))
+    info.add_text('Software', 'MetaXtractor corpus')
+    _image(rng, scale, rng.choice(['RGB', 'RGBA', 'L'])).save(path, 'PNG', pnginfo=info)
+
+
+def make_docx(path: str, rng: random.Random, scale: float, index: int):
+    import docx
+    document = docx.Document()
+    properties = document.core_properties
+    properties.author = f"Author {rng.randint(1, 50)}"
+    properties.title = f"Report {index}"
+    properties.subject = rng.choice(WORDS)
+    properties.created = properties.modified = properties.last_printed = FIXED_TIME
+    properties.revision = rng.randint(1, 20)
+    for section in range(max(1, int(10 * scale))):
+        document.add_heading(_sentence(rng, 4), level=1)
+        for _ in range(5):
+            document.add_paragraph(_sentence(rng, rng.randint(10, 40)))
+    document.save(path)
+    _normalize_zip(path)
+
+
+def make_xlsx(path: str, rng: random.Random, scale: float, index: int):
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    workbook.properties.creator = f"Author {rng.randint(1, 50)}"
+    workbook.properties.title = f"Sheet {index}"
+    workbook.properties.created = workbook.properties.modified = FIXED_TIME
+    for sheet_index in range(3):
+        sheet = workbook.active if sheet_index == 0 else workbook.create_sheet()
+        sheet.title = f"Data {sheet_index + 1}"
+        for row in range(max(1, int(200 * scale))):
+            sheet.append([row, rng.choice(WORDS), rng.random() * 1000, rng.randint(0, 10 ** 6)])
+    workbook.save(path)
+    _normalize_zip(path)
+
+
+def make_pptx(path: str, rng: random.Random, scale: float, index: int):
+    import pptx
+    presentation = pptx.Presentation()
+    properties = presentation.core_properties
+    properties.author = f"Author {rng.randint(1, 50)}"
+    properties.title = f"Deck {index}"
+    properties.created = properties.modified = properties.last_printed = FIXED_TIME
+    properties.revision = rng.randint(1, 20)
+    for _ in range(max(1, int(10 * scale))):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = _sentence(rng, 4)
+        slide.placeholders[1].text = '\n'.join(_sentence(rng, 8) for _ in range(4))
+    presentation.save(path)
+    _normalize_zip(path)
+
+
+def make_pdf(path: str, rng: random.Random, scale: float, index: int):
+    # A classic PDF with an Info dictionary and a cross-reference table, one text stream per page
+    pages = max(1, int(10 * scale))
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for page in range(pages):
+        lines = ''.join(f"({_sentence(rng, 8)}) Tj T* " for _ in range(30))
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td {lines}ET".encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        kids.append(len(objects) + 1)
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> '
+                       b'/Contents %d 0 R >>' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), pages)
+    info = (f"<< /Title (Report {index}) /Author (Author {rng.randint(1, 50)}) /Subject ({rng.choice(WORDS)}) "
+            f"/Producer (MetaXtractor corpus) /Creator (corpus.py) /CreationDate (D:20230601120000Z) "
+            f"/ModDate (D:20230601120000Z) >>").encode()
+    objects.append(info)
+    output = io.BytesIO()
+    output.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    output.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                 % (len(objects) + 1, len(objects), xref))
+    with open(path, 'wb') as f:
+        f.write(output.getvalue())
+
+
+def _box(kind: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def _full_box(kind: bytes, payload: bytes) -> bytes:
+    return _box(kind, b'\0\0\0\0' + payload)
+
+
+AVC_SPS = b'\x67\x64\x00\x28' + b'\xaa' * 10
+AVC_PPS = b'\x68\xee\x3c\x80'
+
+
+def make_mp4(path: str, rng: random.Random, scale: float, index: int):
+    # moov (movie header, an H.264 and an AAC track, QuickTime keys/ilst metadata) followed by the media data
+    timescale, duration = 1000, rng.randint(5000, 600000)
+    width, height = rng.choice([(1920, 1080), (3840, 2160), (1280, 720)])
+    created = 3786825600 + index * 3600  # seconds since 1904
+    mvhd = _full_box(b'mvhd', struct.pack('>IIII', created, created, timescale, duration) + struct.pack('>I', 0x10000)
+                     + b'\x01\x00' + b'\0' * 10 + b'\0' * 36 + b'\0' * 24 + struct.pack('>I', 3))
+
+    def track(track_id, handler, sample_entry, media_timescale, samples, track_width=0, track_height=0):
+        tkhd = _full_box(b'tkhd', struct.pack('>IIIII', created, created, track_id, 0, duration) + b'\0' * 16
+                         + b'\0' * 36 + struct.pack('>II', track_width << 16, track_height << 16))
+        mdhd = _full_box(b'mdhd', struct.pack('>IIII', created, created, media_timescale,
+                                              duration * media_timescale // timescale) + b'\x55\xc4\0\0')
+        hdlr = _full_box(b'hdlr', b'\0' * 4 + handler + b'\0' * 12 + b'corpus\0')
+        stsd = _full_box(b'stsd', struct.pack('>I', 1) + sample_entry)
+        stts = _full_box(b'stts', struct.pack('>III', 1, samples, media_timescale // 30 if handler == b'vide' else 1024))
+        stsz = _full_box(b'stsz', struct.pack('>II', 16, samples))
+        return _box(b'trak', tkhd + _box(b'mdia', mdhd + hdlr + _box(b'minf', _box(b'stbl', stsd + stts + stsz))))
+
+    avcc = _box(b'avcC', bytes([1, 100, 0, 40, 0xff, 0xe1]) + struct.pack('>H', len(AVC_SPS)) + AVC_SPS + b'\x01'
+                + struct.pack('>H', len(AVC_PPS)) + AVC_PPS + bytes([0xfd, 0xf8, 0xf8, 0]))
+    visual = (b'\0' * 6 + b'\0\x01' + b'\0' * 16 + struct.pack('>HH', width, height)
+              + struct.pack('>II', 0x480000, 0x480000) + b'\0' * 4 + b'\0\x01' + b'\0' * 32 + b'\0\x18\xff\xff' + avcc)
+    video = track(1, b'vide', _box(b'avc1', visual), 30000, duration * 30 // timescale, width, height)
+    esds = _full_box(b'esds', bytes([3, 0x19, 0, 1, 0, 4, 0x11, 0x40, 0x15, 0, 0, 0, 0, 2, 0xee, 0, 0, 1, 0xf4, 0x00,
+                                     5, 2, 0x12, 0x10, 6, 1, 2]))
+    audio_entry = b'\0' * 6 + b'\0\x01' + b'\0' * 8 + struct.pack('>HHHHI', 2, 16, 0, 0, 48000 << 16) + esds
+    audio = track(2, b'soun', _box(b'mp4a', audio_entry), 48000, duration * 48 // 1024)
+    latitude, longitude = rng.uniform(-60, 70), rng.uniform(-180, 180)
+    keys = [b'com.apple.quicktime.make', b'com.apple.quicktime.model', b'com.apple.quicktime.software',
+            b'com.apple.quicktime.location.ISO6709']
+    values = [b'Apple', rng.choice(MAKES['Apple']).encode(), b'17.1', f"{latitude:+09.4f}{longitude:+010.4f}/".encode()]
+    key_box = _full_box(b'keys', struct.pack('>I', len(keys))
+                        + b''.join(struct.pack('>I', 8 + len(key)) + b'mdta' + key for key in keys))
+    item_list = _box(b'ilst', b''.join(_box(struct.pack('>I', number + 1), _box(b'data', struct.pack('>II', 1, 0) + value))
+                                       for number, value in enumerate(values)))
+    meta = _box(b'meta', _box(b'hdlr', b'\0' * 8 + b'mdta' + b'\0' * 13) + key_box + item_list)
+    moov = _box(b'moov', mvhd + video + audio + meta)
+    ftyp = _box(b'ftyp', b'isom\0\0\x02\0isomiso2avc1mp41')
+    with open(path, 'wb') as f:
+        f.write(ftyp + moov)
+        f.write(_box(b'mdat', rng.randbytes(int(256 * 1024 * scale))))
+
+
+def _vint(value: int, length: int = None) -> bytes:
+    length = length or next(size for size in range(1, 9) if value < (1 << (7 * size)) - 1)
+    return ((1 << (7 * length)) | value).to_bytes(length, 'big')
+
+
+def _element(element_id: int, payload: bytes, size_length: int = None) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + _vint(len(payload), size_length) + payload
+
+
+def _uint(element_id: int, value: int) -> bytes:
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+
+def _text(element_id: int, value: str) -> bytes:
+    return _element(element_id, value.encode())
+
+
+def make_mkv(path: str, rng: random.Random, scale: float, index: int):
+    # EBML header, then a Segment with SeekHead, Info, Tracks and a cluster of media data
+    width, height = rng.choice([(1920, 1080), (3840, 2160), (1280, 720)])
+    ebml = _element(0x1A45DFA3, _text(0x4282, 'matroska') + _uint(0x4287, 4) + _uint(0x4285, 2))
+    info = _element(0x1549A966, _uint(0x2AD7B1, 1000000) + _element(0x4489, struct.pack('>d', rng.randint(5000, 600000)))
+                    + _element(0x4461, struct.pack('>q', (700000000 + index * 3600) * 10 ** 9))
+                    + _text(0x7BA9, f"Clip {index}") + _text(0x4D80, 'libebml v1.4.4 + libmatroska v1.7.1')
+                    + _text(0x5741, 'mkvmerge v80.0'))
+    avcc = (bytes([1, 100, 0, 41, 0xff, 0xe1]) + struct.pack('>H', len(AVC_SPS)) + AVC_SPS + b'\x01'
+            + struct.pack('>H', len(AVC_PPS)) + AVC_PPS + bytes([0xfd, 0xf8, 0xf8, 0]))
+    video = _element(0xAE, _uint(0xD7, 1) + _uint(0x83, 1) + _text(0x86, 'V_MPEG4/ISO/AVC') + _element(0x63A2, avcc)
+                     + _uint(0x23E383, 41708333) + _element(0xE0, _uint(0xB0, width) + _uint(0xBA, height)))
+    audio = _element(0xAE, _uint(0xD7, 2) + _uint(0x83, 2) + _text(0x86, 'A_AAC') + _element(0x63A2, b'\x11\x90')
+                     + _element(0xE1, _element(0xB5, struct.pack('>d', 48000.0)) + _uint(0x9F, 2)))
+    tracks = _element(0x1654AE6B, video + audio)
+    cluster = _element(0x1F43B675, _uint(0xE7, 0) + _element(0xA3, b'\x81\x00\x00\x80'
+                                                                + rng.randbytes(int(256 * 1024 * scale))))
+
+    def seek_head(info_position, tracks_position):
+        def seek(element_id, position):
+            return _element(0x4DBB, _element(0x53AB, element_id.to_bytes(4, 'big'))
+                            + _element(0x53AC, position.to_bytes(8, 'big')))
+        return _element(0x114D9B74, seek(0x1549A966, info_position) + seek(0x1654AE6B, tracks_position))
+
+    info_position = len(seek_head(0, 0))
+    body = seek_head(info_position, info_position + len(info)) + info + tracks + cluster
+    with open(path, 'wb') as f:
+        f.write(ebml + _element(0x18538067, body, 8))
+
+
+MAKERS = {
+    'jpg': make_jpg, 'png': make_png, 'docx': make_docx, 'xlsx': make_xlsx,
+    'pptx': make_pptx, 'pdf': make_pdf, 'mp4': make_mp4, 'mkv': make_mkv,
+}
+
+
+def generate_corpus(out_dir: str, count: int = 20, scale: float = 1.0, seed: int = 1, types=TYPES) -> list:
+    """
+    Write `count` files of each type under out_dir and return the manifest:
+    a list of {"path", "type", "size"} dicts, also saved as out_dir/manifest.json
+    """
+    manifest = []
+    for file_type in types:
+        directory = os.path.join(out_dir, file_type)
+        os.makedirs(directory, exist_ok=True)
+        # One generator per type so adding a type or changing a count doesn't shift the others
+        rng = random.Random(f"{seed}:{file_type}:{scale}")
+        for index in range(count):
+            path = os.path.join(directory, f"{file_type}_{index:05d}.{file_type}")
+            MAKERS[file_type](path, rng, scale, index)
+            manifest.append({'path': path, 'type': file_type, 'size': os.path.getsize(path)})
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'seed': seed, 'count': count, 'scale': scale, 'files': manifest}, f, indent=1)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir', help='Directory to write the corpus into')
+    parser.add_argument('--count', type=int, default=20, help='Files of each type')
+    parser.add_argument('--scale', type=float, default=1.0, help='Content size multiplier')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--types', default=','.join(TYPES), help='Comma-separated subset of ' + ', '.join(TYPES))
+    args = parser.parse_args()
+    types = [file_type.strip() for file_type in args.types.split(',') if file_type.strip()]
+    unknown = set(types) - set(TYPES)
+    if unknown:
+        parser.error(f"Unknown types: {', '.join(sorted(unknown))}")
+    manifest = generate_corpus(args.out_dir, args.count, args.scale, args.seed, types)
+    total = sum(entry['size'] for entry in manifest)
+    print(f"Wrote {len(manifest)} files ({total / 1024 ** 2:.1f} MB) to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
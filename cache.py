@@ -0,0 +1,193 @@
+import os
+import atexit
+import json
+import sqlite3
+import threading
+import time
+
+# Default location of the persistent cache, can be overridden with METAXTRACTOR_CACHE
+DEFAULT_CACHE_PATH = os.environ.get(
+    'METAXTRACTOR_CACHE',
+    os.path.join(os.path.expanduser('~'), '.metaxtractor', 'metadata_cache.sqlite3'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata_cache (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    inode       INTEGER NOT NULL,
+    extractor   TEXT NOT NULL,
+    version     INTEGER NOT NULL,
+    metadata    TEXT NOT NULL,
+    is_error    INTEGER NOT NULL DEFAULT 0,
+    expires_at  REAL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metadata_cache_last_access ON metadata_cache(last_access);
+"""
+
+
+def is_error_result(metadata) -> bool:
+    """Return True if an extractor result describes a failure rather than metadata"""
+    return not isinstance(metadata, dict) or 'error' in metadata or 'Error' in metadata
+
+
+class MetadataCache:
+    """
+    Persistent, size-bounded metadata cache backed by SQLite.
+
+    Entries are keyed by file identity (absolute path, size, mtime_ns, inode) and
+    tagged with the extractor name and version that produced them, so a changed
+    file or an upgraded extractor is always re-parsed. Error results are stored
+    as negative entries that expire after `negative_ttl` seconds. When the cache
+    grows past `max_entries` the least recently used entries are evicted.
+    """
+
+    # Number of hits/puts to collect before they are written back in one transaction
+    FLUSH_INTERVAL = 500
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 500000, negative_ttl: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+        self._pending_access = {}
+        self._pending_puts = {}
+
+    @staticmethod
+    def file_identity(file_path: str, stat_result: os.stat_result = None) -> tuple:
+        # Build the identity tuple used as cache key, reusing a stat result when one is available
+        if stat_result is None:
+            stat_result = os.stat(file_path)
+        return (os.path.abspath(file_path), stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+
+    @staticmethod
+    def extractor_key(extractor) -> tuple:
+        # Name and version of the extractor class that produced an entry
+        return getattr(extractor, '__name__', str(extractor)), getattr(extractor, 'VERSION', 1)
+
+    def get(self, identity: tuple, extractor):
+        """Return the cached metadata for a file identity, or None on a miss"""
+        path, size, mtime_ns, inode = identity
+        name, version = self.extractor_key(extractor)
+        with self.lock:
+            pending = self._pending_puts.get(path)
+            if pending is not None:
+                row = pending[1:9]
+            else:
+                row = self.connection.execute(
+                    'SELECT size, mtime_ns, inode, extractor, version, metadata, is_error, expires_at '
+                    'FROM metadata_cache WHERE path = ?', (path,)
+                ).fetchone()
+            if row is None:
+                return None
+            if tuple(row[:5]) != (size, mtime_ns, inode, name, version):
+                return None
+            if row[6] and row[7] is not None and row[7] < time.time():
+                return None
+            self._pending_access[path] = time.time()
+            self._maybe_flush()
+        return json.loads(row[5])
+
+    def put(self, identity: tuple, extractor, metadata):
+        """Store an extractor result, replacing any older entry for the same path"""
+        path, size, mtime_ns, inode = identity
+        name, version = self.extractor_key(extractor)
+        now = time.time()
+        is_error = is_error_result(metadata)
+        expires_at = now + self.negative_ttl if is_error else None
+        payload = json.dumps(metadata, default=str)
+        with self.lock:
+            self._pending_access.pop(path, None)
+            self._pending_puts[path] = (path, size, mtime_ns, inode, name, version, payload, int(is_error), expires_at, now)
+            self._maybe_flush()
+
+    def invalidate(self, file_path: str):
+        """Drop the entry for a single file"""
+        path = os.path.abspath(file_path)
+        with self.lock:
+            self.flush()
+            self.connection.execute('DELETE FROM metadata_cache WHERE path = ?', (path,))
+
+    def purge_expired(self):
+        """Remove negative entries whose TTL has elapsed"""
+        with self.lock:
+            self.flush()
+            self.connection.execute(
+                'DELETE FROM metadata_cache WHERE is_error = 1 AND expires_at < ?', (time.time(),)
+            )
+
+    def clear(self):
+        with self.lock:
+            self._pending_access.clear()
+            self._pending_puts.clear()
+            self.connection.execute('DELETE FROM metadata_cache')
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return self.connection.execute('SELECT COUNT(*) FROM metadata_cache').fetchone()[0]
+
+    def flush(self):
+        """Write pending entries and access times to disk, then enforce the size bound"""
+        with self.lock:
+            if not self._pending_puts and not self._pending_access:
+                return
+            with self.connection:
+                self.connection.execute('BEGIN')
+                if self._pending_puts:
+                    self.connection.executemany(
+                        'INSERT OR REPLACE INTO metadata_cache '
+                        '(path, size, mtime_ns, inode, extractor, version, metadata, is_error, expires_at, last_access) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', list(self._pending_puts.values())
+                    )
+                if self._pending_access:
+                    self.connection.executemany(
+                        'UPDATE metadata_cache SET last_access = ? WHERE path = ?',
+                        [(accessed, path) for path, accessed in self._pending_access.items()]
+                    )
+            inserted = len(self._pending_puts)
+            self._pending_puts = {}
+            self._pending_access = {}
+            if inserted:
+                self._evict()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.connection.close()
+
+    def _maybe_flush(self):
+        if len(self._pending_puts) + len(self._pending_access) >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def _evict(self):
+        # Drop the least recently used entries once the cache exceeds its bound
+        count = self.connection.execute('SELECT COUNT(*) FROM metadata_cache').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                'DELETE FROM metadata_cache WHERE path IN '
+                '(SELECT path FROM metadata_cache ORDER BY last_access LIMIT ?)', (excess,)
+            )
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> MetadataCache:
+    """Return the process-wide cache shared by every MetadataExtractor"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache()
+            atexit.register(_default_cache.close)
+        return _default_cache
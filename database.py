@@ -1,71 +1,167 @@
+import concurrent.futures
 import csv
+import json
+import os
+import random
+import time
 import firebase_admin
-from firebase_admin import credentials, db
-from collections import defaultdict
+from firebase_admin import credentials, db, exceptions
+
+# Service account and database, can be overridden with METAXTRACTOR_FIREBASE_CREDENTIALS and METAXTRACTOR_FIREBASE_URL
+CREDENTIALS_PATH = os.environ.get(
+    'METAXTRACTOR_FIREBASE_CREDENTIALS', 'C:/Users/Hackz/metaxtractor-firebase-adminsdk-5tt9b-14a71ade5e.json'
+)
+DATABASE_URL = os.environ.get(
+    'METAXTRACTOR_FIREBASE_URL', 'https://metaxtractor-default-rtdb.asia-southeast1.firebasedatabase.app/'
+)
+
+# Characters Firebase doesn't allow in keys
+INVALID_KEY_CHARACTERS = '.$#[]/'
+
+# Errors worth retrying: the server or network is briefly unavailable, overloaded or slow
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.DeadlineExceededError,
+    exceptions.InternalError,
+    exceptions.ResourceExhaustedError,
+)
+
+def firebase_key(text: str) -> str:
+    """Make a file name or metadata field usable as a Realtime Database key"""
+    for character in INVALID_KEY_CHARACTERS:
+        text = text.replace(character, '-')
+    return text.strip() or '-'
 
 class Database:
     # Class variable to store the Firebase app instance
     _app = None
 
-    def __init__(self, chunk_size: int = 1000):
+    def __init__(self, max_payload_bytes: int = 512 * 1024, max_workers: int = 4, retries: int = 4,
+                 backoff: float = 0.5):
         # Initialize the Firebase app instance if it doesn't exist
         if not Database._app:
             try:
-                # Load the Firebase credentials from a JSON file
-                self.cred = credentials.Certificate('C:/Users/Hackz/metaxtractor-firebase-adminsdk-5tt9b-14a71ade5e.json')
+                # The local emulator (FIREBASE_DATABASE_EMULATOR_HOST) accepts unauthenticated requests
+                if os.environ.get('FIREBASE_DATABASE_EMULATOR_HOST'):
+                    self.cred = None
+                else:
+                    # Load the Firebase credentials from a JSON file
+                    self.cred = credentials.Certificate(CREDENTIALS_PATH)
                 # Initialize the Firebase app with the credentials and database URL
-                Database._app = firebase_admin.initialize_app(self.cred, {
-                    'databaseURL': 'https://metaxtractor-default-rtdb.asia-southeast1.firebasedatabase.app/'
-                })
+                Database._app = firebase_admin.initialize_app(self.cred, {'databaseURL': DATABASE_URL})
             except Exception as e:
                 # Raise an exception if there's an error initializing Firebase
                 raise Exception(f"Error initializing Firebase: {e}")
-        # Set the chunk size for processing CSV data
-        self.chunk_size = chunk_size
+        # Upper bound on the JSON body of one update request
+        self.max_payload_bytes = max_payload_bytes
+        # Update requests in flight at once
+        self.max_workers = max_workers
+        # Attempts after the first for a chunk that fails with a transient error, waiting backoff * 2^n between them
+        self.retries = retries
+        self.backoff = backoff
         # Get a reference to the Firebase Realtime Database
         self.ref = db.reference('Metadata Analysis')
 
+    def export_metadata(self, results: dict, on_exported=None, should_continue=None) -> dict:
+        """
+        Upload {file path: metadata dict} as multi-path updates of at most
+        `max_payload_bytes` each, keyed "<file name>/<field>" under the Metadata
+        Analysis node, with up to `max_workers` requests in flight.
+
+        `on_exported(file_path)` is called once every field of a file has been
+        written, straight away for files with no non-empty fields to send;
+        `should_continue()` is checked before each chunk is sent and stops the
+        export when it returns False. Returns {file path: error} for the files
+        that could not be written.
+        """
+        remaining = {}  # file path -> chunks not yet written
+        failed = {}
+        incomplete = set()  # files cut off by should_continue part-way through
+        pending = {}  # future -> file paths in the chunk
+        stopped = False
+
+        def settle(done):
+            for future in done:
+                chunk_files = pending.pop(future)
+                error = future.exception()
+                for file_path in chunk_files:
+                    if error is not None:
+                        failed.setdefault(file_path, str(error))
+                    remaining[file_path] -= 1
+                    if not remaining[file_path] and file_path not in failed and file_path not in incomplete and on_exported:
+                        on_exported(file_path)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for update, chunk_files in self.build_updates(results):
+                if should_continue and not should_continue():
+                    incomplete.update(chunk_files)
+                    stopped = True
+                    break
+                for file_path in chunk_files:
+                    remaining[file_path] = remaining.get(file_path, 0) + 1
+                pending[pool.submit(self.send_update, update)] = chunk_files
+                # Keep a bounded number of chunks queued so large exports don't sit in memory
+                if len(pending) >= self.max_workers * 2:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    settle(done)
+            settle(concurrent.futures.wait(pending).done)
+        if on_exported and not stopped:
+            # Files that build_updates produced nothing for are complete without a request
+            for file_path in results:
+                if file_path not in remaining:
+                    on_exported(file_path)
+        return failed
+
+    def build_updates(self, results: dict):
+        """Yield (multi-path update, file paths it touches) chunks no larger than max_payload_bytes"""
+        update, chunk_files, size = {}, [], 2
+        for file_path, metadata in results.items():
+            file_name = firebase_key(os.path.basename(file_path))
+            for key, value in metadata.items():
+                if key == "" or value == "":
+                    continue
+                path = f"{file_name}/{firebase_key(str(key))}"
+                # Serialized size of '"path": value, ' in the request body
+                entry_size = len(json.dumps(path)) + len(json.dumps(value, default=str)) + 4
+                if update and size + entry_size > self.max_payload_bytes:
+                    yield update, chunk_files
+                    update, chunk_files, size = {}, [], 2
+                if not chunk_files or chunk_files[-1] != file_path:
+                    chunk_files.append(file_path)
+                update[path] = value if isinstance(value, (str, int, float, bool)) else str(value)
+                size += entry_size
+        if update:
+            yield update, chunk_files
+
+    def send_update(self, update: dict):
+        # PATCH one multi-path update, retrying transient failures with exponential backoff and jitter
+        for attempt in range(self.retries + 1):
+            try:
+                self.ref.update(update)
+                return
+            except TRANSIENT_ERRORS:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
     def send_data_to_firebase(self, file_path: str):
+        # Upload a CSV previously saved from the table ("File:" rows followed by key/value rows)
         try:
-            # Open the CSV file for reading
-            with open(file_path, 'r') as csvfile:
-                # Create a CSV reader object
-                reader = csv.reader(csvfile)
-                data = []
-                file_name = None
-                # Iterate over the CSV rows
-                for row in reader:
-                    # Extract the file name from the first row
+            results = {}
+            with open(file_path, 'r', newline='') as csvfile:
+                metadata = None
+                for row in csv.reader(csvfile):
+                    if len(row) < 2:
+                        continue
                     if row[0] == "File:":
-                        file_name = row[1].replace('.', '-')
-                    # Extract the metadata key-value pairs from the remaining rows
-                    elif row[0] != "" and row[1] != "":
-                        data.append((file_name, row[0], row[1]))
-                    # If the data list has reached the chunk size, process it
-                    if len(data) >= self.chunk_size:
-                        self.process_data(data)
-                        data = []
-                # Process any remaining data in the list
-                if data:
-                    self.process_data(data)
+                        metadata = results.setdefault(row[1], {})
+                    elif metadata is not None and row[0] != "" and row[1] != "":
+                        metadata[row[0]] = row[1]
+            for failed_file, error in self.export_metadata(results).items():
+                print(f"Error sending {failed_file} to Firebase: {error}")
         except FileNotFoundError:
             print(f"Error File '{file_path}' not found.")
         except csv.Error as e:
             print(f"Error reading CSV file: {e}")
         except Exception as e:
             print(f"Error sending data to Firebase: {e}")
-
-    def process_data(self, data: list):
-        try:
-            # Initialize a dictionary to store the batch data
-            batch_data = defaultdict(dict)
-            # Iterate over the data rows
-            for file_name, key, value in data:
-                batch_data[file_name][key] = value
-            # Update the Firebase database with the batch data
-            if batch_data:
-                self.ref.update(dict(batch_data))
-        except db.DatabaseError as e:
-            print(f"Error updating Firebase database: {e}")
-        except Exception as e:
-            print(f"Error processing chunk: {e}")
\ No newline at end of file
@@ -1,8 +1,9 @@
 import os
-import pikepdf
-import docx
-import openpyxl
-import pptx
+import re
+import zipfile
+from ooxml import OoxmlPackage, DOC_RELATIONSHIPS_NS, count_words, header_footer_parts, local_name
+from pdfinfo import parse_xmp, read_pdf_info
+from source import open_source
 
 # Dictionary to map file extensions to their corresponding types
 FILE_EXTENSIONS = {
@@ -12,113 +13,247 @@ FILE_EXTENSIONS = {
     '.pptx': 'powerpoint'
 }
 
+# Format sniffed by FileSource -> document type
+SNIFFED_TYPES = {
+    'docx': 'word',
+    'pdf': 'pdf',
+    'xlsx': 'excel',
+    'pptx': 'powerpoint'
+}
+
 class DocumentMetadata:
-    def __init__(self, file_path: str):
+    VERSION = 6
+    CPU_BOUND = True
+    READS_SOURCE = True
+
+    def __init__(self, file_path: str, count_tables: bool = False, count_headers_footers: bool = False,
+                 read_xmp: bool = True, source=None):
         # Initialize the DocumentMetadata object with a file path
         self.file_path = file_path
+        # Already open FileSource for file_path, if the caller has one
+        self.source = source
+        # Word count options: also count words in tables, and in headers and footers
+        self.count_tables = count_tables
+        self.count_headers_footers = count_headers_footers
+        # Also read the PDF's XMP metadata stream (one extra object read)
+        self.read_xmp = read_xmp
 
     def extract_metadata(self) -> dict:
-        # Extract metadata based on file extension
-        file_extension = os.path.splitext(self.file_path)[1]
-        if file_extension in FILE_EXTENSIONS:
-            metadata_method = getattr(self, f"{FILE_EXTENSIONS[file_extension]}_metadata")
-            try:
-                return metadata_method()
-            except Exception as e:
-                return {"Error": f"Failed to extract metadata: {str(e)}"}
-        else:
-            return {"Error": f"Unsupported file type: {file_extension}"}
-
+        # Pick the format from the file's content, falling back to its extension, so mislabeled files are still read correctly
+        file_extension = os.path.splitext(self.file_path)[1].lower()
+        try:
+            with open_source(self.file_path, self.source) as source:
+                file_type = SNIFFED_TYPES.get(source.kind) or FILE_EXTENSIONS.get(file_extension)
+                if not file_type:
+                    return {"Error": f"Unsupported file type: {file_extension}"}
+                metadata_method = getattr(self, f"{file_type}_metadata")
+                return metadata_method(source)
+        except Exception as e:
+            return {"Error": f"Failed to extract metadata: {str(e)}"}
 
-    def word_metadata(self) -> dict:
+    def word_metadata(self, source) -> dict:
         try:
-            doc = docx.Document(self.file_path)    
-        except docx.exceptions.PackageNotFoundError:
+            with OoxmlPackage(source.file) as package:
+                core = package.core_properties()
+                app = package.app_properties()
+                word_count = self._word_count(package)
+        except (zipfile.BadZipFile, KeyError):
             return {"Error": "Failed to open Word document"}
         except Exception as e:
             return {"Error": f"Failed to extract Word metadata: {str(e)}"}
 
         metadata = {}
-        metadata['Author'] = doc.core_properties.author
-        metadata['Title'] = doc.core_properties.title
-        metadata['Subject'] = doc.core_properties.subject
-        metadata['Date Created'] = doc.core_properties.created
-        metadata['Date Modified'] = doc.core_properties.modified
-        metadata['Page Count'] = len(doc.sections)
-        metadata['Revision'] = doc.core_properties.revision
-        metadata['Last Printed'] = doc.core_properties.last_printed
-        metadata['Category'] = doc.core_properties.category
-        metadata['Keywords'] = doc.core_properties.keywords
-        metadata['Comments'] = doc.core_properties.comments
-        metadata['Version'] = doc.core_properties.version
-        metadata['Status'] = doc.core_properties.content_status
-        
-
-        word_count = 0
-        for para in doc.paragraphs:
-            word_count += len(para.text.split())
+        metadata['Author'] = core['author']
+        metadata['Title'] = core['title']
+        metadata['Subject'] = core['subject']
+        metadata['Date Created'] = core['created']
+        metadata['Date Modified'] = core['modified']
+        # Word records the paginated page count in docProps/app.xml when it saves the file
+        metadata['Page Count'] = app['pages']
+        metadata['Revision'] = core['revision']
+        metadata['Last Printed'] = core['last_printed']
+        metadata['Category'] = core['category']
+        metadata['Keywords'] = core['keywords']
+        metadata['Comments'] = core['comments']
+        metadata['Version'] = core['version']
+        metadata['Status'] = core['content_status']
         metadata['Word Count'] = word_count
         return metadata
 
-    def pdf_metadata(self) -> dict:
+    def _word_count(self, package: OoxmlPackage) -> int:
+        # Stream-count the words of word/document.xml, optionally with its headers and footers
+        document = package.main_part()
+        if document is None:
+            raise KeyError("word/document.xml")
+        word_count = count_words(package, document, self.count_tables)
+        if self.count_headers_footers:
+            for part_name in header_footer_parts(package, document):
+                word_count += count_words(package, part_name, self.count_tables)
+        return word_count
+
+    def pdf_metadata(self, source) -> dict:
+        # Read the trailer, /Info and the page tree root directly; pikepdf is only needed for files the lazy reader can't handle
         try:
-            with pikepdf.Pdf.open(self.file_path) as pdf:
-                metadata = {}
-                metadata['Author'] = pdf.docinfo.get('/Author', '')
-                metadata['Title'] = pdf.docinfo.get('/Title', '')
-                metadata['Date Created'] = pdf.docinfo.get('/CreationDate', '')
-                metadata['Date Modified'] = pdf.docinfo.get('/ModDate', '')
-                metadata['Subject'] = pdf.docinfo.get('/Subject', '')
-                metadata['Keywords'] = pdf.docinfo.get('/Keywords', '')
-                metadata['PDDocID'] = pdf.docinfo.get('/ID', '')
-                metadata['PDFVersion'] = pdf.pdf_version
-                metadata['Page Count'] = len(pdf.pages)
-                return metadata  
-        except pikepdf.PdfError:
-            return {"Error": "Failed to open PDF"}
-        except Exception as e:
-            return {"Error": f"Failed to extract PDF metadata: {str(e)}"}
+            info = read_pdf_info(self.file_path, self.read_xmp, source)
+        except OSError as e:
+            return {"Error": f"Failed to open PDF: {str(e)}"}
+        except Exception:
+            # Damaged or unusual structure (bad xref entries, streams, encodings); pikepdf can often repair it
+            info = None
+        if info is None:
+            # pikepdf is only imported for the files that need it, not at startup
+            import pikepdf
+            try:
+                info = self._pikepdf_info()
+            except pikepdf.PdfError:
+                return {"Error": "Failed to open PDF"}
+            except Exception as e:
+                return {"Error": f"Failed to extract PDF metadata: {str(e)}"}
+
+        docinfo = info['info']
+        metadata = {}
+        metadata['Author'] = docinfo.get('/Author', '')
+        metadata['Title'] = docinfo.get('/Title', '')
+        metadata['Date Created'] = docinfo.get('/CreationDate', '')
+        metadata['Date Modified'] = docinfo.get('/ModDate', '')
+        metadata['Subject'] = docinfo.get('/Subject', '')
+        metadata['Keywords'] = docinfo.get('/Keywords', '')
+        metadata['Creator'] = docinfo.get('/Creator', '')
+        metadata['Producer'] = docinfo.get('/Producer', '')
+        # The document ID lives in the trailer; older files sometimes also carry one in /Info
+        metadata['PDDocID'] = info['document_id'] or docinfo.get('/ID', '')
+        metadata['PDFVersion'] = info['version']
+        metadata['Page Count'] = info['page_count']
+        metadata['Linearized'] = info['linearized']
+        metadata['Encrypted'] = info['encrypted']
+        metadata['Incremental Updates'] = info['incremental_updates']
+        for name, value in info['xmp'].items():
+            metadata[f"XMP {name}"] = value
+        return metadata
+
+    def _pikepdf_info(self) -> dict:
+        # Same fields as read_pdf_info, for encrypted or unusual files; still avoids walking the page list
+        import pikepdf
+        with pikepdf.Pdf.open(self.file_path) as pdf:
+            info = {
+                'version': pdf.pdf_version,
+                'info': {str(key): str(value) for key, value in pdf.docinfo.items()},
+                'page_count': int(pdf.Root.Pages.Count),
+                'document_id': bytes(pdf.trailer.ID[0]).hex() if '/ID' in pdf.trailer else None,
+                'linearized': pdf.is_linearized,
+                'encrypted': pdf.is_encrypted,
+                'incremental_updates': None,
+                'xmp': {},
+            }
+            if self.read_xmp and '/Metadata' in pdf.Root:
+                info['xmp'] = parse_xmp(bytes(pdf.Root.Metadata.read_bytes()).decode('utf-8', errors='replace'))
+            return info
 
-    def excel_metadata(self) -> dict: 
+    def excel_metadata(self, source) -> dict: 
         try:
-            excel = openpyxl.load_workbook(self.file_path)   
-        except openpyxl.exceptions.InvalidFileException:
+            with OoxmlPackage(source.file) as package:
+                core = package.core_properties()
+                sheet_count, active_sheet = self._excel_sheets(package)
+                dimension = self._excel_dimension(package, active_sheet) if active_sheet else None
+            if dimension is None:
+                dimension = self._openpyxl_dimension()
+        except zipfile.BadZipFile:
             return {"Error": "Failed to open Excel file"}
         except Exception as e:
             return {"Error": f"Failed to extract Excel metadata: {str(e)}"}
 
         metadata = {}
-        metadata['Author'] = excel.properties.creator
-        metadata['Title'] = excel.properties.title
-        metadata['Subject'] = excel.properties.subject
-        metadata['Date Created'] = excel.properties.created
-        metadata['Date Modified'] = excel.properties.modified
-        metadata['Sheet Count'] = len(excel.worksheets)
-        metadata['Row Count'] = excel.active.max_row
-        metadata['Column Count'] = excel.active.max_column
+        metadata['Author'] = core['author']
+        metadata['Title'] = core['title']
+        metadata['Subject'] = core['subject']
+        metadata['Date Created'] = core['created']
+        metadata['Date Modified'] = core['modified']
+        metadata['Sheet Count'] = sheet_count
+        metadata['Row Count'], metadata['Column Count'] = self._dimension_size(dimension)
         
         return metadata
 
-    def powerpoint_metadata(self) -> dict:
+    def powerpoint_metadata(self, source) -> dict:
         try:
-            ppt = pptx.Presentation(self.file_path)
-        except pptx.exceptions.PackageNotFoundError:
+            with OoxmlPackage(source.file) as package:
+                core = package.core_properties()
+                slide_count = self._count_slides(package)
+        except zipfile.BadZipFile:
             return {"Error": "Failed to open PowerPoint presentation"}
         except Exception as e:
             return {"Error": f"Failed to extract PowerPoint metadata: {str(e)}"}
             
         metadata = {}
-        metadata['Author'] = ppt.core_properties.author
-        metadata['Title'] = ppt.core_properties.title
-        metadata['Subject'] = ppt.core_properties.subject
-        metadata['Date Created'] = ppt.core_properties.created
-        metadata['Date Modified'] = ppt.core_properties.modified
-        metadata['Slide Count'] = len(ppt.slides)
-        metadata['Revision'] = ppt.core_properties.revision
-        metadata['Last Printed'] = ppt.core_properties.last_printed
-        metadata['Category'] = ppt.core_properties.category
-        metadata['Keywords'] = ppt.core_properties.keywords
-        metadata['Comments'] = ppt.core_properties.comments
-        metadata['Version'] = ppt.core_properties.version
-        metadata['Status'] = ppt.core_properties.content_status
-        return metadata
\ No newline at end of file
+        metadata['Author'] = core['author']
+        metadata['Title'] = core['title']
+        metadata['Subject'] = core['subject']
+        metadata['Date Created'] = core['created']
+        metadata['Date Modified'] = core['modified']
+        metadata['Slide Count'] = slide_count
+        metadata['Revision'] = core['revision']
+        metadata['Last Printed'] = core['last_printed']
+        metadata['Category'] = core['category']
+        metadata['Keywords'] = core['keywords']
+        metadata['Comments'] = core['comments']
+        metadata['Version'] = core['version']
+        metadata['Status'] = core['content_status']
+        return metadata
+
+    def _openpyxl_dimension(self) -> str:
+        # No <dimension> recorded in the sheet, so let openpyxl scan the rows (read-only, streaming)
+        # openpyxl is only imported for these files, not at startup
+        import openpyxl
+        excel = openpyxl.load_workbook(self.file_path, read_only=True)
+        try:
+            return excel.active.calculate_dimension(force=True)
+        finally:
+            excel.close()
+
+    @staticmethod
+    def _excel_sheets(package: OoxmlPackage) -> tuple:
+        # Return the number of worksheets and the part name of the active sheet from xl/workbook.xml
+        workbook = package.main_part()
+        sheet_ids = []
+        active_tab = 0
+        for event, element in package.iterparse(workbook, events=('start',)):
+            tag = local_name(element.tag)
+            if tag == 'workbookView':
+                active_tab = int(element.get('activeTab', 0))
+            elif tag == 'sheet':
+                sheet_ids.append(element.get(f"{DOC_RELATIONSHIPS_NS}id"))
+        relationships = package.relationships(workbook)
+        sheets = [relationships.get(sheet_id, (None, None)) for sheet_id in sheet_ids]
+        sheet_count = sum(1 for rel_type, _ in sheets if rel_type and rel_type.endswith('/worksheet'))
+        active_sheet = None
+        if 0 <= active_tab < len(sheets) and sheets[active_tab][0] and sheets[active_tab][0].endswith('/worksheet'):
+            active_sheet = sheets[active_tab][1]
+        return sheet_count, active_sheet
+
+    @staticmethod
+    def _excel_dimension(package: OoxmlPackage, sheet: str):
+        # The <dimension ref="A1:D100"/> element precedes the cell data, so stop reading as soon as we reach it
+        for event, element in package.iterparse(sheet, events=('start',)):
+            tag = local_name(element.tag)
+            if tag == 'dimension':
+                return element.get('ref')
+            if tag == 'sheetData':
+                return None
+        return None
+
+    @staticmethod
+    def _dimension_size(dimension: str) -> tuple:
+        # Convert a range like "A1:D100" into (max_row, max_column)
+        match = re.match(r'^\$?([A-Z]+)\$?(\d+)$', (dimension or 'A1').split(':')[-1].upper())
+        if not match:
+            return None, None
+        column = 0
+        for letter in match.group(1):
+            column = column * 26 + ord(letter) - ord('A') + 1
+        return int(match.group(2)), column
+
+    @staticmethod
+    def _count_slides(package: OoxmlPackage) -> int:
+        # Count the slide ids in ppt/presentation.xml; <Slides> in docProps/app.xml is often stale
+        # when the file was written by something other than PowerPoint
+        return sum(1 for event, element in package.iterparse(package.main_part(), events=('start',))
+                   if local_name(element.tag) == 'sldId')
@@ -1,14 +1,19 @@
-from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QVBoxLayout, QListWidgetItem, QListWidget, QFileDialog
+from PyQt5.QtWidgets import (QWidget, QLabel, QPushButton, QVBoxLayout, QListWidgetItem, QListWidget, QListView,
+                             QFileDialog)
 from PyQt5.QtCore import Qt, QFileInfo, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon
+from registry import registry
+from workers import FolderScanWorker
 
 class DragDropWidget(QWidget):
     
-    upload_file_signal = pyqtSignal(str)
+    upload_files_signal = pyqtSignal(list)
     item_removed_signal = pyqtSignal(int)
     
     def __init__(self):
         super().__init__()
+        self.uploaded_paths = set()  # Full paths already listed; different files may share a name
+        self.scan_workers = []  # Folder scans still running
         self.initUI()
 
     def initUI(self):
@@ -25,7 +30,7 @@ class DragDropWidget(QWidget):
         self.layout.addSpacing(20)
 
         # Create drop label
-        self.drop_label = QLabel("Drag and drop files here or Upload")
+        self.drop_label = QLabel("Drag and drop files or folders here or Upload")
         self.drop_label.setFont(QFont("Inter", 12))
         self.drop_label.setAlignment(Qt.AlignCenter)
         self.drop_label.setStyleSheet("background-color: #2a2f33; border: 2px dashed #1a94d6; border-radius: 10px; padding: 45px;")
@@ -45,6 +50,12 @@ class DragDropWidget(QWidget):
         self.uploaded_files_listbox = QListWidget()
         self.uploaded_files_listbox.setFixedSize(475, 165)
         self.uploaded_files_listbox.setSpacing(2)
+        # Every item has the same size, so the list doesn't measure each one, and lays them out in batches
+        self.uploaded_files_listbox.setUniformItemSizes(True)
+        self.uploaded_files_listbox.setLayoutMode(QListView.Batched)
+        self.uploaded_files_listbox.setBatchSize(500)
+        # One icon shared by every item instead of loading it from disk per file
+        self.file_icon = QIcon("logo.png")
         
         self.uploaded_files_listbox.itemDoubleClicked.connect(self.remove_item_on_double_click)
         self.layout.addWidget(self.uploaded_files_listbox)
@@ -97,33 +108,64 @@ class DragDropWidget(QWidget):
             event.ignore()
             
     def upload_file(self):
-        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select files", "", "Supported files (*.docx *.pdf *.xlsx *.pptx *.mp4 *.avi *.mov *.mkv *.mpeg *.jpg *.jpeg *.png)")
+        patterns = " ".join(f"*{extension}" for extension in sorted(registry.extensions()))
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select files", "", f"Supported files ({patterns})")
         if file_paths:
-            for file_path in file_paths:
-                if QFileInfo(file_path).isFile() and QFileInfo(file_path).isReadable():
-                    self.handle_file_upload(file_path)
+            self.add_files([file_path for file_path in file_paths
+                            if QFileInfo(file_path).isFile() and QFileInfo(file_path).isReadable()])
 
     def dropEvent(self, event):
-        files = []
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            file_info = QFileInfo(file_path)
-            if file_info.suffix().lower() in ["docx", "pdf", "xlsx", "pptx", "mp4", "avi", "mov", "mkv", "mpeg", "jpg", "jpeg", "png"]:
-                files.append(file_path)
-        for file in files:
-            self.handle_file_upload(file)
-            
+        # Folders are walked in the background; supported files arrive in batches
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            self.scan_paths(paths)
+
+    def scan_paths(self, paths):
+        worker = FolderScanWorker(paths)
+        worker.files_found.connect(lambda file_paths: self._on_files_found(worker, file_paths))
+        worker.finished.connect(lambda: self.scan_workers.remove(worker))
+        self.scan_workers.append(worker)
+        worker.start()
+
+    def _on_files_found(self, worker, file_paths):
+        # Batches already queued by a scan that was stopped by clear_files are dropped
+        if not worker.is_cancelled():
+            self.add_files(file_paths)
+
     def handle_file_upload(self, file_path):
-        file_info = QFileInfo(file_path)
-        file_name = file_info.fileName()
-        if not self.uploaded_files_listbox.findItems(file_name, Qt.MatchExactly):
-            item = QListWidgetItem(file_name)
-            icon = QIcon("logo.png")
-            item.setIcon(icon)
-            self.uploaded_files_listbox.addItem(item)
-            self.upload_file_signal.emit(file_path)
+        self.add_files([file_path])
+
+    def add_files(self, file_paths):
+        """List the files that aren't listed yet and announce them in one signal"""
+        new_paths = []
+        for file_path in file_paths:
+            file_path = QFileInfo(file_path).absoluteFilePath()
+            if file_path not in self.uploaded_paths:
+                self.uploaded_paths.add(file_path)
+                new_paths.append(file_path)
+        if not new_paths:
+            return
+        listbox = self.uploaded_files_listbox
+        listbox.setUpdatesEnabled(False)
+        try:
+            for file_path in new_paths:
+                item = QListWidgetItem(self.file_icon, QFileInfo(file_path).fileName())
+                item.setData(Qt.UserRole, file_path)
+                item.setToolTip(file_path)
+                listbox.addItem(item)
+        finally:
+            listbox.setUpdatesEnabled(True)
+        self.upload_files_signal.emit(new_paths)
+
+    def clear_files(self):
+        # Stop folder scans still feeding the list before emptying it
+        for worker in self.scan_workers:
+            worker.cancel()
+        self.uploaded_files_listbox.clear()
+        self.uploaded_paths.clear()
 
     def remove_item_on_double_click(self, item):
         row = self.uploaded_files_listbox.row(item)
         self.uploaded_files_listbox.takeItem(row)
+        self.uploaded_paths.discard(item.data(Qt.UserRole))
         self.item_removed_signal.emit(row)
@@ -0,0 +1,131 @@
+"""
+Content identity for skipping duplicate files.
+
+Files are compared in tiers so most of them are never read: first by size
+(one stat each), then by a hash of their first and last SAMPLE_SIZE bytes,
+and only files that still collide get a full BLAKE2b hash, read through mmap
+in chunks. Hard links and repeated paths are caught by (device, inode) before
+anything is read. Paths are checked one at a time as they arrive, so a scan
+can start extracting before it has seen every file:
+
+    finder = DuplicateFinder()
+    for path in paths:
+        original = finder.original_of(path)  # None for new contents
+"""
+import hashlib
+import mmap
+import os
+
+# Bytes hashed from each end of a file in the sampling tier
+SAMPLE_SIZE = 64 * 1024
+
+# Bytes fed to the hash at a time in the full tier
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Marks an index key whose paths have been told apart by the next tier
+_SPLIT = object()
+
+
+def sample_digest(file_path: str, size: int) -> bytes:
+    """BLAKE2b of the first and last SAMPLE_SIZE bytes; for small files this covers the whole file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(SAMPLE_SIZE))
+        if size > SAMPLE_SIZE:
+            f.seek(max(SAMPLE_SIZE, size - SAMPLE_SIZE))
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.digest()
+
+
+def full_digest(file_path: str) -> bytes:
+    """BLAKE2b of the whole file, hashed in chunks straight from a read-only mapping"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, HASH_CHUNK_SIZE):
+                        digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+                finally:
+                    view.release()
+    return digest.digest()
+
+
+def _safe(key):
+    def wrapped(file_path):
+        try:
+            return key(file_path)
+        except (OSError, ValueError):
+            return None
+    return wrapped
+
+
+class DuplicateFinder:
+    """
+    Tell, path by path, whether a file repeats the contents of one seen before.
+
+    Nothing is read while a file is the only one of its size. When a second
+    file of that size arrives, both are sampled, and files whose samples match
+    are hashed in full, so each file is hashed at most once per tier and only
+    when something could be its copy. Files that can't be read are never
+    reported as copies.
+    """
+
+    def __init__(self):
+        self._inodes = {}  # (device, inode) -> earliest path with that file's contents
+        self._sizes = {}  # path with new contents -> its size
+        # Key prefix (size, sample digest, ...) -> the one path with that prefix so far,
+        # or _SPLIT once that path has been keyed by the next tier as well
+        self._index = {}
+
+    def original_of(self, file_path: str):
+        """Return the earliest path seen with the same contents as `file_path`, or None if they are new"""
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return None
+        # The same file under another path or a hard link, no need to read it
+        identity = (stat_result.st_dev, stat_result.st_ino)
+        if identity in self._inodes:
+            return self._inodes[identity]
+        original = self._lookup(file_path, stat_result.st_size)
+        self._inodes[identity] = original or file_path
+        if original is None:
+            self._sizes[file_path] = stat_result.st_size
+        return original
+
+    def may_have_copies(self, file_path: str) -> bool:
+        """Whether another file of the same size as `file_path` (a path with new contents) has come up"""
+        size = self._sizes.get(file_path)
+        return size is not None and self._index.get((size,)) is _SPLIT
+
+    def _lookup(self, file_path: str, size: int):
+        # Walk the tiers while another file shares the key so far, then claim the key or return its owner
+        key = (size,)
+        for tier in self._tiers(size):
+            first = self._index.get(key)
+            if first is None:
+                self._index[key] = file_path
+                return None
+            if first is not _SPLIT:
+                # A second file shares this key, so the first one needs keying at this tier too
+                self._index[key] = _SPLIT
+                value = _safe(tier)(first)
+                if value is not None:
+                    self._index[key + (value,)] = first
+            value = _safe(tier)(file_path)
+            if value is None:
+                return None
+            key += (value,)
+        first = self._index.setdefault(key, file_path)
+        return first if first is not file_path else None
+
+    @staticmethod
+    def _tiers(size: int):
+        yield lambda path: sample_digest(path, size)
+        # Files no bigger than both samples were hashed in full by the sample tier
+        if size > 2 * SAMPLE_SIZE:
+            yield full_digest
+
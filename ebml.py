@@ -0,0 +1,254 @@
+"""
+Minimal Matroska / WebM (EBML) reader.
+
+Reads the EBML header, then the Segment's SeekHead to jump straight to the
+Info and Tracks elements. When there is no SeekHead, the top-level elements
+are walked until the first Cluster. Clusters, Cues and block data are never
+read, so large recordings cost a handful of small reads.
+"""
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+EBML_HEADER = 0x1A45DFA3
+DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+DATE_UTC = 0x4461
+TITLE = 0x7BA9
+MUXING_APP = 0x4D80
+WRITING_APP = 0x5741
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+CODEC_PRIVATE = 0x63A2
+DEFAULT_DURATION = 0x23E383
+LANGUAGE = 0x22B59C
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+CHANNELS = 0x9F
+BIT_DEPTH = 0x6264
+CLUSTER = 0x1F43B675
+
+TRACK_TYPES = {1: 'video', 2: 'audio', 17: 'subtitle'}
+
+# Element ID -> how its payload is decoded; anything else is kept as raw bytes
+UNSIGNED_ELEMENTS = {
+    TIMESTAMP_SCALE, TRACK_NUMBER, TRACK_TYPE, DEFAULT_DURATION, PIXEL_WIDTH, PIXEL_HEIGHT, CHANNELS,
+    BIT_DEPTH, SEEK_POSITION,
+}
+FLOAT_ELEMENTS = {DURATION, SAMPLING_FREQUENCY}
+STRING_ELEMENTS = {DOC_TYPE, TITLE, MUXING_APP, WRITING_APP, CODEC_ID, LANGUAGE}
+
+# Upper bound on Info / Tracks payloads we read whole
+MAX_ELEMENT_SIZE = 4 * 1024 * 1024
+
+# Matroska dates count nanoseconds from the start of the third millennium
+EPOCH_2001 = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+
+class EbmlError(ValueError):
+    """Raised when a file isn't Matroska or its header elements are unreadable"""
+
+
+def read_vint(data: bytes, offset: int, keep_marker: bool = False):
+    """Decode an EBML variable-length integer; returns (value, length), value None for 'unknown size'"""
+    first = data[offset]
+    if not first:
+        raise EbmlError("Invalid variable-length integer")
+    length = 8 - first.bit_length() + 1
+    if offset + length > len(data):
+        raise EbmlError("Truncated variable-length integer")
+    value = int.from_bytes(data[offset:offset + length], 'big')
+    if keep_marker:
+        return value, length
+    value &= (1 << (7 * length)) - 1
+    if value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def iter_elements(data: bytes, offset: int = 0, end: int = None):
+    """Yield (id, payload) for the child elements in an in-memory buffer"""
+    end = len(data) if end is None else end
+    while offset < end:
+        element_id, id_length = read_vint(data, offset, keep_marker=True)
+        size, size_length = read_vint(data, offset + id_length)
+        start = offset + id_length + size_length
+        if size is None:
+            size = end - start
+        yield element_id, data[start:start + size]
+        offset = start + size
+
+
+def decode_value(element_id: int, payload: bytes):
+    if element_id in UNSIGNED_ELEMENTS:
+        return int.from_bytes(payload, 'big')
+    if element_id in FLOAT_ELEMENTS:
+        if len(payload) == 4:
+            return struct.unpack('>f', payload)[0]
+        if len(payload) == 8:
+            return struct.unpack('>d', payload)[0]
+        return None
+    if element_id in STRING_ELEMENTS:
+        return payload.rstrip(b'\x00').decode('utf-8', errors='replace')
+    return payload
+
+
+class MatroskaReader:
+    """Reads element headers from an open file with small positioned reads"""
+
+    def __init__(self, f):
+        self.file = f
+        self.size = os.fstat(f.fileno()).st_size
+
+    def read_header(self, offset: int):
+        # Return (id, payload offset, payload size or None) for the element at offset
+        self.file.seek(offset)
+        data = self.file.read(12)
+        if len(data) < 2:
+            raise EbmlError("Unexpected end of file")
+        element_id, id_length = read_vint(data, 0, keep_marker=True)
+        size, size_length = read_vint(data, id_length)
+        return element_id, offset + id_length + size_length, size
+
+    def read_payload(self, start: int, size: int) -> bytes:
+        if size is None or size > MAX_ELEMENT_SIZE:
+            raise EbmlError("Element too large to read")
+        self.file.seek(start)
+        return self.file.read(size)
+
+    def read_segment(self) -> dict:
+        """Return {'doc_type', 'info', 'tracks'} using the SeekHead when there is one"""
+        element_id, start, size = self.read_header(0)
+        if element_id != EBML_HEADER:
+            raise EbmlError("Not an EBML file")
+        doc_type = 'matroska'
+        for child_id, payload in iter_elements(self.read_payload(start, size)):
+            if child_id == DOC_TYPE:
+                doc_type = decode_value(child_id, payload)
+
+        # Skip anything (Void) between the EBML header and the Segment
+        offset = start + size
+        while True:
+            element_id, segment_start, segment_size = self.read_header(offset)
+            if element_id == SEGMENT:
+                break
+            if segment_size is None:
+                raise EbmlError("No Segment element")
+            offset = segment_start + segment_size
+        segment_end = self.size if segment_size is None else min(self.size, segment_start + segment_size)
+
+        positions = {}
+        element_id, first_start, first_size = self.read_header(segment_start)
+        if element_id == SEEK_HEAD:
+            positions = self._read_seek_head(self.read_payload(first_start, first_size))
+        if INFO not in positions or TRACKS not in positions:
+            positions.update(self._scan_top_level(segment_start, segment_end))
+
+        result = {'doc_type': doc_type, 'info': None, 'tracks': []}
+        if INFO in positions:
+            result['info'] = self._read_info(segment_start + positions[INFO])
+        if TRACKS in positions:
+            result['tracks'] = self._read_tracks(segment_start + positions[TRACKS])
+        return result
+
+    @staticmethod
+    def _read_seek_head(data: bytes) -> dict:
+        # SeekHead entries map element IDs to offsets relative to the Segment payload
+        positions = {}
+        for element_id, payload in iter_elements(data):
+            if element_id != SEEK:
+                continue
+            seek_id = position = None
+            for child_id, child in iter_elements(payload):
+                if child_id == SEEK_ID:
+                    seek_id = int.from_bytes(child, 'big')
+                elif child_id == SEEK_POSITION:
+                    position = decode_value(child_id, child)
+            if seek_id is not None and position is not None:
+                positions.setdefault(seek_id, position)
+        return positions
+
+    def _scan_top_level(self, segment_start: int, segment_end: int) -> dict:
+        # Without a usable SeekHead, walk top-level headers up to the first Cluster
+        positions = {}
+        offset = segment_start
+        while offset < segment_end:
+            element_id, start, size = self.read_header(offset)
+            if element_id == CLUSTER or size is None:
+                break
+            if element_id in (INFO, TRACKS):
+                positions[element_id] = offset - segment_start
+                if INFO in positions and TRACKS in positions:
+                    break
+            offset = start + size
+        return positions
+
+    def _read_element(self, offset: int, expected_id: int) -> bytes:
+        element_id, start, size = self.read_header(offset)
+        if element_id != expected_id:
+            raise EbmlError("SeekHead points at the wrong element")
+        return self.read_payload(start, size)
+
+    def _read_info(self, offset: int) -> dict:
+        info = {'timestamp_scale': 1000000}
+        for element_id, payload in iter_elements(self._read_element(offset, INFO)):
+            if element_id == TIMESTAMP_SCALE:
+                info['timestamp_scale'] = decode_value(element_id, payload)
+            elif element_id == DURATION:
+                info['duration'] = decode_value(element_id, payload)
+            elif element_id == DATE_UTC and len(payload) == 8:
+                nanoseconds = struct.unpack('>q', payload)[0]
+                info['date'] = EPOCH_2001 + timedelta(microseconds=nanoseconds // 1000)
+            elif element_id == TITLE:
+                info['title'] = decode_value(element_id, payload)
+            elif element_id == MUXING_APP:
+                info['muxing_app'] = decode_value(element_id, payload)
+            elif element_id == WRITING_APP:
+                info['writing_app'] = decode_value(element_id, payload)
+        # Duration is stored in timestamp-scale units
+        if info.get('duration') is not None:
+            info['duration'] = info['duration'] * info['timestamp_scale'] / 1e9
+        return info
+
+    def _read_tracks(self, offset: int) -> list:
+        tracks = []
+        for element_id, payload in iter_elements(self._read_element(offset, TRACKS)):
+            if element_id != TRACK_ENTRY:
+                continue
+            track = {}
+            for child_id, child in iter_elements(payload):
+                if child_id in (VIDEO, AUDIO):
+                    for setting_id, setting in iter_elements(child):
+                        track[setting_id] = decode_value(setting_id, setting)
+                else:
+                    track[child_id] = decode_value(child_id, child)
+            tracks.append({
+                'type': TRACK_TYPES.get(track.get(TRACK_TYPE)),
+                'codec_id': track.get(CODEC_ID),
+                'codec_private': track.get(CODEC_PRIVATE),
+                'default_duration': track.get(DEFAULT_DURATION),
+                'language': track.get(LANGUAGE),
+                'width': track.get(PIXEL_WIDTH),
+                'height': track.get(PIXEL_HEIGHT),
+                'sample_rate': track.get(SAMPLING_FREQUENCY),
+                'channels': track.get(CHANNELS),
+                'bit_depth': track.get(BIT_DEPTH),
+            })
+        return tracks
+
+
+def read_matroska(f) -> dict:
+    return MatroskaReader(f).read_segment()
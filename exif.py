@@ -0,0 +1,331 @@
+"""
+Header-only EXIF reader for JPEG files.
+
+Only the APP1/TIFF structures PhotoMetadata reports are decoded: a handful of
+IFD0 tags, the EXIF and GPS sub-IFDs and the IFD1 (thumbnail) directory.
+MakerNotes, thumbnail data and every other tag are skipped without being read.
+Callers pass the file's shared mapping and only its first HEADER_LIMIT bytes
+are looked at, so on network shares only the pages that hold the header are
+ever fetched.
+"""
+import struct
+from fractions import Fraction
+
+# Only this much of the file is read; the APP1 segment is limited to 64KB and
+# normally follows SOI or a short APP0 segment
+HEADER_LIMIT = 256 * 1024
+
+# Size in bytes and struct code of each TIFF field type
+FIELD_TYPES = {
+    1: (1, 'B'),   # BYTE
+    2: (1, 's'),   # ASCII
+    3: (2, 'H'),   # SHORT
+    4: (4, 'L'),   # LONG
+    5: (8, 'L'),   # RATIONAL
+    6: (1, 'b'),   # SBYTE
+    7: (1, 'B'),   # UNDEFINED
+    8: (2, 'h'),   # SSHORT
+    9: (4, 'l'),   # SLONG
+    10: (8, 'l'),  # SRATIONAL
+    11: (4, 'f'),  # FLOAT
+    12: (8, 'd'),  # DOUBLE
+}
+
+# Tags whose value is another IFD
+EXIF_POINTER = 0x8769
+GPS_POINTER = 0x8825
+
+COMPRESSION = {
+    1: 'Uncompressed', 2: 'CCITT 1D', 3: 'T4/Group 3 Fax', 4: 'T6/Group 4 Fax', 5: 'LZW',
+    6: 'JPEG (old-style)', 7: 'JPEG', 8: 'Adobe Deflate', 32773: 'PackBits', 32946: 'Deflate',
+    34712: 'JPEG 2000',
+}
+RESOLUTION_UNIT = {1: 'Not Absolute', 2: 'Pixels/Inch', 3: 'Pixels/Centimeter'}
+EXPOSURE_PROGRAM = {
+    0: 'Unidentified', 1: 'Manual', 2: 'Program Normal', 3: 'Aperture Priority', 4: 'Shutter Priority',
+    5: 'Program Creative', 6: 'Program Action', 7: 'Portrait Mode', 8: 'Landscape Mode',
+}
+METERING_MODE = {
+    0: 'Unidentified', 1: 'Average', 2: 'CenterWeightedAverage', 3: 'Spot', 4: 'MultiSpot',
+    5: 'Pattern', 6: 'Partial', 255: 'other',
+}
+FLASH = {
+    0: 'Flash did not fire', 1: 'Flash fired', 5: 'Strobe return light not detected',
+    7: 'Strobe return light detected', 9: 'Flash fired, compulsory flash mode',
+    13: 'Flash fired, compulsory flash mode, return light not detected',
+    15: 'Flash fired, compulsory flash mode, return light detected',
+    16: 'Flash did not fire, compulsory flash mode', 24: 'Flash did not fire, auto mode',
+    25: 'Flash fired, auto mode', 29: 'Flash fired, auto mode, return light not detected',
+    31: 'Flash fired, auto mode, return light detected', 32: 'No flash function',
+    65: 'Flash fired, red-eye reduction mode',
+    69: 'Flash fired, red-eye reduction mode, return light not detected',
+    71: 'Flash fired, red-eye reduction mode, return light detected',
+    73: 'Flash fired, compulsory flash mode, red-eye reduction mode',
+    77: 'Flash fired, compulsory flash mode, red-eye reduction mode, return light not detected',
+    79: 'Flash fired, compulsory flash mode, red-eye reduction mode, return light detected',
+    89: 'Flash fired, auto mode, red-eye reduction mode',
+    93: 'Flash fired, auto mode, return light not detected, red-eye reduction mode',
+    95: 'Flash fired, auto mode, return light detected, red-eye reduction mode',
+}
+COMPONENTS = {0: '', 1: 'Y', 2: 'Cb', 3: 'Cr', 4: 'Red', 5: 'Green', 6: 'Blue'}
+COLOR_SPACE = {1: 'sRGB', 2: 'Adobe RGB', 65535: 'Uncalibrated'}
+SENSING_METHOD = {
+    1: 'Not defined', 2: 'One-chip color area', 3: 'Two-chip color area', 4: 'Three-chip color area',
+    5: 'Color sequential area', 7: 'Trilinear', 8: 'Color sequential linear',
+}
+SCENE_TYPE = {1: 'Directly Photographed'}
+EXPOSURE_MODE = {0: 'Auto Exposure', 1: 'Manual Exposure', 2: 'Auto Bracket'}
+WHITE_BALANCE = {0: 'Auto', 1: 'Manual'}
+SCENE_CAPTURE_TYPE = {0: 'Standard', 1: 'Landscape', 2: 'Portrait', 3: 'Night'}
+VERSION_STRING = 'version'
+
+# Wanted tags per IFD: tag id -> (name, value mapping or None)
+IMAGE_TAGS = {
+    0x010F: ('Make', None),
+    0x0110: ('Model', None),
+}
+THUMBNAIL_TAGS = {
+    0x0103: ('Compression', COMPRESSION),
+    0x0128: ('ResolutionUnit', RESOLUTION_UNIT),
+    0x0201: ('JPEGInterchangeFormat', None),
+    0x0202: ('JPEGInterchangeFormatLength', None),
+}
+EXIF_TAGS = {
+    0x829A: ('ExposureTime', None),
+    0x829D: ('FNumber', None),
+    0x8822: ('ExposureProgram', EXPOSURE_PROGRAM),
+    0x8827: ('ISOSpeedRatings', None),
+    0x9000: ('ExifVersion', VERSION_STRING),
+    0x9003: ('DateTimeOriginal', None),
+    0x9010: ('OffsetTime', None),
+    0x9101: ('ComponentsConfiguration', COMPONENTS),
+    0x9201: ('ShutterSpeedValue', None),
+    0x9202: ('ApertureValue', None),
+    0x9203: ('BrightnessValue', None),
+    0x9204: ('ExposureBiasValue', None),
+    0x9207: ('MeteringMode', METERING_MODE),
+    0x9209: ('Flash', FLASH),
+    0x920A: ('FocalLength', None),
+    0xA000: ('FlashPixVersion', VERSION_STRING),
+    0xA001: ('ColorSpace', COLOR_SPACE),
+    0xA002: ('ExifImageWidth', None),
+    0xA003: ('ExifImageLength', None),
+    0xA217: ('SensingMethod', SENSING_METHOD),
+    0xA301: ('SceneType', SCENE_TYPE),
+    0xA402: ('ExposureMode', EXPOSURE_MODE),
+    0xA403: ('WhiteBalance', WHITE_BALANCE),
+    0xA405: ('FocalLengthIn35mmFilm', None),
+    0xA406: ('SceneCaptureType', SCENE_CAPTURE_TYPE),
+    0xA433: ('LensMake', None),
+    0xA434: ('LensModel', None),
+}
+GPS_TAGS = {
+    0x0001: ('GPSLatitudeRef', None),
+    0x0002: ('GPSLatitude', None),
+    0x0003: ('GPSLongitudeRef', None),
+    0x0004: ('GPSLongitude', None),
+}
+
+
+class Ratio(Fraction):
+    """Rational tag value that prints as "n/d", like exifread's Ratio"""
+
+    def __new__(cls, numerator=0, denominator=None):
+        try:
+            return super().__new__(cls, numerator, denominator)
+        except ZeroDivisionError:
+            ratio = super().__new__(cls)
+            ratio._numerator = numerator
+            ratio._denominator = denominator
+            return ratio
+
+    def __repr__(self):
+        return str(self)
+
+
+class ExifTag:
+    """Decoded tag exposing `values` and `printable` the way exifread's IfdTag does"""
+
+    __slots__ = ('tag', 'field_type', 'values', 'printable')
+
+    def __init__(self, tag: int, field_type: int, values, printable: str):
+        self.tag = tag
+        self.field_type = field_type
+        self.values = values
+        self.printable = printable
+
+    def __str__(self):
+        return self.printable
+
+    def __repr__(self):
+        return f"({self.tag:#06x}) {self.printable}"
+
+
+class _TiffReader:
+    # Decodes the wanted tags of a TIFF structure that lives at buffer[base:end]
+
+    def __init__(self, buffer, base: int, end: int):
+        self.buffer = buffer
+        self.base = base
+        self.end = end
+        order = bytes(buffer[base:base + 2])
+        if order == b'II':
+            self.byte_order = '<'
+        elif order == b'MM':
+            self.byte_order = '>'
+        else:
+            raise ValueError("Invalid TIFF byte order")
+        if self.unpack('H', 2)[0] != 42:
+            raise ValueError("Invalid TIFF header")
+
+    def unpack(self, code: str, offset: int, count: int = 1):
+        fmt = f"{self.byte_order}{count}{code}"
+        start = self.base + offset
+        if offset < 0 or start + struct.calcsize(fmt) > self.end:
+            raise ValueError("TIFF offset out of range")
+        return struct.unpack_from(fmt, self.buffer, start)
+
+    def read_ifd(self, offset: int, wanted: dict, prefix: str, tags: dict, pointers=()) -> dict:
+        """Decode the wanted tags of one IFD into `tags`, returning pointer tag values and the next IFD offset"""
+        found = {}
+        entry_count = self.unpack('H', offset)[0]
+        if entry_count > 1000:
+            raise ValueError("Corrupt IFD")
+        remaining = set(wanted) | set(pointers)
+        last_tag = max(remaining)
+        for index in range(entry_count):
+            entry = offset + 2 + index * 12
+            tag, field_type, count = self.unpack('HHL', entry)
+            # Entries are sorted by tag, so nothing wanted can follow once we're past the last one
+            if tag > last_tag:
+                break
+            if tag not in remaining:
+                continue
+            remaining.discard(tag)
+            if tag in pointers:
+                found[tag] = self.unpack('L', entry + 8)[0]
+            else:
+                decoded = self._decode(tag, field_type, count, entry, wanted[tag][1])
+                if decoded is not None:
+                    tags[f"{prefix} {wanted[tag][0]}"] = decoded
+            if not remaining:
+                break
+        next_offset_position = offset + 2 + entry_count * 12
+        try:
+            found['next'] = self.unpack('L', next_offset_position)[0]
+        except ValueError:
+            found['next'] = 0
+        return found
+
+    def _decode(self, tag: int, field_type: int, count: int, entry: int, mapping):
+        if field_type not in FIELD_TYPES or count == 0 or count > 4096:
+            return None
+        size, code = FIELD_TYPES[field_type]
+        data_offset = entry + 8 if size * count <= 4 else self.unpack('L', entry + 8)[0]
+        try:
+            if field_type == 2:
+                if data_offset < 0 or self.base + data_offset + count > self.end:
+                    return None
+                raw = bytes(self.buffer[self.base + data_offset:self.base + data_offset + count])
+                value = raw.split(b'\x00', 1)[0].decode('utf-8', errors='replace')
+                return ExifTag(tag, field_type, value, value)
+            if field_type in (5, 10):
+                raw = self.unpack(code, data_offset, count * 2)
+                values = [Ratio(raw[i], raw[i + 1]) for i in range(0, len(raw), 2)]
+            else:
+                values = list(self.unpack(code, data_offset, count))
+        except ValueError:
+            return None
+        return ExifTag(tag, field_type, values, self._printable(values, mapping))
+
+    @staticmethod
+    def _printable(values: list, mapping) -> str:
+        if mapping == VERSION_STRING:
+            return ''.join(chr(value) for value in values if 32 <= value < 127)
+        if mapping:
+            return ''.join(mapping.get(value, repr(value)) for value in values)
+        if len(values) == 1:
+            return str(values[0])
+        return str(values)
+
+
+def find_exif_segment(buffer) -> tuple:
+    """
+    Return the (start, end) of the TIFF data in a JPEG's Exif APP1 segment, or None
+    if the JPEG has no EXIF. Raises ValueError if the header runs past the buffer.
+    """
+    length = len(buffer)
+    if length < 4 or buffer[0] != 0xFF or buffer[1] != 0xD8:
+        return None
+    position = 2
+    while position + 4 <= length:
+        if buffer[position] != 0xFF:
+            return None
+        marker = buffer[position + 1]
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            position += 2
+            continue
+        # Start of scan or end of image: there is no more header to look at
+        if marker in (0xDA, 0xD9):
+            return None
+        segment_length = (buffer[position + 2] << 8) | buffer[position + 3]
+        segment_end = position + 2 + segment_length
+        if marker == 0xE1 and bytes(buffer[position + 4:position + 10]) == b'Exif\x00\x00':
+            if segment_end > length:
+                raise ValueError("Exif segment extends past the mapped region")
+            return position + 10, segment_end
+        position = segment_end
+    raise ValueError("JPEG header extends past the mapped region")
+
+
+def read_exif_tags(buffer) -> dict:
+    """
+    Decode the tags PhotoMetadata reports from a JPEG header buffer.
+
+    Returns a dict keyed like exifread ("Image Make", "EXIF FNumber", ...), an
+    empty dict for a JPEG without EXIF, or None if the buffer isn't a JPEG.
+    Raises ValueError if the EXIF header is corrupt or doesn't fit in the buffer.
+    """
+    if len(buffer) < 4 or buffer[0] != 0xFF or buffer[1] != 0xD8:
+        return None
+    segment = find_exif_segment(buffer)
+    if segment is None:
+        return {}
+    return read_tiff_tags(buffer, *segment)
+
+
+def read_tiff_tags(buffer, start: int = 0, end: int = None) -> dict:
+    """
+    Decode the wanted tags of a TIFF/EXIF structure stored at buffer[start:end].
+
+    Shared by the JPEG APP1 path and containers that embed raw EXIF, such as
+    the PNG eXIf chunk. Raises ValueError if the structure is corrupt.
+    """
+    reader = _TiffReader(buffer, start, len(buffer) if end is None else end)
+    tags = {}
+    ifd0 = reader.read_ifd(reader.unpack('L', 4)[0], IMAGE_TAGS, 'Image', tags, (EXIF_POINTER, GPS_POINTER))
+    if ifd0.get(EXIF_POINTER):
+        reader.read_ifd(ifd0[EXIF_POINTER], EXIF_TAGS, 'EXIF', tags)
+    if ifd0.get(GPS_POINTER):
+        reader.read_ifd(ifd0[GPS_POINTER], GPS_TAGS, 'GPS', tags)
+    if ifd0.get('next'):
+        reader.read_ifd(ifd0['next'], THUMBNAIL_TAGS, 'Thumbnail', tags)
+    return tags
+
+
+def read_exif_buffer(buffer) -> dict:
+    """
+    Read the EXIF tags from the first HEADER_LIMIT bytes of a mapped JPEG.
+
+    Returns None when the fast path can't handle the file and the caller
+    should fall back to exifread.
+    """
+    try:
+        return read_exif_tags(buffer[:HEADER_LIMIT])
+    except (ValueError, struct.error):
+        # A header we can't decode, or one that doesn't fit in the buffer: let exifread deal with it
+        return None
+
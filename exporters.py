@@ -0,0 +1,207 @@
+"""
+Streaming writers for exporting extraction results to files.
+
+Each writer takes results one file at a time through `write(file_path,
+metadata)` and holds at most a buffer's worth of rows in memory, so exports
+can be fed straight from MetadataExtractor.iter_metadata:
+
+    with open_writer('results.csv', 'csv-wide') as writer:
+        for file_path, metadata in extractor.iter_metadata(paths):
+            writer.write(file_path, metadata)
+
+Formats: 'csv' (the long "File:" / key / value layout shown in the GUI),
+'csv-wide' (one row per file, one column per tag), 'jsonl', and 'parquet'
+when pyarrow is installed.
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+
+# Buffer size for the output files
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class ExportWriter:
+    """Base class for export writers; use as a context manager so the output is completed on exit"""
+
+    def __init__(self, path: str = None):
+        # None writes to stdout where the format allows it
+        self.path = path
+        self.count = 0
+
+    def write(self, file_path: str, metadata: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_text(self, newline=None):
+        if self.path is None:
+            return sys.stdout
+        return open(self.path, 'w', encoding='utf-8', newline=newline, buffering=WRITE_BUFFER_SIZE)
+
+    def _close_text(self, output):
+        if output is sys.stdout:
+            output.flush()
+        else:
+            output.close()
+
+
+class LongCsvWriter(ExportWriter):
+    """Two-column CSV: a "File:" row per file, then its key/value rows and a blank separator row"""
+
+    def __init__(self, path: str = None):
+        super().__init__(path)
+        self.output = self._open_text(newline='')
+        self.writer = csv.writer(self.output)
+
+    def write(self, file_path: str, metadata: dict):
+        self.writer.writerow(("File:", os.path.basename(file_path)))
+        self.writer.writerows((key, value) for key, value in metadata.items())
+        self.writer.writerow(("", ""))
+        self.count += 1
+
+    def close(self):
+        self._close_text(self.output)
+
+
+class JsonlWriter(ExportWriter):
+    """One {"path", "metadata"} JSON object per line, keeping numbers and booleans typed"""
+
+    def __init__(self, path: str = None, flush_each: bool = None):
+        super().__init__(path)
+        self.output = self._open_text()
+        # Flush after every line so a consumer reading a pipe sees results immediately (the default for stdout)
+        self.flush_each = path is None if flush_each is None else flush_each
+
+    def write(self, file_path: str, metadata: dict):
+        self.output.write(json.dumps({'path': file_path, 'metadata': metadata}, default=str, ensure_ascii=False))
+        self.output.write('\n')
+        if self.flush_each:
+            self.output.flush()
+        self.count += 1
+
+    def close(self):
+        self._close_text(self.output)
+
+
+class WideCsvWriter(ExportWriter):
+    """
+    One row per file with a column per tag. The set of columns is only known
+    once every file has been seen, so rows are spooled to a temporary JSONL
+    file and the CSV is written from it on close; memory holds just the
+    column names.
+    """
+
+    def __init__(self, path: str = None):
+        super().__init__(path)
+        self.columns = {}  # tag name -> None, in first-seen order
+        self.spool = tempfile.TemporaryFile('w+', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+
+    def write(self, file_path: str, metadata: dict):
+        for key in metadata:
+            if key not in self.columns and key != 'Path':
+                self.columns[key] = None
+        self.spool.write(json.dumps([file_path, metadata], default=str, ensure_ascii=False))
+        self.spool.write('\n')
+        self.count += 1
+
+    def close(self):
+        output = self._open_text(newline='')
+        try:
+            writer = csv.DictWriter(output, fieldnames=['Path', *self.columns], restval='', extrasaction='ignore')
+            writer.writeheader()
+            self.spool.seek(0)
+            for line in self.spool:
+                file_path, metadata = json.loads(line)
+                writer.writerow({**metadata, 'Path': file_path})
+        finally:
+            self._close_text(output)
+            self.spool.close()
+
+
+class ParquetWriter(ExportWriter):
+    """
+    Long-format Parquet (path, tag, value, number) written one row group at a
+    time. `number` holds numeric values as float64 so they stay typed.
+    Requires pyarrow.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 100000):
+        if path is None:
+            raise ValueError("Parquet output needs a file path")
+        super().__init__(path)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('path', pyarrow.string()),
+            ('tag', pyarrow.string()),
+            ('value', pyarrow.string()),
+            ('number', pyarrow.float64()),
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self._columns = ([], [], [], [])
+
+    def write(self, file_path: str, metadata: dict):
+        paths, tags, values, numbers = self._columns
+        for key, value in metadata.items():
+            paths.append(file_path)
+            tags.append(str(key))
+            values.append(None if value is None else str(value))
+            numbers.append(float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None)
+        self.count += 1
+        if len(paths) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if self._columns[0]:
+            self.writer.write_table(self.pyarrow.Table.from_arrays(
+                [self.pyarrow.array(column, type=field.type) for column, field in zip(self._columns, self.schema)],
+                schema=self.schema,
+            ))
+            self._columns = ([], [], [], [])
+
+    def close(self):
+        self._write_row_group()
+        self.writer.close()
+
+
+# Format name -> writer class
+FORMATS = {
+    'csv': LongCsvWriter,
+    'csv-wide': WideCsvWriter,
+    'jsonl': JsonlWriter,
+    'parquet': ParquetWriter,
+}
+
+# Extension -> format, for picking a format from the output file name
+EXTENSION_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def open_writer(path: str = None, export_format: str = None) -> ExportWriter:
+    """Open a writer for `path` (None for stdout), taking the format from its extension unless given"""
+    if export_format is None:
+        extension = os.path.splitext(path)[1].lower() if path else ''
+        export_format = EXTENSION_FORMATS.get(extension, 'jsonl')
+    writer_class = FORMATS.get(export_format)
+    if writer_class is None:
+        raise ValueError(f"Unknown export format: {export_format}")
+    return writer_class(path)
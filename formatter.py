@@ -2,24 +2,32 @@
 A class for formatting various types of data.
     
 """
+import re
+from fractions import Fraction
+
 class Formatter:
 
     def format_gps(self, gps_coordinates: str) -> str:
         if gps_coordinates is None:
             return "Unknown"
-        latitude, longitude, _ = gps_coordinates.split('+')
+        # ISO 6709 "+DD.DDDD+DDD.DDDD[+AAA.AAA]/": signed latitude, longitude and optional altitude
+        match = re.match(r'([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)', gps_coordinates)
+        if match is None:
+            return "Unknown"
+        latitude, longitude = match.group(1).lstrip('+'), match.group(2).lstrip('+')
         return f"https://www.google.com/maps/search/?api=1&query={latitude},{longitude}"
     
     def convert_gps(self, degrees, minutes, seconds, direction):
         if degrees is None or minutes is None or seconds is None or direction is None:
             return "Unknown"
-        decimal_minutes = minutes + seconds / 60
+        # EXIF rationals are Fractions, which only support float format specs from Python 3.12
+        decimal_minutes = float(minutes) + float(seconds) / 60
         return f"{degrees}°{decimal_minutes:.4f}'{direction}"
     
     def format_exposure_time(self, exposure_time):
         if exposure_time is None:
             return "Unknown"
-        numerator, denominator = map(int, str(exposure_time).split('/'))
+        numerator, denominator = _ratio(exposure_time)
         if denominator == 1:
             return f"{numerator} sec"
         elif denominator > 1:
@@ -87,7 +95,7 @@ class Formatter:
     def format_focal_length(self, FocalLength):
         if FocalLength is None:
             return "Unknown"
-        numerator, denominator = map(int, str(FocalLength).split('/'))
+        numerator, denominator = _ratio(FocalLength)
         focal_length_mm = numerator / denominator
         if focal_length_mm < 10:
             return f"{focal_length_mm:.1f} mm"
@@ -98,7 +106,7 @@ class Formatter:
     def format_brightness_value(self, BrightnessValue):
         if BrightnessValue is None:
             return "Unknown"
-        numerator, denominator = map(int, str(BrightnessValue).split('/'))
+        numerator, denominator = _ratio(BrightnessValue)
         brightness_value = numerator / denominator
         return f"{brightness_value:.2f}"
     
@@ -106,7 +114,7 @@ class Formatter:
     def format_aperture_value(self, ApertureValue):
         if ApertureValue is None:
             return "Unknown"
-        numerator, denominator = map(int, str(ApertureValue).split('/'))
+        numerator, denominator = _ratio(ApertureValue)
         aperture_value = numerator / denominator
         return f"f/{aperture_value:.2f}"
     
@@ -114,7 +122,13 @@ class Formatter:
     def format_shutter_speed(self, ShutterSpeedValue):
         if ShutterSpeedValue is None:
             return "Unknown"
-        numerator, denominator = map(int, str(ShutterSpeedValue).split('/'))
+        numerator, denominator = _ratio(ShutterSpeedValue)
         shutter_speed = numerator / denominator
         if shutter_speed >= 1:
-            return f"{int(shutter_speed)} sec"
\ No newline at end of file
+            return f"{int(shutter_speed)} sec"
+
+
+def _ratio(value) -> tuple:
+    # (numerator, denominator) of an EXIF rational, which prints whole values without "/1"
+    fraction = Fraction(str(value))
+    return fraction.numerator, fraction.denominator
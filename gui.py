@@ -1,26 +1,42 @@
-import csv
-import os
-from database import Database
-from metadata import MetadataExtractor
+import importlib.util
 from dragdrop import DragDropWidget
+from workers import InspectWorker, ExportWorker, FileExportWorker
+from tablemodel import MetadataTableModel, MetadataFilterProxyModel
+from search import MetadataIndex, parse_query
 from PyQt5.QtWidgets import (QSizePolicy,
                              QWidget, 
                              QVBoxLayout, 
                              QHBoxLayout, 
                              QPushButton,  
                              QFileDialog,  
-                             QTableWidget,
-                             QProgressBar, 
-                             QTableWidgetItem)
-from PyQt5.QtCore import Qt
+                             QTableView,
+                             QHeaderView,
+                             QLineEdit,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 
+PARQUET_FILTER = "Parquet (*.parquet)"
+
+# File dialog filter -> export format; Parquet is only offered when pyarrow is installed
+EXPORT_FILTERS = {
+    "CSV Files (*.csv)": 'csv',
+    "Wide CSV, one row per file (*.csv)": 'csv-wide',
+    "JSON Lines (*.jsonl)": 'jsonl',
+    PARQUET_FILTER: 'parquet',
+}
+EXPORT_EXTENSIONS = {'csv': '.csv', 'csv-wide': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
 class Gui(QWidget):
     def __init__(self):
         super().__init__()
         self.file_paths = []
         self.inspected_files = set()  # Set to keep track of inspected files
         self.exported_files = set()  
+        self.metadata_results = {}  # Extracted metadata by file path, exported as-is to the database
+        self.search_index = MetadataIndex()  # Inverted index over metadata_results for the filter box
+        self.query = None  # Query currently applied through the filter box, if any
+        self.worker = None  # Background job currently running, if any
         self.initUI()
 
     def initUI(self):
@@ -100,9 +116,47 @@ class Gui(QWidget):
         self.right_layout = QVBoxLayout()
         self.right_layout.setContentsMargins(20, 20, 20, 20)
         self.right_layout.setSpacing(20)
+        self.right_layout.addWidget(self.create_filter_box())
         self.right_layout.addWidget(self.create_data_table())
         self.right_frame.setLayout(self.right_layout)
 
+    def create_filter_box(self):
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter tags and values, or query e.g. ISO >= 800 AND Camera Make = Canon")
+        self.filter_box.setClearButtonEnabled(True)
+        self.filter_box.setStyleSheet("""
+            QLineEdit {
+                background-color: #2a2f33;
+                border: 2px solid #1a94d6;
+                border-radius: 10px;
+                padding: 5px;
+                font: 10pt "Open Sans";
+            }
+        """)
+        # Re-filter once typing pauses rather than on every keystroke
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_box.textChanged.connect(self.filter_timer.start)
+        return self.filter_box
+
+    def apply_filter(self):
+        # "Tag op value" text is answered from the metadata index, anything else filters rows by substring
+        text = self.filter_box.text()
+        try:
+            query = parse_query(text)
+        except ValueError as e:
+            self._handle_error(str(e))
+            return
+        self.query = query
+        if query is None:
+            self.table_proxy.set_file_filter(None)
+            self.table_proxy.set_filter_text(text)
+        else:
+            self.table_proxy.set_filter_text("")
+            self.table_proxy.set_file_filter(self.search_index.search(query))
+
     def create_main_layout(self):
         self.main_layout = QHBoxLayout()
         self.main_layout.setContentsMargins(20, 20, 20, 20)
@@ -115,7 +169,7 @@ class Gui(QWidget):
 
     def create_drag_drop_widget(self):
         self.drag_drop_widget = DragDropWidget()
-        self.drag_drop_widget.upload_file_signal.connect(self.add_file)
+        self.drag_drop_widget.upload_files_signal.connect(self.add_files)
         self.drag_drop_widget.setFixedSize(500, 500)
         self.drag_drop_widget.setStyleSheet("background-color: #444444; border-radius: 10px;")
         return self.drag_drop_widget
@@ -158,35 +212,45 @@ class Gui(QWidget):
         ]
         for button in buttons:
             btn = self.create_button(button["text"], button["slot"])
-            if button["text"] == "Export to File":
+            if button["text"] == "Clear":
+                self.clear_button = btn
+            elif button["text"] == "Export to File":
                 self.export_file_button = btn
                 self.export_file_button.setEnabled(False)  # Disable the button by default
             layout.addWidget(btn)
         return layout
 
     def create_data_table(self):
-        table = QTableWidget()
-        table.setColumnCount(2)
-        table.setHorizontalHeaderItem(0, QTableWidgetItem("Tag Name"))
-        table.setHorizontalHeaderItem(1, QTableWidgetItem("Value"))
+        # Rows live in the model; the view only asks for the ones it paints
+        self.table_model = MetadataTableModel(self)
+        self.table_proxy = MetadataFilterProxyModel(self)
+        self.table_proxy.setSourceModel(self.table_model)
+        table = QTableView()
+        table.setModel(self.table_proxy)
         widths = [180, 360]  
         for i, width in enumerate(widths):
             table.setColumnWidth(i, width)
         table.verticalHeader().setVisible(False)
+        # Fixed row heights so the view never measures rows it isn't showing
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table.setWordWrap(False)
+        # No sort until a header is clicked, so results stay in completion order
+        table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        table.setSortingEnabled(True)
         table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: #2a2f33;
                 border: 3px solid #1a94d6;
                 border-radius: 10px;
                 font: 10pt "Open Sans";
                 outline: none;
             }
-            QTableWidget::item {
+            QTableView::item {
                 border: none;
                 padding: 10px;
                 outline: none;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #1a94d6;
                 color: white;
                 outline: none;
@@ -200,15 +264,35 @@ class Gui(QWidget):
                 border: none;
                 outline: none;
             }
+            QScrollBar:vertical {
+                background: #2a2f33;
+                width: 10px;
+                margin: 0;
+            }
+            QScrollBar::handle:vertical {
+                background: #1a94d6;
+                border-radius: 5px;
+                min-height: 30px;
+            }
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+                height: 0;
+            }
         """)
         table.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        table.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        # Large result sets need a way to scroll through them
+        table.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.table = table
         return table
     
     def inspect_files(self):
         """
-        Inspect files and extract metadata.
+        Inspect files and extract metadata in a background worker.
         """
+        # While a job runs the Inspect button pauses and resumes it
+        if self.worker is not None:
+            self.toggle_pause()
+            return
+
         new_files = [file_path for file_path in self.file_paths if file_path not in self.inspected_files]
         if not new_files:
             self._handle_error("No new files to inspect.")
@@ -218,45 +302,33 @@ class Gui(QWidget):
         self.loading_bar.setValue(0)
         self.loading_bar.setFormat("Inspecting files...")
         self.loading_bar.setTextVisible(True)
+        self.update_table([])
 
-        try:
-            metadata_extractor = MetadataExtractor(new_files)
-            metadata_dict = metadata_extractor.extract_metadata()  # Call the function
-            table_data = []
-            total_files = len(new_files)
-
-            for i, (file_path, metadata) in enumerate(metadata_dict.items()):
-                # Add file path to table data
-                table_data.append(("File:", os.path.basename(file_path)))
+        worker = InspectWorker(new_files)
+        worker.result_ready.connect(self._on_metadata_ready)
+        self._start_worker(worker)
 
-                # Add metadata to table data
-                for key, value in metadata.items():
-                    table_data.append((key, value))
+    def _on_metadata_ready(self, file_path, metadata):
+        # Rows are appended as each file finishes, in completion order
+        self.metadata_results[file_path] = metadata
+        self.search_index.add(file_path, metadata)
+        # A query in the filter box applies to files that arrive after it too
+        if self.query is not None and self.query.matches(file_path, metadata):
+            self.table_proxy.add_filtered_file(file_path)
 
-                # Add a blank line after all metadata for a file has been extracted
-                table_data.append(("", ""))
+        # Add the file's header, metadata and a blank line after it to the table
+        self.table_model.append_file(file_path, metadata)
 
-                # Update progress bar
-                progress = int((i + 1) / total_files * 100)
-                self.loading_bar.setValue(progress)
-                self.loading_bar.setFormat(f"Inspecting files... ({progress}%)")
-
-                # Mark the file as inspected
-                self.inspected_files.add(file_path)
-
-            self.update_table(table_data)
-            self.loading_bar.setFormat("Done!")
-            self.loading_bar.setValue(100)
-            self.export_button.setEnabled(True)
-        except RuntimeError as e:
-            self._handle_error(f"Error inspecting files: {str(e)}")
+        # Mark the file as inspected
+        self.inspected_files.add(file_path)
            
     def export_to_database(self):
         """
-        Export data to Firebase Realtime Database.
+        Export data to Firebase Realtime Database in a background worker.
         """
-        new_files = [file_path for file_path in self.file_paths if file_path not in self.exported_files]
-        if not new_files:
+        new_results = {file_path: self.metadata_results[file_path] for file_path in self.file_paths
+                       if file_path in self.metadata_results and file_path not in self.exported_files}
+        if not new_results:
             self._handle_error("No new files to export.")
             self.export_button.setEnabled(False)  # Disable the export button
             return
@@ -265,32 +337,53 @@ class Gui(QWidget):
         self.loading_bar.setFormat("Exporting to database...")
         self.loading_bar.setTextVisible(True)
 
-        try:
-            rows = self._prepare_data_for_export()
-            if rows is None:
-                self._handle_error("Error preparing data")
-                return
-
-            temp_file_path = "temp.csv"
-
-            with open(temp_file_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(rows)
-
-            database = Database()
-            total_files = len(new_files)
-            for i, file_path in enumerate(new_files):
-                try:
-                    database.send_data_to_firebase(temp_file_path)
-                    self._update_progress_bar(int((i + 1) / total_files * 100), f"Exporting to database... ({int((i + 1) / total_files * 100)}%)")
-                    self.exported_files.add(file_path)
-                except Exception as e:
-                    self._handle_error(f"Error sending data to Firebase: {str(e)}")
-            self._remove_temp_file(temp_file_path)
+        worker = ExportWorker(new_results)
+        worker.file_exported.connect(self.exported_files.add)
+        self._start_worker(worker)
+
+    def _start_worker(self, worker):
+        # Run a job off the event loop; Inspect becomes Pause/Resume and Clear becomes Cancel
+        self.worker = worker
+        worker.progress.connect(self._update_progress_bar)
+        worker.failed.connect(self._handle_error)
+        worker.completed.connect(self._on_worker_completed)
+        self.inspect_button.setText("Pause")
+        self.inspect_button.setEnabled(True)
+        self.clear_button.setText("Cancel")
+        self.export_button.setEnabled(False)
+        self.export_file_button.setEnabled(False)
+        worker.start()
+
+    def toggle_pause(self):
+        if self.worker is None:
+            return
+        if self.worker.is_paused():
+            self.worker.resume()
+            self.inspect_button.setText("Pause")
+        else:
+            self.worker.pause()
+            self.inspect_button.setText("Resume")
+            self.loading_bar.setFormat(self.loading_bar.format() + " (paused)")
+
+    def cancel_worker(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.loading_bar.setFormat("Cancelling...")
+
+    def _on_worker_completed(self, cancelled):
+        worker, self.worker = self.worker, None
+        if worker is not None:
+            worker.wait()
+            worker.deleteLater()
+        self.inspect_button.setText("Inspect")
+        self.clear_button.setText("Clear")
+        self.inspect_button.setEnabled(any(path not in self.inspected_files for path in self.file_paths))
+        self._update_export_buttons()
+        if cancelled:
+            self.loading_bar.setFormat("Cancelled")
+        elif not self.loading_bar.format().startswith("Error"):
             self.loading_bar.setFormat("Done!")
             self.loading_bar.setValue(100)
-        except RuntimeError as e:
-            self._handle_error(f"Error exporting to database: {str(e)}")
 
 
     def _update_progress_bar(self, value, format):
@@ -299,86 +392,58 @@ class Gui(QWidget):
 
 
     def update_table(self, table_data):
-        table = self.right_layout.itemAt(0).widget()
-        table.setRowCount(len(table_data))
-
-        for row, (key, value) in enumerate(table_data):
-            font = QFont("Roboto", 10)
-            if key == "File:":
-                font.setBold(True)
-
-            key_item = QTableWidgetItem(key)
-            key_item.setFont(font)
-            key_item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)  # Left align the text
-            table.setItem(row, 0, key_item)
-
-            value_item = QTableWidgetItem(str(value))
-            value_item.setFont(font)
-            table.setItem(row, 1, value_item)
-            
-        if len(table_data) > 4:
+        self.table_model.clear()
+        self.append_table_rows(table_data)
+        self._update_export_buttons()
+
+    def append_table_rows(self, table_data):
+        self.table_model.append_rows(table_data)
+
+    def _update_export_buttons(self):
+        if self.table_model.rowCount() > 4:
             self.export_button.setEnabled(True)
             self.export_file_button.setEnabled(True)
         else:
             self.export_button.setEnabled(False)
             self.export_file_button.setEnabled(False)
             
-    def add_file(self, file_path):
-        self.file_paths.append(file_path)
-        # Reset the flags for the new file
-        self.inspected_files.discard(file_path)
-        self.exported_files.discard(file_path)
+    def add_files(self, file_paths):
+        self.file_paths.extend(file_paths)
+        # Reset the flags for the new files
+        for file_path in file_paths:
+            self.inspected_files.discard(file_path)
+            self.exported_files.discard(file_path)
+            self.metadata_results.pop(file_path, None)
         if self.file_paths:  # If there are files in the list
             self.inspect_button.setEnabled(True)  # Enable the inspect button
             
-    def _prepare_data_for_export(self):
-        table = self.right_layout.itemAt(0).widget()
-        rows = []
-        file_name = None
-
-        for row in range(table.rowCount()):
-            row_data = [item.text() if item else "" for item in [table.item(row, column) for column in range(table.columnCount())]]
-            if row_data and row_data[0] == "File:":
-                file_name = row_data[1]
-            rows.append(row_data)
-        return rows
-
     def export_to_file(self):
-        """Export data to a file."""
-        rows = self._prepare_data_for_export()
-        if not rows:
+        """Export the extracted metadata to a file in a background worker."""
+        results = {file_path: self.metadata_results[file_path] for file_path in self.file_paths
+                   if file_path in self.metadata_results}
+        if not results:
             return
 
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save File", "", "CSV Files (*.csv)")
+        filters = dict(EXPORT_FILTERS)
+        if importlib.util.find_spec('pyarrow') is None:
+            filters.pop(PARQUET_FILTER)
+        file_path, selected_filter = QFileDialog.getSaveFileName(self, "Save File", "", ";;".join(filters))
         if file_path:
-            with open(file_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(rows)
-            self.update_table([("Success", "Data exported to file successfully.")])
-            self.data_exported_to_file = True  # Set the flag to True
+            export_format = filters.get(selected_filter, 'csv')
+            extension = EXPORT_EXTENSIONS[export_format]
+            if not file_path.lower().endswith(extension):
+                file_path += extension
+            self.loading_bar.setValue(0)
+            self.loading_bar.setFormat("Exporting to file...")
+            self.loading_bar.setTextVisible(True)
+            worker = FileExportWorker(results, file_path, export_format)
+            worker.completed.connect(self._on_file_export_completed)
+            self._start_worker(worker)
+
+    def _on_file_export_completed(self, cancelled):
+        if not cancelled:
             self.export_button.setEnabled(False)  # Disable the export to database button
     
-    def _write_data_to_csv(self, rows, file_path):
-        """Write data to a CSV file."""
-        if os.path.exists(file_path):
-            file_name, file_extension = os.path.splitext(file_path)
-            i = 1
-            while os.path.exists(file_path):
-                file_path = f"{file_name}_{i}{file_extension}"
-                i += 1
-            with open(file_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(rows)
-            
-    def _remove_temp_file(self, file_path):
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                self._handle_error(f"Error removing temporary CSV file: {str(e)}")
-        else:
-            self._handle_error(f"File not found: '{file_path}'")
-
     def _handle_error(self, error_message):
         """
         Handle errors by displaying an error message and logging the error.
@@ -389,16 +454,21 @@ class Gui(QWidget):
         self.loading_bar.setValue(0)  # Reset the progress bar value
                   
     def clear_all(self):
-        self.right_layout.itemAt(0).widget().setRowCount(0)  # Clear the table
+        # While a job runs the Clear button cancels it instead
+        if self.worker is not None:
+            self.cancel_worker()
+            return
+        self.table_model.clear()  # Clear the table
         self.export_button.setEnabled(False)  # Disable the export buttons
         self.export_file_button.setEnabled(False)
-        self.data_exported_to_file = False  # Reset the flag
         self.update_table([])  # Clear the table data
         self.file_paths = []  # Clear the file paths
-        self.drag_drop_widget.uploaded_files_listbox.clear()  # Clear the uploaded files listbox
+        self.drag_drop_widget.clear_files()  # Clear the uploaded files listbox
         self.inspect_button.setEnabled(False)  # Disable the inspect button
         self.loading_bar.setValue(0)  # Reset the progress bar
         self.loading_bar.setFormat("")  # Clear the progress bar text
         self.inspected_files.clear()
         self.exported_files.clear()
+        self.metadata_results.clear()
+        self.search_index.clear()
         
@@ -0,0 +1,290 @@
+"""
+Per-file, per-stage timings and per-extractor counters for extraction runs.
+
+Pass an Instrumentation to MetadataExtractor and it records how long each
+stage took for every file:
+
+    stat       os.stat of the path
+    cache      looking the file up in the persistent cache
+    open       opening and mapping the file (FileSource)
+    detect     picking the extractor from the file's magic bytes
+    parse      running the extractor
+    normalize  replace_none_with_default
+    sink       writing the result out, timed by the caller with stage()
+
+along with files, bytes, errors and cache hits per extractor. Stages are timed
+in whichever thread or worker process ran them, so a file's stages add up to
+the work done on it rather than the time it waited in a queue. Bytes are the
+sizes of the files handled; most extractors only touch part of each file
+through the mapping.
+
+    instrumentation = Instrumentation(top=20)
+    with MetadataExtractor([], instrumentation=instrumentation) as extractor:
+        for file_path, metadata in extractor.iter_metadata(paths):
+            with instrumentation.stage(file_path, 'sink'):
+                sink.write({file_path: metadata})
+    instrumentation.write_json('stats.json')
+    instrumentation.write_prometheus('/var/lib/node_exporter/metaxtractor.prom')
+    capture_profiles([entry['path'] for entry in instrumentation.slowest()], 'profiles')
+"""
+import cProfile
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+STAGES = ('stat', 'cache', 'open', 'detect', 'parse', 'normalize', 'sink')
+
+# Upper bounds of the per-file extraction time histogram, in seconds
+FILE_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Recently recorded files kept aside so a sink stage timed after the result is handed out still counts
+RECENT_FILES = 1024
+
+UNKNOWN_EXTRACTOR = 'unknown'
+
+
+class _ExtractorStats:
+    # Counters and stage totals for the files one extractor handled
+
+    __slots__ = ('files', 'bytes', 'errors', 'cache_hits', 'stages', 'buckets', 'seconds')
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.buckets = [0] * (len(FILE_SECONDS_BUCKETS) + 1)  # the last one is +Inf
+        self.seconds = 0.0  # extraction time, i.e. every stage but sink
+
+    def as_dict(self) -> dict:
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'seconds': round(self.seconds, 6),
+            'mean_ms': round(self.seconds / self.files * 1000, 3) if self.files else None,
+            'stages': {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+        }
+
+
+class Instrumentation:
+    """
+    Thread-safe collector of stage timings and counters.
+
+    `top` is the number of slowest files kept for the report and
+    `error_samples` the number of error messages kept per extractor.
+    """
+
+    def __init__(self, top: int = 20, error_samples: int = 5):
+        self.top = top
+        self.error_samples = error_samples
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.extractors = {}  # extractor name -> _ExtractorStats
+        self.stages = dict.fromkeys(STAGES, 0.0)  # totals, including files with no record such as duplicates
+        self.errors = {}  # extractor name -> [(path, error)]
+        self._recent = OrderedDict()  # path -> [seconds, extractor name, stages]
+        self._slowest = []  # min-heap of (seconds, sequence, path, extractor name, stages)
+        self._sequence = itertools.count()
+
+    def record(self, file_path: str, extractor, stages: dict, size: int = 0, error: str = None,
+               cache_hit: bool = False):
+        """Account for one extracted file; `extractor` is the class used (or None) and `stages` {stage: seconds}"""
+        name = getattr(extractor, '__name__', None) or UNKNOWN_EXTRACTOR
+        seconds = sum(stages.values())
+        with self.lock:
+            stats = self.extractors.get(name)
+            if stats is None:
+                stats = self.extractors[name] = _ExtractorStats()
+            stats.files += 1
+            stats.bytes += size
+            stats.cache_hits += cache_hit
+            stats.seconds += seconds
+            for stage, elapsed in stages.items():
+                stats.stages[stage] = stats.stages.get(stage, 0.0) + elapsed
+                self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+            position = 0
+            while position < len(FILE_SECONDS_BUCKETS) and seconds > FILE_SECONDS_BUCKETS[position]:
+                position += 1
+            stats.buckets[position] += 1
+            if error is not None:
+                stats.errors += 1
+                samples = self.errors.setdefault(name, [])
+                if len(samples) < self.error_samples:
+                    samples.append((file_path, error))
+            self._recent[file_path] = [seconds, name, dict(stages)]
+            self._recent.move_to_end(file_path)
+            if len(self._recent) > RECENT_FILES:
+                self._rank(*self._recent.popitem(last=False))
+
+    def add_stage(self, file_path: str, stage: str, seconds: float):
+        """Add time spent on a file after it was recorded, such as writing it to a sink"""
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            entry = self._recent.get(file_path)
+            if entry is None:
+                return
+            entry[0] += seconds
+            entry[2][stage] = entry[2].get(stage, 0.0) + seconds
+            stats = self.extractors[entry[1]]
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, file_path: str, stage: str):
+        """Time the body of a with block as a stage of `file_path`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(file_path, stage, time.perf_counter() - start)
+
+    def _rank(self, file_path: str, entry: list):
+        # Offer a finished file to the bounded heap of slowest files; called with the lock held
+        item = (entry[0], next(self._sequence), file_path, entry[1], entry[2])
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest(self, count: int = None) -> list:
+        """The slowest files, slowest first, as {"path", "extractor", "seconds", "stages"} dicts"""
+        with self.lock:
+            recent = ((entry[0], 0, file_path, entry[1], entry[2]) for file_path, entry in self._recent.items())
+            ranked = heapq.nlargest(count or self.top, itertools.chain(self._slowest, recent),
+                                    key=lambda item: item[0])
+        return [{'path': file_path, 'extractor': name, 'seconds': round(seconds, 6),
+                 'stages': {stage: round(elapsed, 6) for stage, elapsed in stages.items()}}
+                for seconds, _, file_path, name, stages in ranked]
+
+    def summary(self) -> dict:
+        """Totals, per-extractor counters, the slowest files and sample errors as a JSON-friendly dict"""
+        slowest = self.slowest()
+        with self.lock:
+            extractors = {name: stats.as_dict() for name, stats in sorted(self.extractors.items())}
+            errors = [{'path': file_path, 'extractor': name, 'error': error}
+                      for name, samples in sorted(self.errors.items()) for file_path, error in samples]
+            stages = {stage: round(seconds, 6) for stage, seconds in self.stages.items()}
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.perf_counter() - self._start, 3),
+            'files': sum(stats['files'] for stats in extractors.values()),
+            'bytes': sum(stats['bytes'] for stats in extractors.values()),
+            'errors': sum(stats['errors'] for stats in extractors.values()),
+            'cache_hits': sum(stats['cache_hits'] for stats in extractors.values()),
+            'stages': stages,
+            'extractors': extractors,
+            'slowest': slowest,
+            'error_samples': errors,
+        }
+
+    def write_json(self, path: str):
+        _write_atomically(path, json.dumps(self.summary(), indent=1) + '\n')
+
+    def prometheus(self) -> str:
+        """The counters in Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            # samples are (name suffix, ((label, value), ...), value)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if labels else f"{name}{suffix} {value}")
+
+        with self.lock:
+            extractors = sorted(self.extractors.items())
+            for field, help_text in (('files', 'Files extracted.'),
+                                     ('bytes', 'Size of the files extracted.'),
+                                     ('errors', 'Files whose extraction returned an error.'),
+                                     ('cache_hits', 'Files answered from the metadata cache.')):
+                metric(f'metaxtractor_{field}_total', 'counter', help_text,
+                       [('', (('extractor', name),), getattr(stats, field)) for name, stats in extractors])
+            metric('metaxtractor_stage_seconds_total', 'counter', 'Time spent in each stage.',
+                   [('', (('extractor', name), ('stage', stage)), f"{seconds:.6f}")
+                    for name, stats in extractors for stage, seconds in stats.stages.items()])
+            histogram = []
+            for name, stats in extractors:
+                for bound, count in zip((*FILE_SECONDS_BUCKETS, '+Inf'), itertools.accumulate(stats.buckets)):
+                    histogram.append(('_bucket', (('extractor', name), ('le', str(bound))), count))
+                histogram.append(('_sum', (('extractor', name),), f"{stats.seconds:.6f}"))
+                histogram.append(('_count', (('extractor', name),), stats.files))
+            metric('metaxtractor_file_seconds', 'histogram', 'Extraction time per file, not counting the sink.',
+                   histogram)
+        metric('metaxtractor_run_seconds', 'gauge', 'Seconds since the run started.',
+               [('', (), f"{time.perf_counter() - self._start:.3f}")])
+        metric('metaxtractor_run_start_timestamp_seconds', 'gauge', 'Unix time the run started.',
+               [('', (), f"{self.started.timestamp():.3f}")])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Write the counters for the node_exporter textfile collector, replacing the file atomically"""
+        _write_atomically(path, self.prometheus())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomically(path: str, text: str):
+    # Readers such as the textfile collector never see a half-written file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+def capture_profiles(file_paths: list, directory: str, trace_memory: bool = False, top_allocations: int = 10) -> list:
+    """
+    Extract each file again in the calling thread under cProfile and write
+    DIRECTORY/NN-<file name>.prof (open with pstats or snakeviz). With
+    `trace_memory` tracemalloc runs as well, and the peak traced memory and the
+    largest allocation sites go to a .txt next to each profile. Each file is
+    extracted once untraced first so imports don't swamp the profile; it is
+    therefore in the page cache, and I/O waits won't show. Returns
+    {"path", "seconds", "profile", "memory", "peak_bytes"} for each file.
+    """
+    from metadata import parse_file
+    from registry import registry
+
+    os.makedirs(directory, exist_ok=True)
+    captured = []
+    for number, file_path in enumerate(file_paths, 1):
+        base = os.path.join(directory, f"{number:02d}-{os.path.basename(file_path)}")
+        extractor = registry.for_extension(os.path.splitext(file_path)[1])
+        parse_file(extractor, file_path)
+        profiler = cProfile.Profile()
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            parse_file(extractor, file_path)
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+        profiler.dump_stats(base + '.prof')
+        entry = {'path': file_path, 'seconds': round(seconds, 6), 'profile': base + '.prof'}
+        if trace_memory:
+            statistics = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(f"{file_path}\npeak traced memory: {peak} bytes\n\n")
+                for statistic in statistics[:top_allocations]:
+                    f.write(f"{statistic}\n")
+            entry.update(memory=base + '.txt', peak_bytes=peak)
+        captured.append(entry)
+    return captured
@@ -0,0 +1,422 @@
+"""
+Minimal ISO base media file (MP4 / QuickTime .mov) reader.
+
+Top-level boxes are walked with seeks until `moov` is found, wherever it is in
+the file, and inside it only the boxes that carry metadata are read: mvhd,
+tkhd, mdhd, hdlr, stsd, the stsz header, and the udta / meta tag lists. Sample
+tables and media data are never read, so a multi-GB recording costs a few
+small reads.
+"""
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+# Box types that can appear at the top level of an MP4 or QuickTime file
+TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid', b'meta', b'styp', b'sidx'}
+
+# Upper bound on boxes we read whole (stsd, udta, meta); anything bigger is skipped
+MAX_BOX_SIZE = 4 * 1024 * 1024
+
+# MP4 and QuickTime timestamps count seconds from 1904-01-01 UTC
+EPOCH_1904 = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+# Video sample entry codes -> (format, format info, internet media type)
+VIDEO_FORMATS = {
+    b'avc1': ('AVC', 'Advanced Video Codec', 'video/H264'),
+    b'avc3': ('AVC', 'Advanced Video Codec', 'video/H264'),
+    b'hvc1': ('HEVC', 'High Efficiency Video Coding', 'video/H265'),
+    b'hev1': ('HEVC', 'High Efficiency Video Coding', 'video/H265'),
+    b'mp4v': ('MPEG-4 Visual', None, 'video/MP4V-ES'),
+    b'av01': ('AV1', 'AOMedia Video 1', 'video/AV1'),
+    b'vp09': ('VP9', None, None),
+    b'apcn': ('ProRes', None, None),
+    b'apch': ('ProRes', None, None),
+    b'apcs': ('ProRes', None, None),
+    b'apco': ('ProRes', None, None),
+    b'ap4h': ('ProRes', None, None),
+    b'jpeg': ('JPEG', None, None),
+}
+# Audio sample entry codes -> (format, compression mode)
+AUDIO_FORMATS = {
+    b'mp4a': ('AAC', 'Lossy'),
+    b'ac-3': ('AC-3', 'Lossy'),
+    b'ec-3': ('E-AC-3', 'Lossy'),
+    b'Opus': ('Opus', 'Lossy'),
+    b'.mp3': ('MPEG Audio', 'Lossy'),
+    b'alac': ('ALAC', 'Lossless'),
+    b'fLaC': ('FLAC', 'Lossless'),
+    b'lpcm': ('PCM', 'Lossless'),
+    b'sowt': ('PCM', 'Lossless'),
+    b'twos': ('PCM', 'Lossless'),
+    b'ipcm': ('PCM', 'Lossless'),
+}
+AAC_OBJECT_TYPES = {
+    1: 'Advanced Audio Codec Main',
+    2: 'Advanced Audio Codec Low Complexity',
+    3: 'Advanced Audio Codec Scalable Sampling Rate',
+    4: 'Advanced Audio Codec Long Term Prediction',
+    5: 'Advanced Audio Codec Low Complexity with Spectral Band Replication',
+    29: 'Advanced Audio Codec Low Complexity with Spectral Band Replication and Parametric Stereo',
+}
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+AVC_PROFILES = {
+    66: 'Baseline', 77: 'Main', 88: 'Extended', 100: 'High', 110: 'High 10', 122: 'High 4:2:2',
+    244: 'High 4:4:4 Predictive',
+}
+# AVC profiles whose avcC record carries chroma format and bit depth
+AVC_HIGH_PROFILES = {100, 110, 122, 144, 244}
+HEVC_PROFILES = {1: 'Main', 2: 'Main 10', 3: 'Main Still Picture', 4: 'Format Range'}
+
+# Well-known types of QuickTime metadata 'data' atoms
+DATA_UTF8 = 1
+DATA_UTF16 = 2
+DATA_SIGNED = 21
+DATA_UNSIGNED = 22
+DATA_FLOAT32 = 23
+DATA_FLOAT64 = 24
+
+
+class IsoBmffError(ValueError):
+    """Raised when a file isn't an ISO-BMFF movie the fast path can describe"""
+
+
+def iter_boxes(f, start: int, end: int):
+    """Yield (type, payload start, payload end) for the boxes in [start, end), seeking past each payload"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            raise IsoBmffError(f"Invalid size for box {box_type!r}")
+        yield box_type, position + header_size, min(position + size, end)
+        position += size
+
+
+def read_payload(f, start: int, end: int) -> bytes:
+    if end - start > MAX_BOX_SIZE:
+        raise IsoBmffError("Box too large")
+    f.seek(start)
+    return f.read(end - start)
+
+
+def _timestamp(seconds: int):
+    # Zero means the writer didn't set the time
+    if not seconds:
+        return None
+    try:
+        return EPOCH_1904 + timedelta(seconds=seconds)
+    except OverflowError:
+        return None
+
+
+def _box_children(data: bytes, offset: int = 0):
+    # Same as iter_boxes, for a payload that is already in memory
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1 and offset + 16 <= len(data):
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size:
+            return
+        yield box_type, data[offset + header_size:offset + size]
+        offset += size
+
+
+def _read_descriptor(data: bytes, offset: int):
+    # MPEG-4 descriptor header: tag byte plus a 1-4 byte variable length
+    tag = data[offset]
+    offset += 1
+    length = 0
+    for _ in range(4):
+        byte = data[offset]
+        offset += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, offset, length
+
+
+def parse_esds(data: bytes, track: dict):
+    """Read average bitrate and AAC object type from an esds box"""
+    offset = 4  # version and flags
+    try:
+        tag, offset, _ = _read_descriptor(data, offset)
+        if tag != 3:
+            return
+        flags = data[offset + 2]
+        offset += 3
+        if flags & 0x80:
+            offset += 2
+        if flags & 0x40:
+            offset += 1 + data[offset]
+        if flags & 0x20:
+            offset += 2
+        tag, offset, _ = _read_descriptor(data, offset)
+        if tag != 4:
+            return
+        object_type = data[offset]
+        average_bitrate = struct.unpack_from('>I', data, offset + 9)[0]
+        if average_bitrate:
+            track['bit_rate'] = average_bitrate
+        offset += 13
+        if object_type != 0x40 or offset >= len(data):
+            return
+        tag, offset, _ = _read_descriptor(data, offset)
+        if tag == 5:
+            parse_audio_specific_config(data[offset:offset + 2], track)
+            if 'aac_object_type' in track:
+                track['codec_id'] = f"mp4a-40-{track['aac_object_type']}"
+    except (IndexError, struct.error):
+        return
+
+
+def parse_audio_specific_config(data: bytes, track: dict):
+    """AAC AudioSpecificConfig: 5-bit object type, 4-bit sampling frequency index, 4-bit channel layout"""
+    if len(data) < 2:
+        return
+    config = struct.unpack_from('>H', data)[0]
+    track['aac_object_type'] = config >> 11
+    track['format_info'] = AAC_OBJECT_TYPES.get(config >> 11)
+    frequency_index = (config >> 7) & 0x0F
+    if frequency_index < len(AAC_SAMPLE_RATES):
+        track['sample_rate'] = AAC_SAMPLE_RATES[frequency_index]
+    if 0 < (config >> 3) & 0x0F < 7:
+        track['channels'] = (config >> 3) & 0x0F
+
+
+def parse_avcc(data: bytes, track: dict):
+    if len(data) < 6:
+        return
+    profile, level = data[1], data[3]
+    track['format_profile'] = f"{AVC_PROFILES.get(profile, profile)}@L{level // 10}" + (f".{level % 10}" if level % 10 else '')
+    track['bit_depth'] = 8
+    if profile in AVC_HIGH_PROFILES:
+        # Skip the SPS and PPS lists to reach the high-profile extension
+        try:
+            offset = 6
+            for _ in range(data[5] & 0x1F):
+                offset += 2 + struct.unpack_from('>H', data, offset)[0]
+            count = data[offset]
+            offset += 1
+            for _ in range(count):
+                offset += 2 + struct.unpack_from('>H', data, offset)[0]
+            if offset + 2 < len(data):
+                track['bit_depth'] = (data[offset + 1] & 0x07) + 8
+        except (IndexError, struct.error):
+            pass
+
+
+def parse_hvcc(data: bytes, track: dict):
+    if len(data) < 19:
+        return
+    profile = data[1] & 0x1F
+    tier = 'High' if data[1] & 0x20 else 'Main'
+    level = data[12] / 30
+    level_text = f"{level:.1f}".rstrip('0').rstrip('.')
+    track['format_profile'] = f"{HEVC_PROFILES.get(profile, profile)}@L{level_text}@{tier}"
+    track['bit_depth'] = (data[17] & 0x07) + 8
+
+
+def parse_sample_entry(handler: bytes, data: bytes, track: dict):
+    """Decode the first entry of an stsd box: codec, coded size or audio layout"""
+    entries = list(_box_children(data, 8))  # skip version, flags and entry count
+    if not entries:
+        return
+    codec, entry = entries[0]
+    track['codec'] = codec
+    track['codec_id'] = codec.decode('latin-1').strip()
+    if handler == b'vide' and len(entry) >= 78:
+        track['width'], track['height'] = struct.unpack_from('>HH', entry, 24)
+        for child_type, child in _box_children(entry, 78):
+            if child_type == b'avcC':
+                parse_avcc(child, track)
+            elif child_type == b'hvcC':
+                parse_hvcc(child, track)
+    elif handler == b'soun' and len(entry) >= 28:
+        version, = struct.unpack_from('>H', entry, 8)
+        channels, sample_size = struct.unpack_from('>HH', entry, 16)
+        sample_rate = struct.unpack_from('>I', entry, 24)[0] >> 16
+        children_offset = 28
+        if version == 1:
+            children_offset += 16
+        elif version == 2 and len(entry) >= 64:
+            # QuickTime sound description v2 keeps the real rate and channel count further on
+            sample_rate = int(struct.unpack_from('>d', entry, 32)[0])
+            channels = struct.unpack_from('>I', entry, 40)[0]
+            children_offset += 36
+        track['channels'] = channels
+        track['sample_rate'] = sample_rate
+        track['bit_depth'] = sample_size
+        for child_type, child in _box_children(entry, children_offset):
+            if child_type == b'esds':
+                parse_esds(child, track)
+            elif child_type == b'wave':
+                # QuickTime wraps the esds of AAC audio in a 'wave' atom
+                for wave_type, wave_child in _box_children(child):
+                    if wave_type == b'esds':
+                        parse_esds(wave_child, track)
+
+
+def _data_value(data: bytes):
+    # Decode the payload of a metadata 'data' atom
+    if len(data) < 8:
+        return None
+    data_type = struct.unpack_from('>I', data)[0] & 0xFFFFFF
+    value = data[8:]
+    if data_type == DATA_UTF8:
+        return value.decode('utf-8', errors='replace')
+    if data_type == DATA_UTF16:
+        return value.decode('utf-16-be', errors='replace')
+    if data_type in (DATA_SIGNED, DATA_UNSIGNED) and len(value) in (1, 2, 4, 8):
+        return int.from_bytes(value, 'big', signed=data_type == DATA_SIGNED)
+    if data_type == DATA_FLOAT32 and len(value) == 4:
+        return struct.unpack('>f', value)[0]
+    if data_type == DATA_FLOAT64 and len(value) == 8:
+        return struct.unpack('>d', value)[0]
+    return None
+
+
+def parse_meta(data: bytes, tags: dict):
+    """Read QuickTime 'mdta' keys or iTunes-style items from a meta box payload"""
+    # ISO meta is a full box (version and flags first); QuickTime's isn't
+    if data[4:8] != b'hdlr':
+        data = data[4:]
+    keys = []
+    for box_type, payload in _box_children(data):
+        if box_type == b'keys' and len(payload) >= 8:
+            for key_type, key in _box_children(payload, 8):
+                keys.append(key.decode('utf-8', errors='replace'))
+        elif box_type == b'ilst':
+            for item_type, item in _box_children(payload):
+                index = struct.unpack('>I', item_type)[0]
+                if keys and 1 <= index <= len(keys):
+                    name = keys[index - 1]
+                else:
+                    name = item_type.decode('latin-1')
+                for child_type, child in _box_children(item):
+                    if child_type == b'data':
+                        value = _data_value(child)
+                        if value is not None:
+                            tags[name] = value
+                        break
+
+
+def parse_udta(data: bytes, tags: dict):
+    """Read QuickTime '©xxx' text atoms and any nested meta box from udta"""
+    for box_type, payload in _box_children(data):
+        if box_type == b'meta':
+            parse_meta(payload, tags)
+        elif box_type[:1] == b'\xa9' and len(payload) >= 4:
+            # Classic QuickTime text: 16-bit length, 16-bit language, text
+            if payload[4:8] == b'data':
+                # iTunes-style item holding a 'data' atom
+                for child_type, child in _box_children(payload):
+                    if child_type == b'data':
+                        value = _data_value(child)
+                        if value is not None:
+                            tags[box_type.decode('latin-1')] = value
+                continue
+            length = struct.unpack_from('>H', payload)[0]
+            tags[box_type.decode('latin-1')] = payload[4:4 + length].decode('utf-8', errors='replace')
+
+
+def read_track(f, start: int, end: int) -> dict:
+    track = {}
+    for box_type, box_start, box_end in iter_boxes(f, start, end):
+        if box_type == b'tkhd':
+            header = read_payload(f, box_start, min(box_end, box_start + 96))
+            track['track_id'] = struct.unpack_from('>I', header, 20 if header[0] == 1 else 12)[0]
+            track['display_width'], track['display_height'] = (
+                value >> 16 for value in struct.unpack_from('>II', header, len(header) - 8))
+        elif box_type == b'mdia':
+            _read_media(f, box_start, box_end, track)
+    return track
+
+
+def _read_media(f, start: int, end: int, track: dict):
+    stbl = None
+    for box_type, box_start, box_end in iter_boxes(f, start, end):
+        if box_type == b'mdhd':
+            header = read_payload(f, box_start, min(box_end, box_start + 36))
+            if header[0] == 1:
+                timescale, duration = struct.unpack_from('>IQ', header, 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', header, 12)
+            track['timescale'] = timescale
+            track['duration'] = duration / timescale if timescale else None
+        elif box_type == b'hdlr':
+            header = read_payload(f, box_start, min(box_end, box_start + 12))
+            track['handler'] = header[8:12]
+        elif box_type == b'minf':
+            for minf_type, minf_start, minf_end in iter_boxes(f, box_start, box_end):
+                if minf_type == b'stbl':
+                    stbl = (minf_start, minf_end)
+    # The handler decides how the sample description is decoded, and hdlr may come after minf
+    if stbl is None:
+        return
+    for box_type, box_start, box_end in iter_boxes(f, *stbl):
+        if box_type == b'stsd':
+            parse_sample_entry(track.get('handler'), read_payload(f, box_start, box_end), track)
+        elif box_type in (b'stsz', b'stz2'):
+            # Only the header: version/flags, sample size and sample count
+            header = read_payload(f, box_start, min(box_end, box_start + 12))
+            if len(header) == 12:
+                track['frame_count'] = struct.unpack_from('>I', header, 8)[0]
+
+
+def read_movie(f) -> dict:
+    """
+    Describe an MP4 / QuickTime movie from its moov box.
+
+    Returns {'brand', 'duration', 'created', 'modified', 'tracks', 'tags'}; raises
+    IsoBmffError if the file isn't ISO-BMFF or has no moov box.
+    """
+    size = os.fstat(f.fileno()).st_size
+    movie = {'brand': None, 'duration': None, 'created': None, 'modified': None, 'tracks': [], 'tags': {}}
+    found_moov = False
+    for index, (box_type, start, end) in enumerate(iter_boxes(f, 0, size)):
+        if index == 0 and box_type not in TOP_LEVEL_BOXES:
+            raise IsoBmffError("Not an ISO base media file")
+        if box_type == b'ftyp':
+            movie['brand'] = read_payload(f, start, min(end, start + 4)).decode('latin-1')
+        elif box_type == b'moov':
+            _read_moov(f, start, end, movie)
+            found_moov = True
+            break
+    if not found_moov:
+        raise IsoBmffError("No moov box")
+    return movie
+
+
+def _read_moov(f, start: int, end: int, movie: dict):
+    for box_type, box_start, box_end in iter_boxes(f, start, end):
+        if box_type == b'mvhd':
+            header = read_payload(f, box_start, min(box_end, box_start + 32))
+            if header[0] == 1:
+                created, modified, timescale, duration = struct.unpack_from('>QQIQ', header, 4)
+            else:
+                created, modified, timescale, duration = struct.unpack_from('>IIII', header, 4)
+            movie['created'] = _timestamp(created)
+            movie['modified'] = _timestamp(modified)
+            movie['duration'] = duration / timescale if timescale else None
+        elif box_type == b'trak':
+            movie['tracks'].append(read_track(f, box_start, box_end))
+        elif box_type == b'udta':
+            parse_udta(read_payload(f, box_start, box_end), movie['tags'])
+        elif box_type == b'meta':
+            parse_meta(read_payload(f, box_start, box_end), movie['tags'])
@@ -1,8 +1,10 @@
 import sys
 from gui import Gui
+from outbox import resume_pending_exports
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
 import os
+import multiprocessing
 
 def main():
     app = QApplication(sys.argv)
@@ -17,7 +19,11 @@ def main():
     
     gui.setWindowIcon(QIcon(icon_path))
     gui.show()
+    # Finish uploading exports a previous session queued but didn't get to send
+    resume_pending_exports()
     app.exec()
 
 if __name__ == "__main__":
+    # Required for the process-pool backend in the frozen PyInstaller build
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
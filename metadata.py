@@ -1,31 +1,37 @@
 import os
 import concurrent.futures
-import cachetools
+import concurrent.futures.process
 import threading
-from document import DocumentMetadata
-from photo import PhotoMetadata
-from video import VideoMetadata
+import time
+from cache import MetadataCache, get_default_cache
+from duplicates import DuplicateFinder
+from registry import registry
+from source import FileSource
 
 class MetadataExtractor:
+    # Execution backends: threads only, processes only, or CPU-bound extractors on processes
+    BACKENDS = ('thread', 'process', 'hybrid')
+
     # Initialize MetadataExtractor with a list of file paths
-    def __init__(self, file_paths: list):
+    # The persistent cache is shared by every instance unless one is passed explicitly (False disables it)
+    # With an Instrumentation (see instrumentation.py) every file's stage timings and counters are recorded there
+    def __init__(self, file_paths: list, cache: MetadataCache = None, backend: str = 'thread', max_workers: int = None,
+                 instrumentation=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown execution backend: {backend}")
         self.file_paths = file_paths
-        self.extension_map = {
-            '.docx': DocumentMetadata,
-            '.pdf': DocumentMetadata,
-            '.xlsx': DocumentMetadata,
-            '.pptx': DocumentMetadata,
-            '.mp4': VideoMetadata,
-            '.avi': VideoMetadata,
-            '.mov': VideoMetadata,
-            '.mkv': VideoMetadata,
-            '.mpeg': VideoMetadata,
-            '.jpg': PhotoMetadata,
-            '.jpeg': PhotoMetadata,
-            '.png': PhotoMetadata,
-        }
-        self.cache = cachetools.TTLCache(maxsize=100, ttl=60)  # 1-minute TTL
-        self.lock = threading.RLock()  # Create a thread-local lock
+        self.cache = get_default_cache() if cache is None else (None if cache is False else cache)
+        self.backend = backend
+        self.max_workers = max_workers
+        self.instrumentation = instrumentation
+        self._thread_pool = None
+        self._thread_pool_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     @staticmethod
     def replace_none_with_default(metadata: dict) -> dict:
@@ -46,51 +52,314 @@ class MetadataExtractor:
                 normalized_metadata[key] = value
         return normalized_metadata
     
-    # Extract metadata from files in parallel using ThreadPoolExecutor
+    # Extract metadata from files in parallel on the configured backend
     def extract_metadata(self) -> dict:
-        metadata_dict = {}
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {executor.submit(self._extract_metadata, file_path): file_path for file_path in self.file_paths}
-            for future in concurrent.futures.as_completed(futures):
-                file_path = futures[future]
-                try:
-                    metadata = future.result()
-                    metadata_dict[file_path] = self.replace_none_with_default(metadata)
-                except Exception as e:
-                    metadata_dict[file_path] = {'error': str(e)}
-                    self.cache[file_path] = {'error': str(e)}  
-        return metadata_dict
-    
-    #Extract metadata from a single file
-    def _extract_metadata(self, file_path: str) -> dict:
-        if not os.path.exists(file_path):
-            return {'error': f"File not found: {file_path}"}
-
-        file_extension = os.path.splitext(file_path)[1].lower()
-        # Check if metadata is cached
-        with self.lock:  # Synchronize cache access
-            cached_metadata = self.cache.get(file_path)
-            if cached_metadata:
-                return cached_metadata
-
-        # Select the appropriate metadata extractor based on file extension
-        extractor = self.extension_map.get(file_extension)
-        if extractor:
-            try:
-                if extractor == VideoMetadata:
-                    video_extractor = extractor(file_path)
-                    media_info = video_extractor.parse_video_file()
-                    metadata = video_extractor.extract_metadata(media_info)
-                    with self.lock:  # Synchronize cache update
-                        self.cache[file_path] = metadata
-                    return metadata
-                else:
-                    metadata_extractor = extractor(file_path)
-                    metadata = metadata_extractor.extract_metadata()
-                    with self.lock:  # Synchronize cache update
-                        self.cache[file_path] = metadata
-                    return metadata
-            except Exception as e:
-                return {'error': str(e)}
+        return dict(self.iter_metadata())
+
+    def iter_metadata(self, file_paths=None, callback=None, max_pending: int = None, deduplicate: bool = False,
+                      should_continue=None):
+        """
+        Yield (file_path, metadata) pairs in completion order as each file finishes.
+
+        `file_paths` may be any iterable, including a lazy directory scan, and defaults
+        to the paths the extractor was created with. At most `max_pending` files are in
+        flight at once so memory stays bounded. If given, `callback(file_path, metadata)`
+        is called for each result before it is yielded, and `should_continue()` before
+        each path is taken; once it returns False no more files are started.
+
+        With `deduplicate` each path is checked against the ones before it as it arrives
+        (see duplicates.py). Files with new contents are extracted; a copy is yielded
+        with the metadata of the first file with its contents once that is ready. Every
+        path seen is remembered, but metadata is only kept for files whose size another
+        file shares; a copy of a file whose metadata was dropped is extracted itself.
+        """
+        if file_paths is None:
+            file_paths = self.file_paths
+        if max_pending is None:
+            max_pending = (self.max_workers or min(32, (os.cpu_count() or 1) + 4)) * 4
+        copies = _Copies() if deduplicate else None
+        pending = {}
+        try:
+            for file_path in file_paths:
+                if should_continue is not None and not should_continue():
+                    return
+                ready = copies.add(file_path) if copies is not None else None
+                if ready is not None:
+                    for copy, metadata in ready:
+                        yield self._emit_copy(copy, metadata, callback)
+                    continue
+                future = self.submit(file_path)
+                # Cache hits and early errors are already resolved, hand them out straight away
+                if future.done():
+                    yield from self._emit_all(file_path, future, callback, copies)
+                    continue
+                pending[future] = file_path
+                if len(pending) >= max_pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield from self._emit_all(pending.pop(future), future, callback, copies)
+            for future in concurrent.futures.as_completed(pending):
+                yield from self._emit_all(pending[future], future, callback, copies)
+        finally:
+            self.close()
+
+    def submit(self, file_path: str) -> concurrent.futures.Future:
+        """Schedule extraction of one file, returning a Future that resolves to its normalized metadata"""
+        result = concurrent.futures.Future()
+        stages = {}
+        extractor = stat_result = None
+        try:
+            extractor, stat_result, identity, metadata = self._prepare(file_path, stages)
+            if metadata is None:
+                pool = self._pool_for(extractor)
+                parse_future = pool.submit(parse_file_timed, extractor, file_path, stat_result)
+                parse_future.add_done_callback(
+                    lambda future: self._finish(future, result, file_path, extractor, stat_result, identity, stages)
+                )
+                return result
+            # Metadata found before parsing is a cache hit, unless it is the error for a missing file
+            result.set_result(self._normalize(file_path, extractor, stat_result, metadata, stages,
+                                              cache_hit=identity is not None))
+        except Exception as e:
+            result.set_result(self._record(file_path, extractor, stat_result, {'error': str(e)}, stages))
+        return result
+
+    def extract_file(self, file_path: str) -> dict:
+        """Extract and normalize metadata for a single file in the calling thread, never raising"""
+        stages = {}
+        extractor = stat_result = None
+        try:
+            extractor, stat_result, identity, metadata = self._prepare(file_path, stages)
+            cache_hit = metadata is not None and identity is not None
+            if metadata is None:
+                used, metadata, parse_stages = parse_file_timed(extractor, file_path, stat_result)
+                stages.update(parse_stages)
+                self._store(identity, extractor or used, metadata)
+                extractor = used or extractor
+            return self._normalize(file_path, extractor, stat_result, metadata, stages, cache_hit)
+        except Exception as e:
+            return self._record(file_path, extractor, stat_result, {'error': str(e)}, stages)
+
+    def close(self):
+        # Shut down this extractor's thread pool and write pending cache entries to disk
+        with self._thread_pool_lock:
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=True)
+                self._thread_pool = None
+        if self.cache is not None:
+            self.cache.flush()
+
+    @staticmethod
+    def _emit(file_path: str, future: concurrent.futures.Future, callback) -> tuple:
+        metadata = future.result()
+        if callback:
+            callback(file_path, metadata)
+        return file_path, metadata
+
+    @staticmethod
+    def _emit_copy(file_path: str, metadata: dict, callback) -> tuple:
+        if callback:
+            callback(file_path, metadata)
+        return file_path, metadata
+
+    def _emit_all(self, file_path: str, future: concurrent.futures.Future, callback, copies):
+        # Yield a finished file, then the copies of it that were waiting; `copies` is None without deduplication
+        file_path, metadata = self._emit(file_path, future, callback)
+        yield file_path, metadata
+        if copies is not None:
+            for copy in copies.finish(file_path, metadata):
+                yield self._emit_copy(copy, metadata, callback)
+
+    def _normalize(self, file_path: str, extractor, stat_result, metadata: dict, stages: dict,
+                   cache_hit: bool = False) -> dict:
+        # Timed replace_none_with_default, recorded with the file's other stages
+        start = time.perf_counter()
+        normalized = self.replace_none_with_default(metadata)
+        stages['normalize'] = time.perf_counter() - start
+        return self._record(file_path, extractor, stat_result, normalized, stages, cache_hit)
+
+    def _record(self, file_path: str, extractor, stat_result, metadata: dict, stages: dict,
+                cache_hit: bool = False) -> dict:
+        if self.instrumentation is not None:
+            self.instrumentation.record(file_path, extractor, stages, stat_result.st_size if stat_result else 0,
+                                        metadata.get('error'), cache_hit)
+        return metadata
+
+    def _prepare(self, file_path: str, stages: dict):
+        # Stat the file once, pick the extractor its extension suggests and look it up in the cache
+        # Returns (extractor, stat result, identity, metadata) where metadata is None if the file still needs parsing
+        start = time.perf_counter()
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            return None, None, None, {'error': f"File not found: {file_path}"}
+        stat_done = time.perf_counter()
+        stages['stat'] = stat_done - start
+
+        # The extractor is only a candidate: the worker sniffs the file's magic bytes when it opens it,
+        # so mislabeled and extension-less files still reach the right parser
+        extractor = registry.for_extension(os.path.splitext(file_path)[1])
+
+        # Check if metadata is cached for this exact version of the file
+        identity = None
+        if self.cache is not None:
+            identity = MetadataCache.file_identity(file_path, stat_result)
+            if extractor is not None:
+                cached_metadata = self.cache.get(identity, extractor)
+                stages['cache'] = time.perf_counter() - stat_done
+                if cached_metadata is not None:
+                    return extractor, stat_result, identity, cached_metadata
+        return extractor, stat_result, identity, None
+
+    def _store(self, identity: tuple, extractor, metadata: dict):
+        # Errors are cached too, as negative entries that expire on their own
+        if self.cache is not None and extractor is not None:
+            self.cache.put(identity, extractor, metadata)
+
+    def _finish(self, parse_future, result, file_path, extractor, stat_result, identity, stages):
+        # Completion callback for parse futures, runs in the worker or pool management thread
+        used = extractor
+        try:
+            used, metadata, parse_stages = parse_future.result()
+            stages.update(parse_stages)
+        except concurrent.futures.process.BrokenProcessPool as e:
+            _discard_process_pool()
+            metadata = {'error': f"Worker process failed: {e}"}
+        except Exception as e:
+            metadata = {'error': str(e)}
         else:
-            return {'error': f"Unsupported file type: {file_extension}"}
\ No newline at end of file
+            # Entries stay under the extractor they are looked up with, even if sniffing picked another
+            self._store(identity, extractor or used, metadata)
+        try:
+            result.set_result(self._normalize(file_path, used or extractor, stat_result, metadata, stages))
+        except Exception as e:
+            result.set_result({'error': str(e)})
+
+    def _pool_for(self, extractor) -> concurrent.futures.Executor:
+        # Pick the executor for an extractor according to the backend
+        if self.backend == 'process' or (self.backend == 'hybrid' and getattr(extractor, 'CPU_BOUND', False)):
+            return get_process_pool(self.max_workers)
+        with self._thread_pool_lock:
+            if self._thread_pool is None:
+                self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._thread_pool
+
+
+class _Copies:
+    # Which paths iter_metadata(deduplicate=True) extracts, and which copies wait for whose metadata
+
+    def __init__(self):
+        self.finder = DuplicateFinder()
+        self.waiting = {}  # original being extracted -> copies waiting for its metadata
+        self.kept = {}  # original -> metadata, once another file of its size has come up
+        self.stand_ins = {}  # copy extracted because its original's metadata wasn't kept -> that original
+
+    def add(self, file_path: str):
+        """
+        Check a path before extraction. Returns None if it must be extracted, else the
+        (copy, metadata) results ready now: none while it waits for its original.
+        """
+        original = self.finder.original_of(file_path)
+        if original is None:
+            self.waiting[file_path] = []
+            return None
+        if original in self.kept:
+            return [(file_path, self.kept[original])]
+        if original in self.waiting:
+            self.waiting[original].append(file_path)
+            return []
+        # The original finished before any file of its size came up, so its metadata is gone; the copy stands in
+        self.stand_ins[file_path] = original
+        self.waiting[original] = []
+        return None
+
+    def finish(self, file_path: str, metadata: dict) -> list:
+        """Record an extracted file's metadata; returns the copies that were waiting for it"""
+        original = self.stand_ins.pop(file_path, file_path)
+        if self.finder.may_have_copies(original):
+            self.kept[original] = metadata
+        # A path that can't be read is never a copy, so repeats of it are extracted and finish more than once
+        return self.waiting.pop(original, [])
+
+
+def to_plain(metadata: dict) -> dict:
+    """Convert extractor output to a dict of plain, picklable and JSON-friendly values"""
+    plain = {}
+    for key, value in metadata.items():
+        if value is None or isinstance(value, (str, int, float, bool)):
+            plain[str(key)] = value
+        else:
+            plain[str(key)] = str(value)
+    return plain
+
+
+def parse_file(extractor, file_path: str, stat_result: os.stat_result = None) -> tuple:
+    """
+    Open a file once, let its magic bytes confirm or override `extractor`, and run
+    the chosen extractor on it. Returns (extractor used, metadata); safe to call
+    in a worker process.
+    """
+    used, metadata, _ = parse_file_timed(extractor, file_path, stat_result)
+    return used, metadata
+
+
+def parse_file_timed(extractor, file_path: str, stat_result: os.stat_result = None) -> tuple:
+    """Like parse_file, returning (extractor used, metadata, {stage: seconds}) for open, detect and parse"""
+    used = extractor
+    stages = {}
+    clock = time.perf_counter
+    start = clock()
+    try:
+        with FileSource(file_path, stat_result) as source:
+            opened = clock()
+            stages['open'] = opened - start
+            used = registry.for_content(extractor, source.head)
+            detected = clock()
+            stages['detect'] = detected - opened
+            if used is None:
+                return None, {'error': f"Unsupported file type: {os.path.splitext(file_path)[1].lower()}"}, stages
+            if getattr(used, 'READS_SOURCE', False):
+                metadata_extractor = used(file_path, source=source)
+            else:
+                metadata_extractor = used(file_path)
+            metadata = metadata_extractor.extract_metadata()
+    except Exception as e:
+        metadata = {'error': str(e)}
+    if not isinstance(metadata, dict):
+        metadata = {'error': f"Failed to extract metadata: {file_path}"}
+    metadata = to_plain(metadata)
+    elapsed = clock() - start
+    if 'detect' in stages:
+        stages['parse'] = elapsed - stages['open'] - stages['detect']
+    else:
+        # Opening or mapping the file failed
+        stages['open'] = elapsed
+    return used, metadata, stages
+
+
+# Process pool shared by every extractor so its workers stay warm between batches
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    # Import the CPU-bound parsers up front so the first task in each worker doesn't pay for it
+    import document  # noqa: F401
+    import photo  # noqa: F401
+
+
+def get_process_pool(max_workers: int = None) -> concurrent.futures.ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_worker)
+        return _process_pool
+
+
+def _discard_process_pool():
+    # Drop a broken pool so the next submission starts fresh workers
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+            _process_pool = None
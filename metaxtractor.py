@@ -0,0 +1,303 @@
+"""
+Headless command line interface for MetaXtractor.
+
+    python -m metaxtractor scan DIR [DIR ...] [-o results.jsonl] [--format csv-wide] [--sink sqlite:store.sqlite3]
+    python -m metaxtractor scan DIR --where "Camera Make = Canon AND ISO >= 800"
+    python -m metaxtractor query store.sqlite3 "Camera Model" "Canon EOS 5D"
+    python -m metaxtractor search results.jsonl "Extension = pdf AND Author = Jane*"
+    python -m metaxtractor watch /ingest [--sink sqlite:store.sqlite3] [--settle 2]
+    python -m metaxtractor scan DIR --stats stats.json [--prometheus metaxtractor.prom] [--slowest 10]
+
+Files are discovered with os.scandir, dispatched through MetadataExtractor and
+streamed to an export writer (one JSON object per line by default) as soon as
+each file finishes. This module
+must not import PyQt5 so it can run on servers without a display.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from contextlib import nullcontext
+from exporters import FORMATS, open_writer
+from instrumentation import Instrumentation, capture_profiles
+from metadata import MetadataExtractor
+from registry import registry
+from scanner import scan_paths
+from search import MetadataIndex, Query
+from sinks import SqliteSink, open_sink
+from watcher import FolderWatcher
+
+
+def output(file_path: str, metadata: dict, writer=None, sink=None, instrumentation: Instrumentation = None):
+    # Write one result, timed as the file's sink stage when instrumented
+    with instrumentation.stage(file_path, 'sink') if instrumentation is not None else nullcontext():
+        if writer is not None:
+            writer.write(file_path, metadata)
+        if sink is not None:
+            sink.write({file_path: metadata})
+
+
+def scan(paths, writer, workers: int = None, recursive: bool = True, use_cache: bool = True,
+         backend: str = 'hybrid', sink=None, where: Query = None, deduplicate: bool = False,
+         instrumentation: Instrumentation = None) -> int:
+    """
+    Extract metadata for every supported file under `paths`, streaming results
+    to the export `writer` (if given) and storing them in `sink` (if given).
+    With a `where` query only the files matching it are written and counted.
+    With `deduplicate` identical files are extracted once and share the result;
+    each path is checked as the scan finds it, so results still stream, but every
+    path seen is remembered along with the metadata of files whose size repeats.
+    Stage timings and counters go to `instrumentation`, if given.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    extractor = MetadataExtractor([], cache=None if use_cache else False, backend=backend, max_workers=workers,
+                                  instrumentation=instrumentation)
+    file_paths = scan_paths(paths, registry.extensions(), recursive)
+    count = 0
+    with extractor:
+        # iter_metadata keeps a bounded number of files in flight, so without deduplication memory stays
+        # constant however many are found
+        for file_path, metadata in extractor.iter_metadata(file_paths, deduplicate=deduplicate):
+            if where is not None and not where.matches(file_path, metadata):
+                continue
+            output(file_path, metadata, writer, sink, instrumentation)
+            count += 1
+    return count
+
+
+def query_argument(text: str) -> Query:
+    # argparse only reports "invalid value" for a plain ValueError
+    try:
+        return Query(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def watch(paths, sink, writer=None, workers: int = None, recursive: bool = True, settle: float = 2.0,
+          poll_interval: float = 2.0, include_existing: bool = False, use_inotify: bool = None,
+          backend: str = 'hybrid', watcher: FolderWatcher = None, instrumentation: Instrumentation = None,
+          on_batch=None) -> int:
+    """
+    Extract new and changed files under `paths` as they settle and store them
+    in `sink` (and `writer`, if given), until interrupted or the watcher is
+    stopped. Each batch is flushed to the sink as soon as it is extracted, then
+    `on_batch()` is called if given.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    extractor = MetadataExtractor([], backend=backend, max_workers=workers, instrumentation=instrumentation)
+    if watcher is None:
+        watcher = FolderWatcher(paths, registry.extensions(), recursive, settle, poll_interval,
+                                include_existing, use_inotify)
+    count = 0
+    with extractor:
+        for file_paths in watcher.batches():
+            for file_path, metadata in extractor.iter_metadata(file_paths):
+                output(file_path, metadata, writer, sink, instrumentation)
+                count += 1
+            sink.flush()
+            print(f"Extracted {len(file_paths)} changed files ({count} since start)", file=sys.stderr)
+            if on_batch is not None:
+                on_batch()
+    return count
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--stats', metavar='PATH',
+                       help='Write per-stage and per-extractor timings, counters and the slowest files as JSON')
+    group.add_argument('--prometheus', metavar='PATH',
+                       help='Write the counters in Prometheus text format, e.g. for the node_exporter textfile collector')
+    group.add_argument('--slowest', type=int, metavar='N', help='Print the N slowest files and their stage timings')
+    group.add_argument('--profile', metavar='DIR',
+                       help='Extract the slowest files again under cProfile and write the profiles to DIR')
+    group.add_argument('--tracemalloc', action='store_true',
+                       help='With --profile, also record peak memory and the largest allocation sites')
+
+
+def open_instrumentation(args):
+    # An Instrumentation if any of its outputs was asked for
+    if not (args.stats or args.prometheus or args.slowest or args.profile):
+        return None
+    return Instrumentation(top=max(args.slowest or 0, 20))
+
+
+def write_statistics(args, instrumentation: Instrumentation):
+    if args.stats:
+        instrumentation.write_json(args.stats)
+    if args.prometheus:
+        instrumentation.write_prometheus(args.prometheus)
+
+
+def report_instrumentation(args, instrumentation: Instrumentation, output=sys.stderr):
+    """Write the requested statistics files, print the slowest files and capture profiles"""
+    write_statistics(args, instrumentation)
+    slowest = instrumentation.slowest(args.slowest or 5)
+    if args.slowest:
+        output.write(f"Slowest {len(slowest)} files:\n")
+        for entry in slowest:
+            stages = sorted(entry['stages'].items(), key=lambda item: item[1], reverse=True)[:3]
+            breakdown = ', '.join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in stages)
+            output.write(f"{entry['seconds'] * 1000:10.1f}ms  {entry['extractor']:<18} {entry['path']}  ({breakdown})\n")
+    if args.profile:
+        captured = capture_profiles([entry['path'] for entry in slowest], args.profile, args.tracemalloc)
+        output.write(f"Wrote {len(captured)} profiles to {args.profile}\n")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='metaxtractor', description='Extract file metadata without the GUI.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = subparsers.add_parser('scan', help='Scan files or directories and write JSONL results')
+    scan_parser.add_argument('paths', nargs='+', help='Files or directories to scan')
+    scan_parser.add_argument('-o', '--output', help='Write results to this file instead of stdout')
+    scan_parser.add_argument('-f', '--format', choices=sorted(FORMATS),
+                             help='Output format (default: from the --output extension, else jsonl)')
+    scan_parser.add_argument('-j', '--workers', type=int, help='Number of extraction workers')
+    scan_parser.add_argument('--backend', choices=MetadataExtractor.BACKENDS, default='hybrid',
+                             help='Run extractors on threads, processes, or CPU-bound ones on processes (default)')
+    scan_parser.add_argument('--no-recursive', action='store_true', help='Do not descend into subdirectories')
+    scan_parser.add_argument('--no-cache', action='store_true', help='Ignore the persistent metadata cache')
+    scan_parser.add_argument('--dedupe', action='store_true',
+                             help='Extract identical files once (compared by size, sampled and full hashes)')
+    scan_parser.add_argument('--sink', help="Also store results in a sink: 'sqlite[:PATH]' or 'firebase'; "
+                                            "results are then only written to a file given with --output")
+    scan_parser.add_argument('--upload-timeout', type=float, default=300, metavar='SECONDS',
+                             help='How long to wait for a firebase sink to finish uploading (default: 300)')
+    scan_parser.add_argument('-w', '--where', type=query_argument, metavar='QUERY',
+                             help='Only keep files matching a query such as "ISO >= 800 AND Camera Make = Canon"')
+    add_instrumentation_arguments(scan_parser)
+
+    watch_parser = subparsers.add_parser('watch', help='Extract files as they arrive in directories')
+    watch_parser.add_argument('paths', nargs='+', help='Directories to watch')
+    watch_parser.add_argument('--sink', help="Where results go: 'sqlite[:PATH]' or 'firebase' "
+                                             "(default: METAXTRACTOR_SINK, else firebase)")
+    watch_parser.add_argument('-o', '--output', help='Also write results to this JSONL file')
+    watch_parser.add_argument('--upload-timeout', type=float, default=300, metavar='SECONDS',
+                              help='How long a firebase sink may keep uploading on exit (default: 300)')
+    watch_parser.add_argument('-j', '--workers', type=int, help='Number of extraction workers')
+    watch_parser.add_argument('--backend', choices=MetadataExtractor.BACKENDS, default='hybrid',
+                              help='Extraction backend (default: hybrid)')
+    watch_parser.add_argument('--settle', type=float, default=2.0,
+                              help='Seconds a file must stay unchanged before it is extracted (default: 2)')
+    watch_parser.add_argument('--existing', action='store_true', help='Also extract the files already there')
+    watch_parser.add_argument('--no-recursive', action='store_true', help='Do not watch subdirectories')
+    watch_parser.add_argument('--poll', type=float, metavar='SECONDS',
+                              help='Poll every SECONDS instead of using inotify')
+    add_instrumentation_arguments(watch_parser)
+
+    query_parser = subparsers.add_parser('query', help='List files in a local SQLite store by tag')
+    query_parser.add_argument('store', help='Store written with --sink sqlite:PATH')
+    query_parser.add_argument('name', help='Tag name, e.g. "Camera Model"')
+    query_parser.add_argument('value', nargs='?', help='Exact tag value to match')
+    query_parser.add_argument('--min', type=float, help='Lower bound for a numeric tag')
+    query_parser.add_argument('--max', type=float, help='Upper bound for a numeric tag')
+
+    search_parser = subparsers.add_parser('search', help='Search JSONL results with metadata queries')
+    search_parser.add_argument('results', help='JSONL file written by scan')
+    search_parser.add_argument('queries', nargs='+', type=query_argument, metavar='QUERY',
+                               help='e.g. "Camera Model = ILCE-7M3", "Title = Annual*", "Page Count > 10"')
+    return parser
+
+
+def search(args, output) -> int:
+    # Index the results once, then print the paths matching each query one per line
+    index = MetadataIndex()
+    with open(args.results, encoding='utf-8') as results:
+        for line in results:
+            if line.strip():
+                result = json.loads(line)
+                index.add(result['path'], result['metadata'])
+    count = 0
+    for query in args.queries:
+        paths = index.search(query)
+        if len(args.queries) > 1:
+            output.write(f"# {query.text}\n")
+        for file_path in paths:
+            output.write(file_path + '\n')
+        count += len(paths)
+    return count
+
+
+def query(args, output) -> int:
+    # Print the matching paths one per line
+    with SqliteSink(args.store) as store:
+        if args.value is not None:
+            paths = store.files_where(args.name, args.value)
+        else:
+            paths = store.files_between(args.name, args.min, args.max)
+    for file_path in paths:
+        output.write(file_path + '\n')
+    return len(paths)
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'scan':
+        try:
+            writer = open_writer(args.output, args.format) if args.output or not args.sink else None
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        sink = open_sink(args.sink, args.upload_timeout) if args.sink else None
+        instrumentation = open_instrumentation(args)
+        try:
+            count = scan(args.paths, writer, args.workers, not args.no_recursive, not args.no_cache, args.backend,
+                         sink, args.where, args.dedupe, instrumentation)
+        finally:
+            if writer is not None:
+                writer.close()
+            if sink is not None:
+                sink.close()
+        print(f"Scanned {count} files", file=sys.stderr)
+        if instrumentation is not None:
+            report_instrumentation(args, instrumentation)
+    elif args.command == 'watch':
+        missing = [path for path in args.paths if not os.path.isdir(path)]
+        if missing:
+            print(f"Not a directory: {', '.join(missing)}", file=sys.stderr)
+            return 1
+        watcher = FolderWatcher(args.paths, registry.extensions(), not args.no_recursive, args.settle,
+                                args.poll or 2.0, args.existing, False if args.poll else None)
+        # Finish the batch in progress and close the sink when a service manager stops us
+        signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+        writer = open_writer(args.output, 'jsonl') if args.output else None
+        sink = open_sink(args.sink, args.upload_timeout)
+        instrumentation = open_instrumentation(args)
+        # Statistics files are rewritten after every batch so they can be scraped while watching
+        on_batch = (lambda: write_statistics(args, instrumentation)) if instrumentation is not None else None
+        try:
+            count = watch(args.paths, sink, writer, args.workers, backend=args.backend, watcher=watcher,
+                          instrumentation=instrumentation, on_batch=on_batch)
+        except KeyboardInterrupt:
+            count = None
+        finally:
+            if writer is not None:
+                writer.close()
+            sink.close()
+        if count is not None:
+            print(f"Extracted {count} files", file=sys.stderr)
+        if instrumentation is not None:
+            report_instrumentation(args, instrumentation)
+    elif args.command == 'query':
+        if args.value is None and args.min is None and args.max is None:
+            print("query needs a value, --min or --max", file=sys.stderr)
+            return 2
+        if not os.path.exists(args.store):
+            print(f"Store not found: {args.store}", file=sys.stderr)
+            return 1
+        count = query(args, sys.stdout)
+        print(f"{count} files", file=sys.stderr)
+    elif args.command == 'search':
+        if not os.path.exists(args.results):
+            print(f"Results not found: {args.results}", file=sys.stderr)
+            return 1
+        count = search(args, sys.stdout)
+        print(f"{count} files", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Lightweight reader for Office Open XML packages (.docx, .xlsx, .pptx).
+
+The zip is opened once and only the parts that are asked for are parsed, with
+a streaming XML parser, so reading document properties never builds the
+python-docx, openpyxl or python-pptx object models.
+"""
+import posixpath
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+CORE_PROPERTIES_TYPE = 'http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties'
+EXTENDED_PROPERTIES_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties'
+OFFICE_DOCUMENT_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+DOC_RELATIONSHIPS_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# Element name (without namespace) in docProps/core.xml -> property name
+CORE_PROPERTIES = {
+    'creator': 'author',
+    'title': 'title',
+    'subject': 'subject',
+    'created': 'created',
+    'modified': 'modified',
+    'revision': 'revision',
+    'lastPrinted': 'last_printed',
+    'category': 'category',
+    'keywords': 'keywords',
+    'description': 'comments',
+    'version': 'version',
+    'contentStatus': 'content_status',
+    'lastModifiedBy': 'last_modified_by',
+}
+DATE_PROPERTIES = {'created', 'modified', 'last_printed'}
+
+# Element name in docProps/app.xml -> property name, for the scalar properties
+APP_PROPERTIES = {
+    'Application': 'application',
+    'AppVersion': 'app_version',
+    'Company': 'company',
+    'Pages': 'pages',
+    'Words': 'words',
+    'Characters': 'characters',
+    'Lines': 'lines',
+    'Paragraphs': 'paragraphs',
+    'Slides': 'slides',
+    'Notes': 'notes',
+    'HiddenSlides': 'hidden_slides',
+    'TotalTime': 'total_time',
+}
+INTEGER_PROPERTIES = {
+    'revision', 'pages', 'words', 'characters', 'lines', 'paragraphs', 'slides', 'notes',
+    'hidden_slides', 'total_time',
+}
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_w3cdtf(value: str):
+    # Parse a W3CDTF timestamp ("2024-01-31T10:00:00Z") into a datetime, keeping the raw text if it is malformed
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return value
+
+
+class OoxmlPackage:
+    """An open OOXML zip package; use as a context manager"""
+
+    def __init__(self, file):
+        # A path, or an already open binary file (which is left open on close)
+        self.zip = zipfile.ZipFile(file)
+        self._names = set(self.zip.namelist())
+        self._relationships = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def has_part(self, part_name: str) -> bool:
+        return part_name in self._names
+
+    def iterparse(self, part_name: str, events=('end',)):
+        """Stream (event, element) pairs from a part; callers should clear elements they are done with"""
+        with self.zip.open(part_name) as stream:
+            yield from ElementTree.iterparse(stream, events)
+
+    def relationships(self, part_name: str = '') -> dict:
+        """Return {relationship id: (type, target part name)} for a part, or for the package if part_name is empty"""
+        if part_name in self._relationships:
+            return self._relationships[part_name]
+        directory, file_name = posixpath.split(part_name)
+        rels_name = posixpath.join(directory, '_rels', f"{file_name}.rels")
+        relationships = {}
+        if self.has_part(rels_name):
+            for _, element in self.iterparse(rels_name):
+                if element.tag == f"{RELATIONSHIPS_NS}Relationship" and element.get('TargetMode') != 'External':
+                    target = element.get('Target', '')
+                    if target.startswith('/'):
+                        target = target[1:]
+                    else:
+                        target = posixpath.normpath(posixpath.join(directory, target))
+                    relationships[element.get('Id')] = (element.get('Type'), target)
+        self._relationships[part_name] = relationships
+        return relationships
+
+    def find_part(self, relationship_type: str, default: str, part_name: str = '') -> str:
+        # Resolve a part by relationship type, falling back to its conventional location
+        for rel_type, target in self.relationships(part_name).values():
+            if rel_type == relationship_type and self.has_part(target):
+                return target
+        return default if self.has_part(default) else None
+
+    def main_part(self) -> str:
+        """Name of the main document part (word/document.xml, xl/workbook.xml, ...)"""
+        return self.find_part(OFFICE_DOCUMENT_TYPE, None)
+
+    def core_properties(self) -> dict:
+        """Read docProps/core.xml (author, title, dates, revision, ...)"""
+        properties = {name: None for name in CORE_PROPERTIES.values()}
+        part_name = self.find_part(CORE_PROPERTIES_TYPE, 'docProps/core.xml')
+        if part_name is None:
+            return properties
+        for _, element in self.iterparse(part_name):
+            name = CORE_PROPERTIES.get(local_name(element.tag))
+            if name is not None and element.text:
+                properties[name] = self._convert(name, element.text)
+            element.clear()
+        return properties
+
+    def app_properties(self) -> dict:
+        """Read docProps/app.xml (Pages, Words, Slides, ...)"""
+        properties = {name: None for name in APP_PROPERTIES.values()}
+        part_name = self.find_part(EXTENDED_PROPERTIES_TYPE, 'docProps/app.xml')
+        if part_name is None:
+            return properties
+        for _, element in self.iterparse(part_name):
+            tag = local_name(element.tag)
+            if tag in APP_PROPERTIES and element.text:
+                name = APP_PROPERTIES[tag]
+                properties[name] = self._convert(name, element.text)
+            element.clear()
+        return properties
+
+    @staticmethod
+    def _convert(name: str, text: str):
+        if name in DATE_PROPERTIES:
+            return parse_w3cdtf(text)
+        if name in INTEGER_PROPERTIES:
+            try:
+                return int(text)
+            except ValueError:
+                return None
+        return text
+
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+WORD_TEXT = f"{WORD_NS}t"
+WORD_PARAGRAPH = f"{WORD_NS}p"
+WORD_TABLE = f"{WORD_NS}tbl"
+# Run content that python-docx renders as whitespace inside a paragraph's text
+WORD_BREAKS = {f"{WORD_NS}tab", f"{WORD_NS}br", f"{WORD_NS}cr"}
+
+
+def count_words(package: OoxmlPackage, part_name: str, include_tables: bool = False) -> int:
+    """
+    Count whitespace-separated words in the w:t runs of a WordprocessingML part.
+
+    The part is parsed as a stream and every element is detached from its parent
+    as soon as it ends, so memory use doesn't grow with the size of the document.
+    Words may span several runs; paragraph ends, tabs and breaks separate them.
+    Text inside tables is only counted if `include_tables` is set.
+    """
+    words = 0
+    in_word = False
+    table_depth = 0
+    stack = []
+    for event, element in package.iterparse(part_name, events=('start', 'end')):
+        if event == 'start':
+            stack.append(element)
+            if element.tag == WORD_TABLE:
+                table_depth += 1
+            continue
+
+        stack.pop()
+        tag = element.tag
+        if tag == WORD_TEXT:
+            if include_tables or not table_depth:
+                text = element.text or ''
+                words += len(text.split())
+                # A run that continues the previous run's word doesn't start a new one
+                if in_word and text and not text[0].isspace():
+                    words -= 1
+                if text:
+                    in_word = not text[-1].isspace()
+        elif tag == WORD_PARAGRAPH or tag in WORD_BREAKS:
+            in_word = False
+        elif tag == WORD_TABLE:
+            table_depth -= 1
+        if stack:
+            stack[-1].remove(element)
+    return words
+
+
+def header_footer_parts(package: OoxmlPackage, part_name: str) -> list:
+    """Names of the header and footer parts referenced by a Word document part"""
+    return sorted(target for rel_type, target in package.relationships(part_name).values()
+                  if rel_type and (rel_type.endswith('/header') or rel_type.endswith('/footer')))
@@ -0,0 +1,292 @@
+"""
+Durable outbox for database exports.
+
+Exports are written to a local SQLite outbox first and acknowledged at disk
+speed; an OutboxFlusher thread drains it to Firebase in batches. Entries are
+keyed by the file's path and a BLAKE2 hash of the metadata being sent, so
+exporting never reads the files themselves. Re-exporting a file with the same
+metadata is a no-op; different metadata (a changed file, or a newer extractor)
+replaces the file's earlier entry, whether it was sent or is still waiting.
+Anything not yet sent survives a crash or restart and is picked up by the next
+flusher.
+"""
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Default location of the outbox, can be overridden with METAXTRACTOR_OUTBOX
+DEFAULT_OUTBOX_PATH = os.environ.get(
+    'METAXTRACTOR_OUTBOX',
+    os.path.join(os.path.expanduser('~'), '.metaxtractor', 'export_outbox.sqlite3'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id           INTEGER PRIMARY KEY,
+    file_path    TEXT NOT NULL,
+    entry_key    TEXT NOT NULL,
+    metadata     TEXT NOT NULL,
+    queued_at    REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    sent_at      REAL,
+    UNIQUE (file_path, entry_key)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(sent_at, id);
+"""
+
+
+def entry_key(metadata: dict) -> str:
+    """BLAKE2b of the serialized metadata; what is sent decides whether a file needs sending again"""
+    return hashlib.blake2b(json.dumps(metadata, sort_keys=True, default=str).encode(), digest_size=20).hexdigest()
+
+
+class ExportOutbox:
+    """
+    SQLite write-ahead queue of metadata updates waiting to be sent.
+
+    Each file has at most one row, for the last metadata queued for it. Rows
+    stay after they are sent (with sent_at set) so the same metadata isn't
+    queued again; `purge_sent` drops old ones. Entries that fail `max_attempts`
+    times are left in place but no longer handed out by `pending`.
+    """
+
+    def __init__(self, path: str = DEFAULT_OUTBOX_PATH, max_attempts: int = 20):
+        self.path = path
+        self.max_attempts = max_attempts
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # A queued export must survive power loss, not just a crash of the app
+        self.connection.execute('PRAGMA synchronous=FULL')
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(outbox)')}
+        if 'content_hash' in columns:
+            # Outboxes from before entries were keyed on metadata; old keys never match, so each file is sent once more
+            self.connection.execute('ALTER TABLE outbox RENAME COLUMN content_hash TO entry_key')
+        self.connection.executescript(_SCHEMA)
+        # Set whenever new entries are queued so a waiting flusher wakes up
+        self.changed = threading.Event()
+
+    def enqueue(self, results: dict) -> int:
+        """
+        Record {file path: metadata} for export in one transaction; returns how
+        many entries were new. Files already queued or sent with the same
+        metadata are skipped.
+        """
+        rows = [(file_path, entry_key(metadata), json.dumps(metadata, default=str), time.time())
+                for file_path, metadata in results.items()]
+        with self.lock:
+            with self.connection:
+                self.connection.execute('BEGIN')
+                # Different metadata supersedes the file's earlier entry, sent or not
+                self.connection.executemany(
+                    'DELETE FROM outbox WHERE file_path = ? AND entry_key != ?', [(row[0], row[1]) for row in rows]
+                )
+                before = self.connection.total_changes
+                self.connection.executemany(
+                    'INSERT OR IGNORE INTO outbox (file_path, entry_key, metadata, queued_at) '
+                    'VALUES (?, ?, ?, ?)', rows
+                )
+                added = self.connection.total_changes - before
+        if added:
+            self.changed.set()
+        return added
+
+    def pending(self, limit: int = 500) -> list:
+        """
+        Oldest unsent entries as (entry id, file path, metadata) tuples. An entry
+        id is (row id, entry key): row ids can be reused once a file's entry is
+        replaced, so marking a batch sent only touches rows that still hold the
+        metadata that was sent.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT id, entry_key, file_path, metadata FROM outbox WHERE sent_at IS NULL AND attempts < ? '
+                'ORDER BY id LIMIT ?', (self.max_attempts, limit)
+            ).fetchall()
+        return [((row_id, key), file_path, json.loads(metadata)) for row_id, key, file_path, metadata in rows]
+
+    def mark_sent(self, entry_ids: list):
+        with self.lock:
+            self.connection.executemany(
+                'UPDATE outbox SET sent_at = ?, last_error = NULL WHERE id = ? AND entry_key = ?',
+                [(time.time(), row_id, key) for row_id, key in entry_ids]
+            )
+
+    def mark_failed(self, failures: dict):
+        # failures: {entry id: error message}
+        with self.lock:
+            self.connection.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id = ? AND entry_key = ?',
+                [(error, row_id, key) for (row_id, key), error in failures.items()]
+            )
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL AND attempts < ?', (self.max_attempts,)
+            ).fetchone()[0]
+
+    def purge_sent(self, older_than: float = 30 * 24 * 3600):
+        """Forget sent entries older than `older_than` seconds; their files will be exported again if queued"""
+        with self.lock:
+            self.connection.execute('DELETE FROM outbox WHERE sent_at < ?', (time.time() - older_than,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class OutboxFlusher(threading.Thread):
+    """
+    Background thread that sends pending outbox entries with
+    Database.export_metadata, `batch_size` at a time. After a failed batch it
+    waits with exponential backoff (up to `max_delay` seconds) before trying
+    again; otherwise it sleeps until new entries are queued.
+    """
+
+    def __init__(self, outbox: ExportOutbox, batch_size: int = 500, max_delay: float = 300, on_sent=None):
+        super().__init__(name='outbox-flusher', daemon=True)
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        # Called with the file paths of each batch once it has been written
+        self.on_sent = on_sent
+        self._stopped = threading.Event()
+        self._database = None
+
+    def stop(self):
+        self._stopped.set()
+        self.outbox.changed.set()
+
+    def run(self):
+        delay = 1.0
+        while not self._stopped.is_set():
+            self.outbox.changed.clear()
+            try:
+                sent_all = self.flush_once()
+            except Exception as e:
+                print(f"Error flushing export outbox: {e}")
+                sent_all = False
+            if sent_all:
+                delay = 1.0
+                if not self.outbox.pending_count():
+                    self.outbox.changed.wait()
+            else:
+                self._stopped.wait(delay)
+                delay = min(delay * 2, self.max_delay)
+
+    def drain(self, timeout: float) -> int:
+        """
+        Send pending entries from the calling thread until none are left or
+        `timeout` seconds have passed, backing off after failed batches like
+        `run`. Gives up straight away if the database can't be opened. Returns
+        the number of entries still pending.
+        """
+        deadline = time.monotonic() + timeout
+        # A batch in flight is allowed to finish when the deadline passes, which stops export_metadata's loop
+        timer = threading.Timer(timeout, self.stop)
+        timer.daemon = True
+        timer.start()
+        delay = 1.0
+        try:
+            while self.outbox.pending_count() and not self._stopped.is_set():
+                try:
+                    sent_all = self.flush_once()
+                except Exception as e:
+                    print(f"Error flushing export outbox: {e}", file=sys.stderr)
+                    if self._database is None:
+                        break
+                    sent_all = False
+                if not sent_all:
+                    self._stopped.wait(min(delay, max(0.0, deadline - time.monotonic())))
+                    delay = min(delay * 2, self.max_delay)
+        finally:
+            timer.cancel()
+        return self.outbox.pending_count()
+
+    def flush_once(self) -> bool:
+        """Send one batch; returns True if every entry in it was written"""
+        batch = self.outbox.pending(self.batch_size)
+        if not batch:
+            return True
+        if self._database is None:
+            # firebase_admin is only loaded once there is something to send
+            from database import Database
+            self._database = Database()
+        ids_by_path = {file_path: entry_id for entry_id, file_path, _ in batch}
+        sent = []
+        failed = self._database.export_metadata(
+            {file_path: metadata for _, file_path, metadata in batch},
+            on_exported=sent.append, should_continue=lambda: not self._stopped.is_set(),
+        )
+        self.outbox.mark_sent([ids_by_path[file_path] for file_path in sent])
+        self.outbox.mark_failed({ids_by_path[file_path]: error for file_path, error in failed.items()})
+        if sent and self.on_sent:
+            self.on_sent(sent)
+        return len(sent) == len(batch)
+
+
+_default_outbox = None
+_flusher = None
+_default_lock = threading.Lock()
+
+
+def get_default_outbox() -> ExportOutbox:
+    """Return the process-wide outbox"""
+    global _default_outbox
+    with _default_lock:
+        if _default_outbox is None:
+            _default_outbox = ExportOutbox()
+            atexit.register(_default_outbox.close)
+        return _default_outbox
+
+
+def start_flusher(on_sent=None) -> OutboxFlusher:
+    """Start the shared flusher if it isn't running; it first resumes anything left from a previous run"""
+    global _flusher
+    outbox = get_default_outbox()
+    with _default_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = OutboxFlusher(outbox, on_sent=on_sent)
+            _flusher.start()
+            atexit.register(_stop_flusher, _flusher)
+        return _flusher
+
+
+def drain(timeout: float) -> int:
+    """
+    Send everything in the shared outbox before returning, waiting at most
+    `timeout` seconds; returns how many entries are left for a later run. The
+    background flusher, if any, is stopped first so entries aren't sent twice.
+    """
+    global _flusher
+    outbox = get_default_outbox()
+    with _default_lock:
+        running, _flusher = _flusher, None
+    if running is not None:
+        running.stop()
+        running.join()
+    return OutboxFlusher(outbox).drain(timeout)
+
+
+def resume_pending_exports():
+    """Start the flusher at startup if a previous run left entries in the outbox"""
+    if not os.path.exists(DEFAULT_OUTBOX_PATH):
+        return None
+    if get_default_outbox().pending_count():
+        return start_flusher()
+    return None
+
+
+def _stop_flusher(flusher: OutboxFlusher):
+    # Let a batch in flight finish before the outbox is closed; whatever is left is resumed next time
+    flusher.stop()
+    flusher.join(timeout=5)
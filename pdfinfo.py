@@ -0,0 +1,620 @@
+"""
+Lazy PDF metadata reader.
+
+Only the structures needed for document properties are read: the header, the
+cross-reference sections (following /Prev), the trailer, the /Info dictionary,
+the /Root catalog, the root of the page tree (for /Count) and, optionally, the
+XMP metadata stream. Classic xref tables are indexed directly by object number,
+so for most files only a few KB are read. Page objects and content streams are
+never loaded.
+"""
+import re
+import zlib
+from xml.etree import ElementTree
+from source import open_source
+
+# Objects larger than this are not something we need for metadata
+MAX_OBJECT_SIZE = 1024 * 1024
+# Bytes read from the end of the file to find startxref
+TAIL_SIZE = 2048
+
+WHITESPACE = b' \t\r\n\f\x00'
+DELIMITERS = b'()<>[]{}/%'
+REFERENCE_PATTERN = re.compile(rb'[ \t\r\n\f\x00]*(\d+)[ \t\r\n\f\x00]+(\d+)[ \t\r\n\f\x00]+R(?=[ \t\r\n\f\x00()<>\[\]{}/%])')
+
+
+class PdfFormatError(ValueError):
+    """Raised when the lazy reader can't handle a file; callers fall back to a full parser"""
+
+
+class _Incomplete(Exception):
+    # The buffer ended in the middle of an object
+    pass
+
+
+class PdfName(str):
+    """A PDF name such as /Author, kept distinct from text strings"""
+
+
+class PdfRef(tuple):
+    """An indirect reference "num gen R" """
+
+    def __new__(cls, num: int, gen: int):
+        return super().__new__(cls, (num, gen))
+
+    @property
+    def num(self):
+        return self[0]
+
+
+class PdfStream:
+    """A stream object: its dictionary and the file offset of its data"""
+
+    def __init__(self, dictionary: dict, data_offset: int):
+        self.dictionary = dictionary
+        self.data_offset = data_offset
+
+
+class _Parser:
+    # Recursive-descent parser for PDF objects in a bytes buffer
+
+    def __init__(self, data: bytes, position: int = 0):
+        self.data = data
+        self.position = position
+
+    def skip_whitespace(self):
+        data = self.data
+        while self.position < len(data):
+            char = data[self.position]
+            if char in WHITESPACE:
+                self.position += 1
+            elif char == 0x25:  # % comment runs to end of line
+                while self.position < len(data) and data[self.position] not in b'\r\n':
+                    self.position += 1
+            else:
+                return
+        raise _Incomplete()
+
+    def token(self) -> bytes:
+        # Read a bare token (number or keyword)
+        self.skip_whitespace()
+        start = self.position
+        data = self.data
+        while self.position < len(data) and data[self.position] not in WHITESPACE and data[self.position] not in DELIMITERS:
+            self.position += 1
+        if self.position >= len(data):
+            raise _Incomplete()
+        return data[start:self.position]
+
+    def parse(self):
+        self.skip_whitespace()
+        data = self.data
+        char = data[self.position:self.position + 1]
+        if char == b'/':
+            return self._parse_name()
+        if char == b'<':
+            if data[self.position + 1:self.position + 2] == b'<':
+                return self._parse_dictionary()
+            return self._parse_hex_string()
+        if char == b'[':
+            return self._parse_array()
+        if char == b'(':
+            return self._parse_literal_string()
+        token = self.token()
+        if token == b'true':
+            return True
+        if token == b'false':
+            return False
+        if token == b'null':
+            return None
+        if not token:
+            raise PdfFormatError(f"Unexpected character {char!r}")
+        try:
+            number = int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                raise PdfFormatError(f"Unexpected token {token!r}")
+        # An integer may be the start of an indirect reference "num gen R"
+        saved = self.position
+        try:
+            generation = self.token()
+            if generation.isdigit() and self.token() == b'R':
+                return PdfRef(number, int(generation))
+        except _Incomplete:
+            if len(data) - saved > 32:
+                raise PdfFormatError("Truncated object")
+            raise
+        self.position = saved
+        return number
+
+    def _parse_name(self) -> PdfName:
+        self.position += 1
+        start = self.position
+        data = self.data
+        while self.position < len(data) and data[self.position] not in WHITESPACE and data[self.position] not in DELIMITERS:
+            self.position += 1
+        if self.position >= len(data):
+            raise _Incomplete()
+        raw = data[start:self.position]
+        if b'#' in raw:
+            raw = re.sub(rb'#([0-9A-Fa-f]{2})', lambda match: bytes([int(match.group(1), 16)]), raw)
+        return PdfName('/' + raw.decode('latin-1'))
+
+    def _parse_dictionary(self) -> dict:
+        self.position += 2
+        dictionary = {}
+        while True:
+            self.skip_whitespace()
+            if self.data[self.position:self.position + 2] == b'>>':
+                self.position += 2
+                return dictionary
+            key = self.parse()
+            if not isinstance(key, PdfName):
+                raise PdfFormatError("Dictionary key is not a name")
+            dictionary[key] = self.parse()
+
+    def _parse_array(self) -> list:
+        self.position += 1
+        array = []
+        while True:
+            # Page tree /Kids arrays can hold thousands of references, so match those in one step
+            match = REFERENCE_PATTERN.match(self.data, self.position)
+            if match:
+                array.append(PdfRef(int(match.group(1)), int(match.group(2))))
+                self.position = match.end()
+                continue
+            self.skip_whitespace()
+            if self.data[self.position:self.position + 1] == b']':
+                self.position += 1
+                return array
+            array.append(self.parse())
+
+    def _parse_hex_string(self) -> bytes:
+        end = self.data.find(b'>', self.position)
+        if end < 0:
+            raise _Incomplete()
+        digits = re.sub(rb'\s', b'', self.data[self.position + 1:end])
+        self.position = end + 1
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii'))
+
+    def _parse_literal_string(self) -> bytes:
+        data = self.data
+        self.position += 1
+        depth = 1
+        output = bytearray()
+        escapes = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f'}
+        while True:
+            if self.position >= len(data):
+                raise _Incomplete()
+            char = data[self.position]
+            self.position += 1
+            if char == 0x5C:  # backslash
+                if self.position >= len(data):
+                    raise _Incomplete()
+                escaped = data[self.position]
+                self.position += 1
+                if escaped in escapes:
+                    output += escapes[escaped]
+                elif 0x30 <= escaped <= 0x37:
+                    digits = bytes([escaped])
+                    while len(digits) < 3 and self.position < len(data) and 0x30 <= data[self.position] <= 0x37:
+                        digits += data[self.position:self.position + 1]
+                        self.position += 1
+                    output.append(int(digits, 8) & 0xFF)
+                elif escaped == 0x0D:
+                    # Line continuation, optionally \r\n
+                    if data[self.position:self.position + 1] == b'\n':
+                        self.position += 1
+                elif escaped != 0x0A:
+                    output.append(escaped)
+            elif char == 0x28:
+                depth += 1
+                output.append(char)
+            elif char == 0x29:
+                depth -= 1
+                if depth == 0:
+                    return bytes(output)
+                output.append(char)
+            else:
+                output.append(char)
+
+
+def decode_text(value) -> str:
+    """Decode a PDF text string (UTF-16BE with BOM, UTF-8 with BOM, or PDFDocEncoding)"""
+    if not isinstance(value, bytes):
+        return value if value is None else str(value)
+    if value.startswith(b'\xfe\xff'):
+        return value[2:].decode('utf-16-be', errors='replace')
+    if value.startswith(b'\xef\xbb\xbf'):
+        return value[3:].decode('utf-8', errors='replace')
+    return value.decode('latin-1')
+
+
+def _apply_png_predictor(data: bytes, columns: int) -> bytes:
+    # Undo the PNG row predictors used by xref and object streams
+    row_size = columns + 1
+    output = bytearray()
+    previous = bytearray(columns)
+    for start in range(0, len(data) - columns, row_size):
+        predictor = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        for i in range(len(row)):
+            left = row[i - 1] if i > 0 else 0
+            up = previous[i]
+            if predictor == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif predictor == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif predictor == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif predictor == 4:
+                upper_left = previous[i - 1] if i > 0 else 0
+                estimate = left + up - upper_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - upper_left))
+                row[i] = (row[i] + (left, up, upper_left)[distances.index(min(distances))]) & 0xFF
+        output += row
+        previous = row
+    return bytes(output)
+
+
+class _XrefTable:
+    # A classic "xref" section, indexed directly by object number without reading every entry
+
+    def __init__(self, reader, subsections: list, trailer: dict):
+        self.reader = reader
+        self.subsections = subsections  # (first object number, count, file offset of first entry, entry size)
+        self.trailer = trailer
+
+    def lookup(self, num: int):
+        for first, count, offset, entry_size in self.subsections:
+            if first <= num < first + count:
+                entry = self.reader.read_at(offset + (num - first) * entry_size, 18)
+                if entry[17:18] != b'n':
+                    return 0, 0, 0
+                if not (entry[:10].isdigit() and entry[11:16].isdigit()):
+                    raise PdfFormatError(f"Invalid xref entry for object {num}")
+                return 1, int(entry[:10]), int(entry[11:16])
+        return None
+
+
+class _XrefStream:
+    # A cross-reference stream (PDF 1.5+), decoded once when the section is loaded
+
+    def __init__(self, dictionary: dict, data: bytes):
+        self.trailer = dictionary
+        self.widths = [int(width) for width in dictionary.get('/W', [])]
+        if len(self.widths) != 3:
+            raise PdfFormatError("Invalid xref stream /W")
+        index = dictionary.get('/Index', [0, dictionary.get('/Size', 0)])
+        self.ranges = [(int(index[i]), int(index[i + 1])) for i in range(0, len(index) - 1, 2)]
+        self.data = data
+        self.row_size = sum(self.widths)
+
+    def lookup(self, num: int):
+        row = 0
+        for first, count in self.ranges:
+            if first <= num < first + count:
+                start = (row + num - first) * self.row_size
+                fields = []
+                for width in self.widths:
+                    fields.append(int.from_bytes(self.data[start:start + width], 'big') if width else None)
+                    start += width
+                entry_type = 1 if fields[0] is None else fields[0]
+                return entry_type, fields[1] or 0, fields[2] or 0
+            row += count
+        return None
+
+
+class LazyPdfReader:
+    """Read PDF document properties without loading pages or content streams"""
+
+    def __init__(self, source):
+        # source is a FileSource, so reads come straight from its mapping when the file is mapped
+        self.source = source
+        self.size = source.size
+        self.bytes_read = 0
+        self._object_streams = {}
+        self._objects = {}
+        head = self.read_at(0, 1024)
+        match = re.search(rb'%PDF-(\d\.\d)', head)
+        if not match:
+            raise PdfFormatError("Missing %PDF header")
+        self.version = match.group(1).decode('ascii')
+        # A linearized file announces itself in a dictionary in the first object
+        self.linearized = b'/Linearized' in head
+        self.sections, self.revisions = self._load_xref_chain()
+        self.trailer = {}
+        for section in reversed(self.sections):
+            self.trailer.update(section.trailer)
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        data = self.source.read_at(offset, length)
+        self.bytes_read += len(data)
+        return data
+
+    @property
+    def encrypted(self) -> bool:
+        return '/Encrypt' in self.trailer
+
+    @property
+    def incremental_updates(self) -> int:
+        # Every revision after the original one is an incremental update, except the
+        # extra first-page section that linearization adds
+        return max(0, self.revisions - 1 - (1 if self.linearized else 0))
+
+    def resolve(self, value):
+        """Follow an indirect reference to the object it points to"""
+        depth = 0
+        while isinstance(value, PdfRef):
+            value = self.get_object(value.num)
+            depth += 1
+            if depth > 32:
+                raise PdfFormatError("Reference loop")
+        return value
+
+    def get_object(self, num: int):
+        if num in self._objects:
+            return self._objects[num]
+        for section in self.sections:
+            entry = section.lookup(num)
+            if entry is None:
+                continue
+            entry_type, field_2, field_3 = entry
+            if entry_type == 1:
+                value = self._parse_object_at(field_2)
+            elif entry_type == 2:
+                value = self._object_from_stream(field_2, field_3)
+            else:
+                value = None
+            self._objects[num] = value
+            return value
+        return None
+
+    def stream_data(self, stream: PdfStream) -> bytes:
+        """Read and decode a stream; only FlateDecode (with PNG predictors) is supported"""
+        length = self.resolve(stream.dictionary.get('/Length'))
+        if not isinstance(length, int) or length < 0 or length > MAX_OBJECT_SIZE * 16:
+            raise PdfFormatError("Invalid stream length")
+        data = self.read_at(stream.data_offset, length)
+        filters = stream.dictionary.get('/Filter')
+        filters = filters if isinstance(filters, list) else ([filters] if filters else [])
+        parameters = self.resolve(stream.dictionary.get('/DecodeParms'))
+        if isinstance(parameters, list):
+            parameters = parameters[0] if parameters else None
+        for name in filters:
+            if name not in ('/FlateDecode', '/Fl'):
+                raise PdfFormatError(f"Unsupported stream filter {name}")
+            data = zlib.decompress(data)
+            if isinstance(parameters, dict) and parameters.get('/Predictor', 1) >= 10:
+                data = _apply_png_predictor(data, int(parameters.get('/Columns', 1)))
+        return data
+
+    def page_count(self) -> int:
+        root = self.resolve(self.trailer.get('/Root'))
+        pages = self.resolve(root.get('/Pages')) if isinstance(root, dict) else None
+        if isinstance(pages, PdfStream):
+            pages = pages.dictionary
+        if not isinstance(pages, dict):
+            raise PdfFormatError("Missing page tree")
+        return self.resolve(pages.get('/Count'))
+
+    def info(self) -> dict:
+        """The /Info dictionary with text values decoded"""
+        info = self.resolve(self.trailer.get('/Info'))
+        if not isinstance(info, dict):
+            return {}
+        return {key: decode_text(self.resolve(value)) for key, value in info.items()}
+
+    def document_id(self) -> str:
+        identifiers = self.resolve(self.trailer.get('/ID'))
+        if isinstance(identifiers, list) and identifiers and isinstance(identifiers[0], bytes):
+            return identifiers[0].hex()
+        return None
+
+    def xmp(self) -> str:
+        """The raw XMP packet referenced by /Root /Metadata, or None"""
+        root = self.resolve(self.trailer.get('/Root'))
+        metadata = self.resolve(root.get('/Metadata')) if isinstance(root, dict) else None
+        if not isinstance(metadata, PdfStream):
+            return None
+        return self.stream_data(metadata).decode('utf-8', errors='replace')
+
+    def _load_xref_chain(self) -> tuple:
+        # (xref sections, newest first, number of revisions)
+        tail_offset = max(0, self.size - TAIL_SIZE)
+        tail = self.read_at(tail_offset, TAIL_SIZE)
+        position = tail.rfind(b'startxref')
+        if position < 0:
+            raise PdfFormatError("Missing startxref")
+        match = re.match(rb'startxref\s+(\d+)', tail[position:])
+        if not match:
+            raise PdfFormatError("Invalid startxref")
+        sections = []
+        revisions = 0  # sections reached through startxref and /Prev
+        offset = int(match.group(1))
+        seen = set()
+        while offset is not None and offset not in seen:
+            seen.add(offset)
+            section = self._load_xref_section(offset)
+            sections.append(section)
+            revisions += 1
+            # Hybrid-reference files keep extra entries in a stream referenced from the table's trailer;
+            # it belongs to the same revision as the table
+            if isinstance(section, _XrefTable) and isinstance(section.trailer.get('/XRefStm'), int):
+                sections.append(self._load_xref_section(section.trailer['/XRefStm']))
+            previous = section.trailer.get('/Prev')
+            offset = previous if isinstance(previous, int) else None
+        return sections, revisions
+
+    def _load_xref_section(self, offset: int):
+        if offset <= 0 or offset >= self.size:
+            raise PdfFormatError("xref offset out of range")
+        head = self.read_at(offset, 64)
+        if head.startswith(b'xref'):
+            return self._load_xref_table(offset)
+        value = self._parse_object_at(offset)
+        if not isinstance(value, PdfStream) or value.dictionary.get('/Type') != '/XRef':
+            raise PdfFormatError("Invalid xref section")
+        return _XrefStream(value.dictionary, self.stream_data(value))
+
+    def _load_xref_table(self, offset: int) -> _XrefTable:
+        # Read the subsection headers, skipping over the entries themselves
+        position = offset + 4
+        subsections = []
+        while True:
+            chunk = self.read_at(position, 64)
+            match = re.match(rb'\s*(\d+)\s+(\d+)[ \t]*(\r\n|\r|\n)', chunk)
+            if not match:
+                break
+            first, count = int(match.group(1)), int(match.group(2))
+            entries = position + match.end()
+            # Entries should be 20 bytes, but some writers end them with a single-byte EOL
+            sample = self.read_at(entries, 20) if count else b''
+            entry_size = 20 if sample[19:20] in (b'\n', b'\r') else 19
+            subsections.append((first, count, entries, entry_size))
+            position = entries + count * entry_size
+        chunk = self.read_at(position, 64)
+        match = re.match(rb'\s*trailer', chunk)
+        if not match:
+            raise PdfFormatError("Missing trailer")
+        trailer = self._parse_at(position + match.end())
+        if not isinstance(trailer, dict):
+            raise PdfFormatError("Invalid trailer")
+        return _XrefTable(self, subsections, trailer)
+
+    def _parse_at(self, offset: int, header: bool = False):
+        # Parse one object at a file offset, reading more of the file until it is complete
+        size = 1024
+        while True:
+            data = self.read_at(offset, size)
+            parser = _Parser(data)
+            try:
+                if header:
+                    parser.token()
+                    parser.token()
+                    if parser.token() != b'obj':
+                        raise PdfFormatError("Invalid object header")
+                value = parser.parse()
+                if header and isinstance(value, dict):
+                    parser.skip_whitespace()
+                    if data[parser.position:parser.position + 6] == b'stream':
+                        position = parser.position + 6
+                        position += 2 if data[position:position + 2] == b'\r\n' else 1
+                        return PdfStream(value, offset + position)
+                return value
+            except _Incomplete:
+                if len(data) < size or size >= MAX_OBJECT_SIZE:
+                    raise PdfFormatError("Truncated object")
+                size *= 4
+
+    def _parse_object_at(self, offset: int):
+        return self._parse_at(offset, header=True)
+
+    def _object_from_stream(self, stream_num: int, index: int):
+        # Objects compressed into an object stream (/Type /ObjStm)
+        if stream_num not in self._object_streams:
+            stream = self.get_object(stream_num)
+            if not isinstance(stream, PdfStream):
+                raise PdfFormatError("Invalid object stream")
+            data = self.stream_data(stream)
+            count = int(stream.dictionary.get('/N', 0))
+            first = int(stream.dictionary.get('/First', 0))
+            numbers = [int(token) for token in data[:first].split()][:count * 2]
+            self._object_streams[stream_num] = (data, first, numbers)
+        data, first, numbers = self._object_streams[stream_num]
+        if index * 2 + 1 >= len(numbers):
+            return None
+        try:
+            return _Parser(data, first + numbers[index * 2 + 1]).parse()
+        except _Incomplete:
+            raise PdfFormatError("Truncated object stream")
+
+
+XMP_NAMESPACES = {
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'xmp': 'http://ns.adobe.com/xap/1.0/',
+    'pdf': 'http://ns.adobe.com/pdf/1.3/',
+    'xmpMM': 'http://ns.adobe.com/xap/1.0/mm/',
+}
+
+# Qualified XMP property -> reported name
+XMP_PROPERTIES = {
+    'dc:title': 'Title',
+    'dc:creator': 'Creator',
+    'dc:description': 'Description',
+    'xmp:CreateDate': 'Create Date',
+    'xmp:ModifyDate': 'Modify Date',
+    'xmp:CreatorTool': 'Creator Tool',
+    'pdf:Producer': 'Producer',
+    'pdf:Keywords': 'Keywords',
+    'xmpMM:DocumentID': 'Document ID',
+}
+
+
+def parse_xmp(packet: str) -> dict:
+    """Pull the common Dublin Core / XMP properties out of an XMP packet"""
+    start = packet.find('<x:xmpmeta')
+    end = packet.rfind('</x:xmpmeta>')
+    if start < 0 or end < 0:
+        start = packet.find('<rdf:RDF')
+        end_tag = '</rdf:RDF>'
+        end = packet.rfind(end_tag)
+    else:
+        end_tag = '</x:xmpmeta>'
+    if start < 0 or end < 0:
+        return {}
+    try:
+        root = ElementTree.fromstring(packet[start:end + len(end_tag)])
+    except ElementTree.ParseError:
+        return {}
+    wanted = {}
+    for qualified, name in XMP_PROPERTIES.items():
+        prefix, local = qualified.split(':')
+        wanted[f"{{{XMP_NAMESPACES[prefix]}}}{local}"] = name
+    properties = {}
+    for description in root.iter(f"{{{XMP_NAMESPACES['rdf']}}}Description"):
+        # Simple properties may be written as attributes of rdf:Description
+        for attribute, value in description.attrib.items():
+            if attribute in wanted:
+                properties[wanted[attribute]] = value
+        for child in description:
+            if child.tag in wanted:
+                items = [item.text or '' for item in child.iter(f"{{{XMP_NAMESPACES['rdf']}}}li")]
+                properties[wanted[child.tag]] = ', '.join(items) if items else (child.text or '').strip()
+    return properties
+
+
+def read_pdf_info(file_path: str, read_xmp: bool = True, source=None) -> dict:
+    """
+    Read a PDF's version, /Info, page count, ID and structure flags lazily.
+
+    Raises PdfFormatError if the file uses something the lazy reader doesn't
+    support (encryption, unusual filters, a broken xref); callers should then
+    fall back to a full parser. An already open FileSource for the file can be
+    passed as `source`.
+    """
+    with open_source(file_path, source) as opened:
+        reader = LazyPdfReader(opened)
+        if reader.encrypted:
+            raise PdfFormatError("Encrypted PDF")
+        result = {
+            'version': reader.version,
+            'info': reader.info(),
+            'page_count': reader.page_count(),
+            'document_id': reader.document_id(),
+            'linearized': reader.linearized,
+            'encrypted': False,
+            'incremental_updates': reader.incremental_updates,
+            'xmp': {},
+        }
+        if read_xmp:
+            packet = reader.xmp()
+            if packet:
+                result['xmp'] = parse_xmp(packet)
+        result['bytes_read'] = reader.bytes_read
+        return result
@@ -1,21 +1,37 @@
-import exifread
-import os
+from exif import read_exif_buffer
 from formatter import Formatter
+from source import open_source
 
 class PhotoMetadata:
-    def __init__(self, file_path: str):
+    VERSION = 1
+    CPU_BOUND = True
+    READS_SOURCE = True
+
+    def __init__(self, file_path: str, fast: bool = True, source=None):
         self.file_path = file_path # file_path to the photo file
+        self.fast = fast # read only the EXIF header tags we report instead of running exifread
+        self.source = source # already open FileSource for file_path, if the caller has one
         self.formatter = Formatter()
 
+    def read_tags(self, source):
+        # Return the EXIF tags and the file size, using the header-only reader on the mapped file when it can handle it
+        if self.fast:
+            tags = read_exif_buffer(source.buffer)
+            if tags is not None:
+                return tags, source.size
+        # exifread is only needed for files the fast path can't handle, so it isn't imported at startup
+        import exifread
+        return exifread.process_file(source.rewind()), source.size
+
     def extract_metadata(self):
         # Extract metadata from the photo file
         try:
-            with open(self.file_path, 'rb') as f:
+            with open_source(self.file_path, self.source) as source:
                 # Read the EXIF data from the file
-                tags = exifread.process_file(f)
+                tags, file_size = self.read_tags(source)
                 metadata = {}
                 
-                metadata['File Size'] = self.formatter.format_size(os.path.getsize(self.file_path))
+                metadata['File Size'] = self.formatter.format_size(file_size)
                 metadata['Camera Make'] = tags.get('Image Make')
                 metadata['Camera Model'] = tags.get('Image Model')
                 metadata['Date and Time'] = tags.get('EXIF DateTimeOriginal')
@@ -44,7 +60,8 @@ class PhotoMetadata:
                 metadata['SceneCaptureType'] = tags.get('EXIF SceneCaptureType')
                 
                 metadata['ISO'] = tags.get('EXIF ISOSpeedRatings')
-                metadata['Exposure Time'] = self.formatter.format_exposure_time(tags.get('EXIF ExposureTime').values[0])
+                exposure_time = tags.get('EXIF ExposureTime')
+                metadata['Exposure Time'] = self.formatter.format_exposure_time(exposure_time.values[0] if exposure_time else None)
                 metadata['Exposure Program'] = tags.get('EXIF ExposureProgram')
                 metadata['ExposureBiasValue'] = tags.get('EXIF ExposureBiasValue')
                 metadata['ExposureMode'] = tags.get('EXIF ExposureMode')
@@ -0,0 +1,148 @@
+import struct
+import zlib
+from datetime import datetime
+from exif import read_tiff_tags
+from formatter import Formatter
+from source import open_source
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+COLOR_TYPES = {
+    0: 'Grayscale',
+    2: 'RGB',
+    3: 'Indexed',
+    4: 'Grayscale with Alpha',
+    6: 'RGBA',
+}
+
+# Chunks whose payload we decode; everything else (IDAT in particular) is skipped with a seek
+WANTED_CHUNKS = {b'IHDR', b'pHYs', b'tIME', b'tEXt', b'zTXt', b'iTXt', b'eXIf'}
+
+# Upper bound on a single decoded chunk, so a corrupt length can't make us read the whole file
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+XMP_KEYWORD = 'XML:com.adobe.xmp'
+
+# Text chunks carry arbitrary keyword/value pairs; they are added after the decoded fields and never replace them
+TEXT_CHUNKS = {b'tEXt', b'zTXt', b'iTXt'}
+
+# Keys the pipeline gives a meaning to, so a text keyword can't claim them either
+RESERVED_KEYS = {'error'}
+
+
+class PngMetadata:
+    VERSION = 2
+    # Only chunk headers are read, so this is I/O-bound and stays on threads
+    CPU_BOUND = False
+    READS_SOURCE = True
+
+    def __init__(self, file_path: str, source=None):
+        self.file_path = file_path # file_path to the PNG file
+        self.source = source # already open FileSource for file_path, if the caller has one
+        self.formatter = Formatter()
+
+    def read_chunks(self, source):
+        """
+        Yield (chunk_type, data) for the chunks we report, in file order.
+
+        Only the 8-byte chunk headers and the wanted payloads are read, straight
+        from the mapped file when there is one; unwanted payloads, including all
+        image data, are never touched.
+        """
+        if source.read_at(0, 8) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        position = 8
+        while position + 8 <= source.size:
+            length, chunk_type = struct.unpack('>L4s', source.read_at(position, 8))
+            if chunk_type == b'IEND':
+                return
+            if chunk_type in WANTED_CHUNKS and length <= MAX_CHUNK_SIZE:
+                yield chunk_type, source.read_at(position + 8, length)
+            position += length + 12  # header, payload and CRC
+
+    def extract_metadata(self):
+        # Extract metadata from the PNG chunk headers
+        try:
+            with open_source(self.file_path, self.source) as source:
+                metadata = {}
+                metadata['File Size'] = self.formatter.format_size(source.size)
+                texts = []
+                for chunk_type, data in self.read_chunks(source):
+                    handler = getattr(self, f"_read_{chunk_type.decode('ascii')}")
+                    if chunk_type in TEXT_CHUNKS:
+                        texts.append(handler(data))
+                    else:
+                        handler(data, metadata)
+                for keyword, text in texts:
+                    self._add_text(metadata, keyword, text)
+                return metadata
+
+        except IOError as e:
+            return {'error': f"Error reading file: {e}"}
+
+        except (ValueError, struct.error, zlib.error) as e:
+            return {'error': f"Invalid PNG file: {e}"}
+
+    def _read_IHDR(self, data, metadata):
+        width, height, bit_depth, color_type, compression, _, interlace = struct.unpack('>LLBBBBB', data[:13])
+        metadata['Resolution'] = f"{width} x {height}"
+        metadata['Bit Depth'] = bit_depth
+        metadata['Color Type'] = COLOR_TYPES.get(color_type, f"Unknown ({color_type})")
+        metadata['Compression'] = 'Deflate' if compression == 0 else f"Unknown ({compression})"
+        metadata['Interlace'] = 'Adam7' if interlace == 1 else 'None'
+
+    def _read_pHYs(self, data, metadata):
+        pixels_x, pixels_y, unit = struct.unpack('>LLB', data[:9])
+        if unit == 1:
+            # Pixels per metre, reported as DPI
+            metadata['Pixel Density'] = f"{pixels_x * 0.0254:.0f} x {pixels_y * 0.0254:.0f} dpi"
+        else:
+            metadata['Pixel Aspect Ratio'] = f"{pixels_x}:{pixels_y}"
+
+    def _read_tIME(self, data, metadata):
+        year, month, day, hour, minute, second = struct.unpack('>HBBBBB', data[:7])
+        try:
+            modified = datetime(year, month, day, hour, minute, second)
+        except ValueError:
+            # An impossible date only costs this field, not the rest of the file
+            return
+        metadata['Date Modified'] = modified.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Text chunk readers return (keyword, text)
+    def _read_tEXt(self, data):
+        keyword, _, text = data.partition(b'\x00')
+        return keyword.decode('latin-1'), text.decode('latin-1')
+
+    def _read_zTXt(self, data):
+        keyword, _, rest = data.partition(b'\x00')
+        # rest[0] is the compression method, always zlib
+        return keyword.decode('latin-1'), zlib.decompress(rest[1:]).decode('latin-1')
+
+    def _read_iTXt(self, data):
+        keyword, _, rest = data.partition(b'\x00')
+        compressed = rest[0]
+        # Skip the compression method, language tag and translated keyword
+        _, _, rest = rest[2:].partition(b'\x00')
+        _, _, text = rest.partition(b'\x00')
+        if compressed:
+            text = zlib.decompress(text)
+        return keyword.decode('latin-1'), text.decode('utf-8', errors='replace')
+
+    def _read_eXIf(self, data, metadata):
+        tags = read_tiff_tags(data)
+        metadata['Camera Make'] = tags.get('Image Make')
+        metadata['Camera Model'] = tags.get('Image Model')
+        metadata['Date and Time'] = tags.get('EXIF DateTimeOriginal')
+        metadata['LensMake'] = tags.get('EXIF LensMake')
+        metadata['LensModel'] = tags.get('EXIF LensModel')
+        metadata['ISO'] = tags.get('EXIF ISOSpeedRatings')
+        metadata['FNumber'] = tags.get('EXIF FNumber')
+
+    @staticmethod
+    def _add_text(metadata, keyword, text):
+        # XMP packets are stored in an iTXt chunk under a well-known keyword
+        key = 'XMP' if keyword == XMP_KEYWORD else keyword
+        # A keyword that collides with a decoded field (or a repeated keyword) is kept under a prefix
+        if key in metadata or key in RESERVED_KEYS:
+            key = f"Text {keyword}"
+        metadata[key] = text
@@ -0,0 +1,109 @@
+"""
+Registry of metadata extractors.
+
+Extractors are registered as "module:Class" strings and only imported the
+first time a file needs them, so a session that only inspects JPEGs never
+loads pikepdf, openpyxl or libmediainfo. Files are matched by extension,
+and the magic bytes at the start of the file can override that choice when
+they belong to another extractor.
+
+New extractors can be added without touching metadata.py:
+
+    from registry import register_extractor
+    register_extractor('heif:HeifMetadata', extensions=['.heic'], magic=[(4, b'ftypheic')])
+
+An extractor class is constructed with the file path and provides
+extract_metadata(). Optional class attributes tune how it is run:
+
+    VERSION       bump when the extracted fields change, so cached results
+                  are re-parsed (default 1)
+    CPU_BOUND     parsing is CPU-bound pure Python, so the hybrid backend
+                  runs it in worker processes rather than threads
+    READS_SOURCE  the extractor also takes `source=`, the pipeline's shared
+                  FileSource, instead of reopening the file
+"""
+import importlib
+import threading
+
+
+class ExtractorRegistry:
+    """Maps extensions and magic-byte signatures to lazily imported extractor classes"""
+
+    def __init__(self):
+        self._extensions = {}  # '.jpg' -> 'photo:PhotoMetadata'
+        self._signatures = []  # (offset, magic bytes, target)
+        self._classes = {}  # 'photo:PhotoMetadata' -> class, once imported
+        self._lock = threading.Lock()
+
+    def register(self, target: str, extensions=(), magic=()):
+        """
+        Register an extractor given as "module:Class".
+
+        `extensions` are matched case-insensitively and override earlier
+        registrations; `magic` is a list of (offset, bytes) signatures. A file
+        goes to the extractor of its extension unless that extractor has
+        signatures, none of them match and another extractor's does; files
+        with unregistered extensions go by magic alone. When several
+        signatures match, the longest one wins.
+        """
+        if ':' not in target:
+            raise ValueError(f"Extractor must be given as 'module:Class', not {target!r}")
+        for extension in extensions:
+            self._extensions[extension.lower()] = target
+        for offset, signature in magic:
+            self._signatures.append((offset, signature, target))
+
+    def extensions(self) -> set:
+        """Every registered file extension, e.g. for filtering a directory scan"""
+        return set(self._extensions)
+
+    def for_extension(self, extension: str):
+        target = self._extensions.get(extension.lower())
+        return self.load(target) if target else None
+
+    def for_head(self, head: bytes):
+        """Extractor with the longest magic signature matching the start of a file, or None"""
+        best = None
+        for offset, signature, target in self._signatures:
+            if head[offset:offset + len(signature)] == signature and (best is None or len(signature) > len(best[0])):
+                best = signature, target
+        return self.load(best[1]) if best else None
+
+    def for_content(self, extractor, head: bytes):
+        """
+        Extractor for a file, given the one its extension suggests (or None) and
+        the start of its contents; see register for when the magic bytes win.
+        """
+        if extractor is not None:
+            target = f"{extractor.__module__}:{extractor.__qualname__}"
+            own = [(offset, signature) for offset, signature, other in self._signatures if other == target]
+            if not own or any(head[offset:offset + len(signature)] == signature for offset, signature in own):
+                return extractor
+        return self.for_head(head) or extractor
+
+    def load(self, target: str):
+        # Import the extractor's module on first use
+        extractor = self._classes.get(target)
+        if extractor is None:
+            with self._lock:
+                extractor = self._classes.get(target)
+                if extractor is None:
+                    module_name, class_name = target.split(':')
+                    extractor = getattr(importlib.import_module(module_name), class_name)
+                    self._classes[target] = extractor
+        return extractor
+
+
+# Shared registry with the built-in extractors
+registry = ExtractorRegistry()
+registry.register('document:DocumentMetadata', extensions=['.docx', '.xlsx', '.pptx'], magic=[(0, b'PK\x03\x04')])
+registry.register('document:DocumentMetadata', extensions=['.pdf'], magic=[(0, b'%PDF-')])
+registry.register('video:VideoMetadata', extensions=['.mp4', '.avi', '.mov', '.mkv', '.mpeg'],
+                  magic=[(4, b'ftyp'), (0, b'\x1a\x45\xdf\xa3')])
+registry.register('photo:PhotoMetadata', extensions=['.jpg', '.jpeg'], magic=[(0, b'\xff\xd8\xff')])
+registry.register('pngfile:PngMetadata', extensions=['.png'], magic=[(0, b'\x89PNG\r\n\x1a\n')])
+
+
+def register_extractor(target: str, extensions=(), magic=()):
+    """Register an extractor with the shared registry; see ExtractorRegistry.register"""
+    registry.register(target, extensions, magic)
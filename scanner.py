@@ -0,0 +1,48 @@
+import os
+import sys
+
+
+def scan_paths(paths, extensions=None, recursive: bool = True, on_error=None):
+    """
+    Yield the files found under each of `paths` without building a list first.
+
+    Directories are walked iteratively with os.scandir, so memory stays bounded by
+    the depth of the tree rather than the number of files. Only files whose
+    lower-cased extension is in `extensions` are yielded (all files if None).
+    Symlinked directories are not followed to avoid cycles.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from scan_directory(path, extensions, recursive, on_error)
+        elif _has_extension(path, extensions):
+            yield path
+
+
+def scan_directory(root: str, extensions=None, recursive: bool = True, on_error=None):
+    # Walk a directory tree depth-first using an explicit stack of pending directories
+    if on_error is None:
+        on_error = _report_error
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file() and _has_extension(entry.name, extensions):
+                            yield entry.path
+                    except OSError as e:
+                        on_error(entry.path, e)
+        except OSError as e:
+            on_error(directory, e)
+
+
+def _has_extension(path: str, extensions) -> bool:
+    return extensions is None or os.path.splitext(path)[1].lower() in extensions
+
+
+def _report_error(path: str, error: Exception):
+    print(f"Error scanning {path}: {error}", file=sys.stderr)
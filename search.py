@@ -0,0 +1,271 @@
+"""
+In-memory inverted index over extracted metadata.
+
+Results are added one file at a time as they stream in. Every tag maps each
+of its (case-folded) values to a compact array of file ids, and tags with
+numeric values also keep a sorted (number, file id) list, so exact, prefix
+and numeric-range lookups touch only the matching postings:
+
+    index = MetadataIndex()
+    index.add(file_path, metadata)
+    index.search('Camera Model = ILCE-7M3')
+    index.search('Extension = pdf AND Author = Jane')
+    index.search('Page Count >= 10 AND Title = Annual*')
+
+Query clauses are `Tag <op> value` with op one of = != > >= < <=, joined by
+AND. A value ending in * is a prefix match. Besides the extracted tags every
+file has the pseudo-tags "File Name" and "Extension" (without the dot).
+"""
+import operator
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+CLAUSE_PATTERN = re.compile(r'^\s*(.+?)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$')
+CLAUSE_SEPARATOR = re.compile(r'\s+AND\s+|\s*;\s*', re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r'^[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+COMPARISONS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+# Tags every file gets in addition to its metadata
+FILE_NAME_TAG = 'File Name'
+EXTENSION_TAG = 'Extension'
+PSEUDO_TAGS = {FILE_NAME_TAG.casefold(): FILE_NAME_TAG, EXTENSION_TAG.casefold(): EXTENSION_TAG}
+
+
+def to_number(value):
+    """The value as a float if it is a number or a string holding only a number, else None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and NUMBER_PATTERN.match(value.strip()):
+        return float(value)
+    return None
+
+
+class Clause:
+    """One `tag op value` condition"""
+
+    def __init__(self, tag: str, op: str, value: str):
+        self.tag = tag
+        self.op = op
+        self.value = value
+        self.prefix = op in ('=', '!=') and value.endswith('*')
+        self.text = (value[:-1] if self.prefix else value).casefold()
+        self.number = None if self.prefix else to_number(value)
+        self.compare = COMPARISONS.get(op)
+        if self.compare and self.number is None:
+            raise ValueError(f"'{tag} {op}' needs a number, not {value!r}")
+
+    def test(self, value) -> bool:
+        """Whether a tag value satisfies the clause"""
+        if self.compare:
+            number = to_number(value)
+            return number is not None and self.compare(number, self.number)
+        text = str(value).casefold()
+        equal = text.startswith(self.text) if self.prefix else (
+            text == self.text or (self.number is not None and to_number(value) == self.number))
+        return equal == (self.op == '=')
+
+    def matches(self, file_path: str, metadata: dict) -> bool:
+        """Evaluate the clause against one file's metadata and its file-name pseudo-tags"""
+        # Tags are usually written as they appear in the results, so try the exact key first
+        if self.tag in metadata:
+            return self.test(metadata[self.tag])
+        tag = self.tag.casefold()
+        if tag in PSEUDO_TAGS:
+            return self.test(file_tags(file_path)[PSEUDO_TAGS[tag]])
+        for key, value in metadata.items():
+            if str(key).casefold() == tag:
+                return self.test(value)
+        return self.op == '!='
+
+
+class Query:
+    """A parsed query: clauses that must all hold"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.clauses = []
+        for part in CLAUSE_SEPARATOR.split(text.strip()):
+            if not part:
+                continue
+            match = CLAUSE_PATTERN.match(part)
+            if not match or not match.group(3):
+                raise ValueError(f"Expected 'Tag = value', 'Tag >= number' ...: {part!r}")
+            self.clauses.append(Clause(*match.groups()))
+        if not self.clauses:
+            raise ValueError("Empty query")
+
+    def matches(self, file_path: str, metadata: dict) -> bool:
+        """Evaluate the query against a single result without an index"""
+        return all(clause.matches(file_path, metadata) for clause in self.clauses)
+
+
+def parse_query(text: str):
+    """Return a Query if `text` uses the query syntax, or None for plain search text"""
+    if not CLAUSE_PATTERN.match(text.split(';')[0]):
+        return None
+    return Query(text)
+
+
+def file_tags(file_path: str) -> dict:
+    return {
+        FILE_NAME_TAG: os.path.basename(file_path),
+        EXTENSION_TAG: os.path.splitext(file_path)[1].lstrip('.').lower(),
+    }
+
+
+class _TagIndex:
+    # Postings for one tag: value -> file ids, plus numeric values kept sorted on demand
+
+    __slots__ = ('values', 'sorted_values', 'numbers', 'number_ids', 'unsorted')
+
+    def __init__(self):
+        self.values = {}  # case-folded value -> array of file ids
+        self.sorted_values = None  # sorted keys of `values`, rebuilt after new values arrive
+        self.numbers = array('d')
+        self.number_ids = array('I')
+        self.unsorted = False
+
+    def add(self, file_id: int, value):
+        text = str(value).casefold()
+        postings = self.values.get(text)
+        if postings is None:
+            postings = self.values[text] = array('I')
+            self.sorted_values = None
+        postings.append(file_id)
+        number = to_number(value)
+        if number is not None:
+            self.numbers.append(number)
+            self.number_ids.append(file_id)
+            self.unsorted = True
+
+    def exact(self, text: str):
+        return self.values.get(text, ())
+
+    def prefix(self, text: str) -> list:
+        # Postings of every value starting with text
+        if self.sorted_values is None:
+            self.sorted_values = sorted(self.values)
+        postings = []
+        position = bisect_left(self.sorted_values, text)
+        while position < len(self.sorted_values) and self.sorted_values[position].startswith(text):
+            postings.append(self.values[self.sorted_values[position]])
+            position += 1
+        return postings
+
+    def span(self, low: float = None, high: float = None, include_low=True, include_high=True) -> tuple:
+        # Start and end positions of the range in the sorted numeric postings
+        if self.unsorted:
+            order = sorted(range(len(self.numbers)), key=self.numbers.__getitem__)
+            self.numbers = array('d', (self.numbers[i] for i in order))
+            self.number_ids = array('I', (self.number_ids[i] for i in order))
+            self.unsorted = False
+        start = 0 if low is None else (bisect_left if include_low else bisect_right)(self.numbers, low)
+        end = len(self.numbers) if high is None else (bisect_right if include_high else bisect_left)(self.numbers, high)
+        return start, end
+
+    def between(self, *bounds, **options):
+        # Ids of the files whose value lies in the range, as a slice of the sorted numeric postings
+        start, end = self.span(*bounds, **options)
+        return self.number_ids[start:end]
+
+
+class MetadataIndex:
+    """
+    Inverted index from tag -> value -> file ids, built incrementally.
+
+    Tag names and values are matched case-insensitively. A query is answered
+    from the postings of its most selective clause; the other clauses are
+    checked against just those files' metadata, so a broad clause such as
+    "Extension = pdf" costs nothing when combined with a narrow one. Adding a
+    file that is already indexed replaces its earlier entry.
+    """
+
+    def __init__(self):
+        self.paths = []  # file id -> path, None once replaced
+        self.metadata = []  # file id -> metadata dict, None once replaced
+        self.ids = {}  # path -> current file id
+        self.tags = {}  # case-folded tag name -> _TagIndex
+        self._removed = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, file_path: str, metadata: dict):
+        previous = self.ids.get(file_path)
+        if previous is not None:
+            self._removed.add(previous)
+            self.paths[previous] = None
+            self.metadata[previous] = None
+        file_id = len(self.paths)
+        self.paths.append(file_path)
+        self.metadata.append(metadata)
+        self.ids[file_path] = file_id
+        for key, value in (*metadata.items(), *file_tags(file_path).items()):
+            tag = str(key).casefold()
+            tag_index = self.tags.get(tag)
+            if tag_index is None:
+                tag_index = self.tags[tag] = _TagIndex()
+            tag_index.add(file_id, value)
+
+    def clear(self):
+        self.__init__()
+
+    def _ranges(self, clause: Clause) -> list:
+        # (postings, start, end) slices whose union is the set of files matching a positive clause
+        tag_index = self.tags.get(clause.tag.casefold())
+        if tag_index is None:
+            return []
+        if clause.prefix:
+            return [(ids, 0, len(ids)) for ids in tag_index.prefix(clause.text)]
+        if clause.op == '=':
+            ids = tag_index.exact(clause.text)
+            ranges = [(ids, 0, len(ids))]
+            if clause.number is not None:
+                # span() may re-sort the numeric postings, replacing number_ids, so it runs first
+                start, end = tag_index.span(clause.number, clause.number)
+                ranges.append((tag_index.number_ids, start, end))
+            return ranges
+        if clause.op == '>':
+            span = tag_index.span(low=clause.number, include_low=False)
+        elif clause.op == '>=':
+            span = tag_index.span(low=clause.number)
+        elif clause.op == '<':
+            span = tag_index.span(high=clause.number, include_high=False)
+        else:
+            span = tag_index.span(high=clause.number)
+        return [(tag_index.number_ids, *span)]
+
+    def postings(self, clause: Clause) -> list:
+        """Id sequences whose union is the set of files matching a positive clause"""
+        return [ids[start:end] for ids, start, end in self._ranges(clause)]
+
+    def search_ids(self, query) -> set:
+        """File ids matching every clause of a query (a Query or its text)"""
+        if isinstance(query, str):
+            query = Query(query)
+        positive = [clause for clause in query.clauses if clause.op != '!=']
+        if positive:
+            # Candidates come from the clause with the fewest postings; sizing them doesn't copy anything
+            first, ranges = min(((clause, self._ranges(clause)) for clause in positive),
+                                key=lambda item: sum(end - start for _, start, end in item[1]))
+            candidates = set()
+            for ids, start, end in ranges:
+                candidates.update(ids[start:end])
+            if self._removed:
+                candidates -= self._removed
+            rest = [clause for clause in query.clauses if clause is not first]
+        else:
+            candidates = set(self.ids.values())
+            rest = query.clauses
+        paths, metadata = self.paths, self.metadata
+        for clause in rest:
+            candidates = {file_id for file_id in candidates if clause.matches(paths[file_id], metadata[file_id])}
+        return candidates
+
+    def search(self, query) -> list:
+        """Paths of the files matching a query, in the order they were added"""
+        return [self.paths[file_id] for file_id in sorted(self.search_ids(query))]
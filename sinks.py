@@ -0,0 +1,235 @@
+"""
+Destinations for extracted metadata.
+
+A sink takes {file path: metadata} batches through `write` and is used as a
+context manager so buffered rows are flushed on exit:
+
+    with open_sink('sqlite:~/metadata.sqlite3') as sink:
+        sink.write(results)
+
+`open_sink` understands 'firebase' (the Realtime Database, through the durable
+export outbox) and 'sqlite[:path]' (a local, indexed store that works
+air-gapped). The default comes from METAXTRACTOR_SINK and is 'firebase'.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from search import to_number
+
+DEFAULT_SINK = os.environ.get('METAXTRACTOR_SINK', 'firebase')
+
+# Default location of the local store, can be overridden with METAXTRACTOR_STORE
+DEFAULT_STORE_PATH = os.environ.get(
+    'METAXTRACTOR_STORE',
+    os.path.join(os.path.expanduser('~'), '.metaxtractor', 'metadata.sqlite3'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id           INTEGER PRIMARY KEY,
+    path         TEXT NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    size         INTEGER,
+    extracted_at REAL NOT NULL,
+    current      INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (path, mtime_ns)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name    TEXT NOT NULL,
+    value   TEXT,
+    number  REAL,
+    PRIMARY KEY (file_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tags_name_value ON tags(name, value);
+CREATE INDEX IF NOT EXISTS idx_tags_name_number ON tags(name, number) WHERE number IS NOT NULL;
+"""
+
+
+class MetadataSink:
+    """Base class for metadata destinations"""
+
+    def write(self, results: dict):
+        """Store {file path: metadata dict}; may buffer until `flush`"""
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FirebaseSink(MetadataSink):
+    """
+    Queue results in the export outbox; its flusher uploads them to the Realtime Database.
+
+    By default `close` leaves the upload to the background flusher, which is
+    right for a long-running app. With `wait` (seconds) `close` sends whatever
+    is queued before returning, as a command line run must since daemon
+    threads die with it, and reports anything still unsent.
+    """
+
+    def __init__(self, wait: float = None):
+        # Imported here so opening a SQLite sink doesn't touch the outbox
+        from outbox import get_default_outbox
+        self.outbox = get_default_outbox()
+        self.wait = wait
+
+    def write(self, results: dict):
+        self.outbox.enqueue(results)
+
+    def flush(self):
+        # Queued entries are durable already; make sure the flusher is running to send them
+        from outbox import start_flusher
+        start_flusher()
+
+    def close(self):
+        if self.wait is None:
+            self.flush()
+            return
+        from outbox import drain
+        left = drain(self.wait)
+        if left:
+            print(f"{left} files were not exported to Firebase; they stay queued in {self.outbox.path} and are sent "
+                  f"by the next Firebase export or when the app starts", file=sys.stderr)
+
+
+class SqliteSink(MetadataSink):
+    """
+    Local SQLite store with one `files` row per (path, mtime) and one `tags` row
+    per metadata field, indexed by tag name and value so lookups such as "all
+    files where Camera Model = X" stay fast on millions of rows. Writing a file
+    again with the same mtime replaces its tags; a newer mtime adds a row and
+    marks the older ones as no longer current. Queries only see current rows.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(_SCHEMA)
+        self._pending = {}
+
+    def write(self, results: dict):
+        with self.lock:
+            self._pending.update(results)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Write buffered results in one transaction"""
+        with self.lock:
+            if not self._pending:
+                return
+            now = time.time()
+            files = []
+            for file_path, metadata in self._pending.items():
+                try:
+                    stat_result = os.stat(file_path)
+                    files.append((file_path, stat_result.st_mtime_ns, stat_result.st_size, metadata))
+                except OSError:
+                    files.append((file_path, 0, None, metadata))
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.executemany(
+                    'INSERT INTO files (path, mtime_ns, size, extracted_at, current) VALUES (?, ?, ?, ?, 1) '
+                    'ON CONFLICT (path, mtime_ns) DO UPDATE SET size = excluded.size, '
+                    'extracted_at = excluded.extracted_at, current = 1',
+                    [(file_path, mtime_ns, size, now) for file_path, mtime_ns, size, _ in files]
+                )
+                self.connection.executemany(
+                    'UPDATE files SET current = 0 WHERE path = ? AND mtime_ns != ? AND current = 1',
+                    [(file_path, mtime_ns) for file_path, mtime_ns, _, _ in files]
+                )
+                file_ids = [
+                    self.connection.execute(
+                        'SELECT id FROM files WHERE path = ? AND mtime_ns = ?', (file_path, mtime_ns)
+                    ).fetchone()[0]
+                    for file_path, mtime_ns, _, _ in files
+                ]
+                self.connection.executemany('DELETE FROM tags WHERE file_id = ?', [(file_id,) for file_id in file_ids])
+                self.connection.executemany(
+                    'INSERT INTO tags (file_id, name, value, number) VALUES (?, ?, ?, ?)',
+                    [
+                        (file_id, str(name), None if value is None else str(value), to_number(value))
+                        for file_id, (_, _, _, metadata) in zip(file_ids, files)
+                        for name, value in metadata.items()
+                    ]
+                )
+            self._pending = {}
+
+    def files_where(self, name: str, value) -> list:
+        """Paths of the files whose tag `name` equals `value`"""
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                'SELECT files.path FROM tags JOIN files ON files.id = tags.file_id '
+                'WHERE tags.name = ? AND tags.value = ? AND files.current = 1 ORDER BY files.path',
+                (name, str(value))
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def files_between(self, name: str, minimum: float = None, maximum: float = None) -> list:
+        """Paths of the files whose numeric tag `name` lies within [minimum, maximum]"""
+        query = ('SELECT files.path FROM tags JOIN files ON files.id = tags.file_id '
+                 'WHERE tags.name = ? AND tags.number IS NOT NULL AND files.current = 1')
+        parameters = [name]
+        if minimum is not None:
+            query += ' AND tags.number >= ?'
+            parameters.append(minimum)
+        if maximum is not None:
+            query += ' AND tags.number <= ?'
+            parameters.append(maximum)
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(query + ' ORDER BY files.path', parameters).fetchall()
+        return [row[0] for row in rows]
+
+    def tags(self, file_path: str) -> dict:
+        """Stored metadata of the current version of a file, or {} if it isn't in the store"""
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                'SELECT tags.name, tags.value FROM tags JOIN files ON files.id = tags.file_id '
+                'WHERE files.path = ? AND files.current = 1', (file_path,)
+            ).fetchall()
+        return dict(rows)
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return self.connection.execute('SELECT COUNT(*) FROM files WHERE current = 1').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.connection.close()
+
+
+def open_sink(spec: str = None, wait: float = None) -> MetadataSink:
+    """
+    Open a sink from a spec such as 'firebase', 'sqlite' or 'sqlite:/path/to/store.sqlite3'.
+    `wait` is passed to FirebaseSink: how long closing it waits for the upload.
+    """
+    spec = spec or DEFAULT_SINK
+    kind, _, argument = spec.partition(':')
+    if kind == 'firebase':
+        return FirebaseSink(wait)
+    if kind == 'sqlite':
+        return SqliteSink(os.path.expanduser(argument) if argument else DEFAULT_STORE_PATH)
+    raise ValueError(f"Unknown sink: {spec}")
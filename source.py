@@ -0,0 +1,138 @@
+"""
+Single-open file access for extractors.
+
+A FileSource opens a file once, reuses the caller's os.stat result, maps the
+file read-only and sniffs its format from the first bytes. Extractors read
+through the shared memoryview (or the open file object) instead of opening the
+path again, so a file costs one stat, one open and one mmap however many
+readers look at it. Mislabeled files are recognised by their content.
+"""
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+
+# Bytes of the head used for format sniffing
+HEAD_SIZE = 4096
+
+ZIP_LOCAL_HEADER = b'PK\x03\x04'
+
+# First path segment of the main part -> OOXML flavour
+OOXML_PREFIXES = (('word/', 'docx'), ('xl/', 'xlsx'), ('ppt/', 'pptx'))
+
+
+def sniff(head) -> str:
+    """
+    Identify a file from its first bytes: 'jpeg', 'png', 'pdf', 'docx', 'xlsx',
+    'pptx', 'zip', 'isobmff', 'ebml', or None if unknown.
+    """
+    head = bytes(head[:HEAD_SIZE])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(ZIP_LOCAL_HEADER):
+        return _sniff_ooxml(head)
+    if head[4:8] == b'ftyp':
+        return 'isobmff'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'ebml'
+    # The PDF header may follow some leading garbage, as long as it is in the first KB
+    if b'%PDF-' in head[:1024]:
+        return 'pdf'
+    return None
+
+
+def _sniff_ooxml(head: bytes) -> str:
+    # Walk the zip's local file headers in the head looking for word/, xl/ or ppt/ part names
+    position = 0
+    while head.startswith(ZIP_LOCAL_HEADER, position) and position + 30 <= len(head):
+        flags, compressed_size, name_length, extra_length = struct.unpack_from('<2xH10xI4xHH', head, position + 4)
+        name = head[position + 30:position + 30 + name_length].decode('utf-8', errors='replace')
+        for prefix, kind in OOXML_PREFIXES:
+            if name.startswith(prefix):
+                return kind
+        if flags & 0x08:
+            # Sizes are in a trailing data descriptor, so the next header can't be located
+            break
+        position += 30 + name_length + extra_length + compressed_size
+    # Fall back to looking for a part name anywhere in the head
+    for prefix, kind in OOXML_PREFIXES:
+        if prefix.encode() in head:
+            return kind
+    return 'zip'
+
+
+class FileSource:
+    """
+    An open file with its stat result, a read-only memoryview of its contents and
+    its sniffed format. Use as a context manager.
+    """
+
+    def __init__(self, file_path: str, stat_result: os.stat_result = None):
+        self.path = file_path
+        self.file = open(file_path, 'rb')
+        try:
+            self.stat = stat_result if stat_result is not None else os.fstat(self.file.fileno())
+            self.size = self.stat.st_size
+            self._mmap = None
+            self.buffer = self._map()
+            self.head = self.buffer[:HEAD_SIZE]
+            self.kind = sniff(self.head)
+        except Exception:
+            self.file.close()
+            raise
+
+    def _map(self) -> memoryview:
+        # Map the whole file; pages are only read when touched. Fall back to reading the head.
+        if self.size:
+            try:
+                self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                return memoryview(self._mmap)
+            except (OSError, ValueError):
+                self._mmap = None
+        return memoryview(self.file.read(HEAD_SIZE))
+
+    @property
+    def mapped(self) -> bool:
+        """True if `buffer` covers the whole file rather than just its head"""
+        return self._mmap is not None
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        if self._mmap is not None:
+            return self._mmap[offset:offset + length]
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def rewind(self):
+        # Put the shared file object back at the start for readers that expect a fresh file
+        self.file.seek(0)
+        return self.file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.head.release()
+        self.buffer.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # An extractor still holds a slice of the map; it is unmapped when that is freed
+                pass
+            self._mmap = None
+        self.file.close()
+
+
+@contextmanager
+def open_source(file_path: str, source: FileSource = None):
+    """Yield `source` unchanged, or a new FileSource for `file_path` that is closed afterwards"""
+    if source is not None:
+        yield source
+        return
+    with FileSource(file_path) as owned:
+        yield owned
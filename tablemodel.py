@@ -0,0 +1,262 @@
+"""
+Table model behind the metadata view.
+
+Rows live in a compact column store (interned tag names, value strings and a
+byte per row for its kind) instead of one QTableWidgetItem per cell, and the
+view asks for only the rows it paints. Fonts and alignment are shared and
+handed out through data roles. Results are appended with beginInsertRows so
+the view never rebuilds, and sorting and filtering go through
+MetadataFilterProxyModel.
+"""
+import os
+import sys
+from array import array
+from PyQt5.QtCore import QAbstractProxyModel, QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QFont
+
+# Row kinds: the "File:" header of a file's group, one of its tags, and the blank row after it
+HEADER, TAG, SEPARATOR = 0, 1, 2
+
+HEADERS = ("Tag Name", "Value")
+
+
+class MetadataTableModel(QAbstractTableModel):
+    """Read-only two-column (tag, value) model grouped by file"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._keys = []
+        self._values = []
+        self._kinds = bytearray()
+        self._groups = array('I')  # row -> index of the file group it belongs to
+        self._group_starts = array('I')  # group -> row of its header
+        self._group_keys = []  # group -> path of its file, None for loose rows
+        # One font object per style, shared by every row
+        self.font = QFont("Roboto", 10)
+        self.header_font = QFont("Roboto", 10)
+        self.header_font.setBold(True)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return self._keys[row] if index.column() == 0 else self._values[row]
+        if role == Qt.FontRole:
+            return self.header_font if self._kinds[row] == HEADER else self.font
+        if role == Qt.TextAlignmentRole and index.column() == 0:
+            return Qt.AlignLeft | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def kind(self, row: int) -> int:
+        return self._kinds[row]
+
+    def group(self, row: int) -> int:
+        return self._groups[row]
+
+    def group_count(self) -> int:
+        return len(self._group_starts)
+
+    def group_key(self, group: int):
+        return self._group_keys[group]
+
+    def group_rows(self, group: int) -> range:
+        """Rows of a file's group, header and separator included"""
+        end = self._group_starts[group + 1] if group + 1 < len(self._group_starts) else len(self._keys)
+        return range(self._group_starts[group], end)
+
+    def text(self, row: int, column: int) -> str:
+        return self._keys[row] if column == 0 else self._values[row]
+
+    def append_file(self, file_path: str, metadata: dict):
+        """Append a file's header, one row per tag and a blank separator row"""
+        start = len(self._keys)
+        self.beginInsertRows(QModelIndex(), start, start + len(metadata) + 1)
+        group = len(self._group_starts)
+        self._group_starts.append(start)
+        self._group_keys.append(file_path)
+        self._keys.append("File:")
+        self._values.append(os.path.basename(file_path))
+        # Tag names repeat across files, so every row of a tag shares one string
+        self._keys.extend(sys.intern(str(key)) for key in metadata)
+        self._values.extend(str(value) for value in metadata.values())
+        self._keys.append("")
+        self._values.append("")
+        self._kinds.append(HEADER)
+        self._kinds.extend(bytes([TAG]) * len(metadata))
+        self._kinds.append(SEPARATOR)
+        self._groups.extend([group] * (len(metadata) + 2))
+        self.endInsertRows()
+
+    def append_rows(self, rows: list):
+        """Append loose (key, value) rows, e.g. status messages; a "File:" row starts a new group"""
+        if not rows:
+            return
+        start = len(self._keys)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        for key, value in rows:
+            if key == "File:" or not self._group_starts:
+                self._group_starts.append(len(self._keys))
+                self._group_keys.append(None)
+            self._keys.append(sys.intern(str(key)))
+            self._values.append(str(value))
+            self._kinds.append(HEADER if key == "File:" else (SEPARATOR if key == "" else TAG))
+            self._groups.append(len(self._group_starts) - 1)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._keys = []
+        self._values = []
+        self._kinds = bytearray()
+        self._groups = array('I')
+        self._group_starts = array('I')
+        self._group_keys = []
+        self.endResetModel()
+
+
+class MetadataFilterProxyModel(QAbstractProxyModel):
+    """
+    Filtered and sorted view of a MetadataTableModel.
+
+    The visible rows are kept as an array of source row numbers, so the view
+    still only asks for the rows it paints and Qt never calls back into Python
+    once per source row. Rows are filtered by a case-insensitive substring of
+    the tag name or value; a file's header and separator are shown whenever
+    any of its tags match. Whole files can also be restricted to a set of
+    paths, e.g. the hits of a metadata index query. Sorting orders the tags
+    inside each file while the files keep their order.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pattern = ""
+        self._files = None  # paths of the files to show, None for all
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._rows = array('I')  # proxy row -> source row
+        self._proxy_rows = None  # source row -> proxy row (-1 if hidden), built on demand
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.modelReset.connect(self._rebuild)
+        self._rebuild()
+
+    def set_filter_text(self, text: str):
+        pattern = text.strip().casefold()
+        if pattern != self._pattern:
+            self._pattern = pattern
+            self._rebuild()
+
+    def set_file_filter(self, file_paths):
+        """Show only the files whose path is in `file_paths` (None shows every file)"""
+        self._files = None if file_paths is None else set(file_paths)
+        self._rebuild()
+
+    def add_filtered_file(self, file_path: str):
+        # Let a file through the file filter before its rows are appended
+        if self._files is not None:
+            self._files.add(file_path)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild()
+
+    def _matches(self, row: int) -> bool:
+        model = self.sourceModel()
+        return self._pattern in model.text(row, 0).casefold() or self._pattern in model.text(row, 1).casefold()
+
+    def _visible_rows(self, rows) -> list:
+        # Visible source rows of one file's group, in display order
+        model = self.sourceModel()
+        if self._files is not None and model.group_key(model.group(rows[0])) not in self._files:
+            return []
+        tags = [row for row in rows if model.kind(row) == TAG and (not self._pattern or self._matches(row))]
+        if self._pattern and not tags:
+            return []
+        if self._sort_column >= 0:
+            column = self._sort_column
+            tags.sort(key=lambda row: model.text(row, column).casefold(), reverse=self._sort_order == Qt.DescendingOrder)
+        headers = [row for row in rows if model.kind(row) == HEADER]
+        separators = [row for row in rows if model.kind(row) == SEPARATOR]
+        return headers + tags + separators
+
+    def _filtering(self) -> bool:
+        return bool(self._pattern) or self._files is not None or self._sort_column >= 0
+
+    def _rebuild(self):
+        model = self.sourceModel()
+        self.beginResetModel()
+        if self._filtering():
+            self._rows = array('I')
+            for group in range(model.group_count()):
+                self._rows.extend(self._visible_rows(model.group_rows(group)))
+        else:
+            self._rows = array('I', range(model.rowCount()))
+        self._proxy_rows = None
+        self.endResetModel()
+
+    def _on_rows_inserted(self, parent, first, last):
+        # New results arrive as whole groups at the end, so they can be appended without touching existing rows
+        if self._filtering():
+            model = self.sourceModel()
+            rows = []
+            for group in range(model.group(first), model.group(last) + 1):
+                group_rows = model.group_rows(group)
+                rows.extend(self._visible_rows(range(max(first, group_rows.start), min(last + 1, group_rows.stop))))
+        else:
+            rows = range(first, last + 1)
+        if rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self._rows.extend(rows)
+            self._proxy_rows = None
+            self.endInsertRows()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < len(self._rows)) or not (0 <= column < 2):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._proxy_rows is None:
+            self._proxy_rows = array('i', [-1]) * self.sourceModel().rowCount()
+            for proxy_row, source_row in enumerate(self._rows):
+                self._proxy_rows[source_row] = proxy_row
+        proxy_row = self._proxy_rows[source_index.row()]
+        return self.index(proxy_row, source_index.column()) if proxy_row >= 0 else QModelIndex()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.sourceModel().data(self.sourceModel().index(self._rows[index.row()], index.column()), role)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        return self.sourceModel().headerData(section, orientation, role)
@@ -0,0 +1,33 @@
+import re
+
+import pytest
+
+from document import DocumentMetadata
+from pdfinfo import PdfFormatError, read_pdf_info
+
+pikepdf = pytest.importorskip('pikepdf')
+
+
+@pytest.fixture
+def damaged_pdf(tmp_path):
+    # A PDF whose first in-use xref entry has a non-digit in its offset; pikepdf rebuilds the table
+    pdf = pikepdf.new()
+    pdf.add_blank_page()
+    pdf.add_blank_page()
+    pdf.docinfo['/Title'] = 'Report'
+    path = tmp_path / 'damaged.pdf'
+    pdf.save(path, object_stream_mode=pikepdf.ObjectStreamMode.disable)
+    data = re.sub(rb'(\nxref\n0 \d+\n.{20})\d{10}', rb'\g<1>00000x0015', path.read_bytes(), count=1, flags=re.S)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_lazy_reader_rejects_malformed_xref_entry(damaged_pdf):
+    with pytest.raises(PdfFormatError):
+        read_pdf_info(damaged_pdf)
+
+
+def test_damaged_pdf_falls_back_to_pikepdf(damaged_pdf):
+    metadata = DocumentMetadata(damaged_pdf).extract_metadata()
+    assert metadata['Title'] == 'Report'
+    assert metadata['Page Count'] == 2
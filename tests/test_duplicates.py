@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+import duplicates
+from duplicates import SAMPLE_SIZE, DuplicateFinder
+from metadata import MetadataExtractor
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # Paths hashed by each tier, in order
+    reads = {'sample': [], 'full': []}
+    sample_digest, full_digest = duplicates.sample_digest, duplicates.full_digest
+
+    def counted_sample(path, size):
+        reads['sample'].append(os.path.basename(path))
+        return sample_digest(path, size)
+
+    def counted_full(path):
+        reads['full'].append(os.path.basename(path))
+        return full_digest(path)
+
+    monkeypatch.setattr(duplicates, 'sample_digest', counted_sample)
+    monkeypatch.setattr(duplicates, 'full_digest', counted_full)
+    return reads
+
+
+def write(directory, name, data):
+    path = directory / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_files_of_unique_size_are_never_read(tmp_path, reads):
+    finder = DuplicateFinder()
+    assert finder.original_of(write(tmp_path, 'a', b'a' * 10)) is None
+    assert finder.original_of(write(tmp_path, 'b', b'b' * 20)) is None
+    assert reads == {'sample': [], 'full': []}
+
+
+def test_same_size_files_are_sampled_then_hashed(tmp_path, reads):
+    big = os.urandom(3 * SAMPLE_SIZE)
+    middle_changed = big[:SAMPLE_SIZE] + bytes(SAMPLE_SIZE) + big[2 * SAMPLE_SIZE:]
+    finder = DuplicateFinder()
+    first = write(tmp_path, 'first', big)
+    assert finder.original_of(first) is None
+    # Same samples, different middle: only the full hash tells them apart
+    assert finder.original_of(write(tmp_path, 'changed', middle_changed)) is None
+    assert finder.original_of(write(tmp_path, 'copy', big)) == first
+    assert reads['sample'] == ['first', 'changed', 'copy']
+    assert reads['full'] == ['first', 'changed', 'copy']
+
+
+def test_small_files_are_decided_by_the_sample(tmp_path, reads):
+    finder = DuplicateFinder()
+    first = write(tmp_path, 'first', b'x' * 100)
+    assert finder.original_of(first) is None
+    assert finder.original_of(write(tmp_path, 'other', b'y' * 100)) is None
+    assert finder.original_of(write(tmp_path, 'copy', b'x' * 100)) == first
+    assert reads['full'] == []
+
+
+def test_hard_links_and_repeated_paths_are_not_read(tmp_path, reads):
+    finder = DuplicateFinder()
+    first = write(tmp_path, 'first', b'data')
+    os.link(first, tmp_path / 'link')
+    assert finder.original_of(first) is None
+    assert finder.original_of(str(tmp_path / 'link')) == first
+    assert finder.original_of(first) == first
+    assert reads == {'sample': [], 'full': []}
+
+
+def test_unreadable_paths_are_never_copies(tmp_path):
+    finder = DuplicateFinder()
+    missing = str(tmp_path / 'missing')
+    assert finder.original_of(missing) is None
+    assert finder.original_of(missing) is None
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    submitted = []
+    submit = MetadataExtractor.submit
+
+    def recorded(self, file_path):
+        submitted.append(os.path.basename(file_path))
+        return submit(self, file_path)
+
+    monkeypatch.setattr(MetadataExtractor, 'submit', recorded)
+    return submitted
+
+
+def test_iter_metadata_extracts_each_content_once(tmp_path, submitted):
+    paths = [write(tmp_path, name, data) for name, data in
+             [('a.png', b'A' * 50), ('b.png', b'B' * 50), ('a2.png', b'A' * 50), ('a3.png', b'A' * 50)]]
+    extractor = MetadataExtractor(paths, cache=False)
+    results = dict(extractor.iter_metadata(deduplicate=True))
+    assert sorted(results) == sorted(paths)
+    assert sorted(submitted) == ['a.png', 'b.png']
+    assert results[paths[2]] is results[paths[0]]
+
+
+def test_copy_of_a_file_whose_metadata_was_dropped_is_extracted(tmp_path, submitted):
+    # With one file in flight the original finishes before its copy is seen, while its size is still unique
+    paths = [write(tmp_path, name, b'A' * 50) for name in ('a.png', 'a2.png', 'a3.png')]
+    extractor = MetadataExtractor(paths, cache=False)
+    results = dict(extractor.iter_metadata(max_pending=1, deduplicate=True))
+    assert sorted(results) == sorted(paths)
+    assert submitted == ['a.png', 'a2.png']
+    assert results[paths[2]] is results[paths[1]]
+
+
+def test_should_continue_stops_taking_paths(tmp_path, submitted):
+    paths = [write(tmp_path, f"{index}.png", bytes([index]) * (index + 1)) for index in range(5)]
+    checks = iter([True, True, False])
+    extractor = MetadataExtractor(paths, cache=False)
+    list(extractor.iter_metadata(deduplicate=True, should_continue=lambda: next(checks)))
+    assert submitted == ['0.png', '1.png']
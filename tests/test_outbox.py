@@ -0,0 +1,98 @@
+import pytest
+
+from outbox import ExportOutbox, OutboxFlusher
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = ExportOutbox(str(tmp_path / 'outbox.sqlite3'), max_attempts=2)
+    yield outbox
+    outbox.close()
+
+
+class StubRef:
+    """Stands in for the Realtime Database reference, recording updates and optionally failing them"""
+
+    def __init__(self, fail=False):
+        self.updates = []
+        self.fail = fail
+
+    def update(self, update):
+        if self.fail:
+            raise RuntimeError('offline')
+        self.updates.append(update)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    # The emulator host lets Database start without credentials; requests go to the stub
+    monkeypatch.setenv('FIREBASE_DATABASE_EMULATOR_HOST', '127.0.0.1:9')
+    from database import Database
+    database = Database(retries=0)
+    database.ref = StubRef()
+    return database
+
+
+def flusher_for(outbox, database):
+    flusher = OutboxFlusher(outbox)
+    flusher._database = database
+    return flusher
+
+
+def test_same_metadata_is_queued_once(outbox):
+    assert outbox.enqueue({'/a.jpg': {'ISO': 100}, '/b.jpg': {'ISO': 200}}) == 2
+    assert outbox.enqueue({'/a.jpg': {'ISO': 100}}) == 0
+    assert outbox.pending_count() == 2
+
+
+def test_changed_metadata_supersedes_sent_and_pending_entries(outbox):
+    outbox.enqueue({'/a.jpg': {'ISO': 100}})
+    outbox.mark_sent([entry_id for entry_id, _, _ in outbox.pending()])
+    assert outbox.pending_count() == 0
+    assert outbox.enqueue({'/a.jpg': {'ISO': 100}}) == 0
+    assert outbox.enqueue({'/a.jpg': {'ISO': 400}}) == 1
+    assert outbox.enqueue({'/a.jpg': {'ISO': 800}}) == 1
+    assert [(path, metadata) for _, path, metadata in outbox.pending()] == [('/a.jpg', {'ISO': 800})]
+
+
+def test_marking_a_superseded_entry_leaves_its_replacement_pending(outbox):
+    outbox.enqueue({'/a.jpg': {'ISO': 100}})
+    [(stale_id, _, _)] = outbox.pending()
+    outbox.enqueue({'/a.jpg': {'ISO': 400}})
+    outbox.mark_sent([stale_id])
+    assert [metadata for _, _, metadata in outbox.pending()] == [{'ISO': 400}]
+
+
+def test_entries_stop_being_handed_out_after_max_attempts(outbox):
+    outbox.enqueue({'/a.jpg': {'ISO': 100}})
+    for _ in range(2):
+        [(entry_id, _, _)] = outbox.pending()
+        outbox.mark_failed({entry_id: 'offline'})
+    assert outbox.pending() == []
+    assert outbox.pending_count() == 0
+
+
+def test_flush_sends_and_marks_entries(outbox, database):
+    outbox.enqueue({'/data/a.jpg': {'ISO': 100}, '/data/b.jpg': {'ISO': 200}})
+    assert flusher_for(outbox, database).flush_once()
+    assert outbox.pending_count() == 0
+    sent = {path: value for update in database.ref.updates for path, value in update.items()}
+    assert sent == {'a-jpg/ISO': 100, 'b-jpg/ISO': 200}
+
+
+def test_flush_counts_failed_attempts(outbox, database):
+    database.ref.fail = True
+    outbox.enqueue({'/data/a.jpg': {'ISO': 100}})
+    flusher = flusher_for(outbox, database)
+    assert not flusher.flush_once()
+    assert outbox.pending_count() == 1
+    assert not flusher.flush_once()
+    assert outbox.pending_count() == 0
+
+
+def test_entries_with_nothing_to_send_do_not_block_the_queue(outbox, database):
+    outbox.enqueue({'/data/empty.jpg': {}, '/data/blank.jpg': {'Title': ''}, '/data/a.jpg': {'ISO': 100}})
+    flusher = flusher_for(outbox, database)
+    assert flusher.flush_once()
+    assert outbox.pending_count() == 0
+    assert flusher.drain(1) == 0
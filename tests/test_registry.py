@@ -0,0 +1,77 @@
+import pytest
+
+import metadata
+from metadata import parse_file
+from registry import ExtractorRegistry
+
+PNG_HEAD = b'\x89PNG\r\n\x1a\n' + bytes(8)
+HEIC_HEAD = b'\x00\x00\x00\x18ftypheic' + bytes(4)
+MP4_HEAD = b'\x00\x00\x00\x18ftypisom' + bytes(4)
+
+
+class HeifStub:
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def extract_metadata(self):
+        return {'Format': 'HEIF'}
+
+
+@pytest.fixture
+def registry():
+    # The built-in registrations plus an extractor registered as in the registry docstring
+    registry = ExtractorRegistry()
+    registry.register('video:VideoMetadata', extensions=['.mp4', '.mov'], magic=[(4, b'ftyp')])
+    registry.register('photo:PhotoMetadata', extensions=['.jpg'], magic=[(0, b'\xff\xd8\xff')])
+    registry.register('pngfile:PngMetadata', extensions=['.png'], magic=[(0, b'\x89PNG\r\n\x1a\n')])
+    registry.register(f"{__name__}:HeifStub", extensions=['.heic'], magic=[(4, b'ftypheic')])
+    return registry
+
+
+def test_extension_wins_when_its_own_signature_matches(registry):
+    # ftypheic also matches the video extractor's shorter ftyp signature
+    heif = registry.for_extension('.HEIC')
+    assert heif is HeifStub
+    assert registry.for_content(heif, HEIC_HEAD) is HeifStub
+
+
+def test_magic_overrides_a_mislabeled_extension(registry):
+    photo = registry.for_extension('.jpg')
+    assert registry.for_content(photo, PNG_HEAD) is registry.for_extension('.png')
+
+
+def test_extension_kept_when_nothing_else_matches(registry):
+    # A truncated or damaged file still goes to its extension's extractor, which reports the problem
+    photo = registry.for_extension('.jpg')
+    assert registry.for_content(photo, b'garbage') is photo
+
+
+def test_extractor_without_signatures_is_trusted():
+    registry = ExtractorRegistry()
+    registry.register('video:VideoMetadata', extensions=['.mp4'], magic=[(4, b'ftyp')])
+    registry.register(f"{__name__}:HeifStub", extensions=['.heic'])
+    assert registry.for_content(HeifStub, HEIC_HEAD) is HeifStub
+
+
+def test_unregistered_extension_uses_longest_signature(registry):
+    assert registry.for_extension('.bin') is None
+    assert registry.for_content(None, HEIC_HEAD) is HeifStub
+    assert registry.for_content(None, MP4_HEAD) is registry.for_extension('.mp4')
+    assert registry.for_content(None, b'nothing known') is None
+
+
+def test_parse_file_dispatches_heic_to_its_extractor(registry, monkeypatch, tmp_path):
+    monkeypatch.setattr(metadata, 'registry', registry)
+    path = tmp_path / 'image.heic'
+    path.write_bytes(HEIC_HEAD + bytes(64))
+    used, result = parse_file(registry.for_extension('.heic'), str(path))
+    assert used is HeifStub
+    assert result == {'Format': 'HEIF'}
+
+
+def test_parse_file_reports_unsupported_content(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(b'not a known format')
+    used, result = parse_file(None, str(path))
+    assert used is None
+    assert result == {'error': 'Unsupported file type: .bin'}
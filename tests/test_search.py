@@ -0,0 +1,60 @@
+import pytest
+
+from search import MetadataIndex, Query
+
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    index.add('/data/report.pdf', {'Page Count': 10, 'Author': 'Jane Doe'})
+    index.add('/data/letter.docx', {'Page Count': 1, 'Author': 'John Roe'})
+    index.add('/data/notes.docx', {'Page Count': '1', 'Author': 'Jane Roe'})
+    index.add('/data/photo.jpg', {'ISO': 100.0, 'Camera Make': 'Canon'})
+    index.add('/data/other.jpg', {'ISO': 2, 'Camera Make': 'Nikon'})
+    return index
+
+
+def test_numeric_equality_after_adding_files(index):
+    # The first numeric '=' query after an add sorts the postings; it must read the sorted ones
+    assert index.search('Page Count = 1') == ['/data/letter.docx', '/data/notes.docx']
+    assert index.search('Page Count = 10') == ['/data/report.pdf']
+    index.add('/data/more.jpg', {'ISO': 100})
+    assert index.search('ISO = 100.0') == ['/data/photo.jpg', '/data/more.jpg']
+
+
+def test_numeric_ranges(index):
+    assert index.search('Page Count > 1') == ['/data/report.pdf']
+    assert index.search('Page Count >= 1') == ['/data/report.pdf', '/data/letter.docx', '/data/notes.docx']
+    assert index.search('ISO < 100') == ['/data/other.jpg']
+    assert index.search('ISO <= 100') == ['/data/photo.jpg', '/data/other.jpg']
+
+
+def test_prefix_and_case_insensitive_match(index):
+    assert index.search('author = jane*') == ['/data/report.pdf', '/data/notes.docx']
+    assert index.search('CAMERA MAKE = canon') == ['/data/photo.jpg']
+
+
+def test_pseudo_tags_and_conjunction(index):
+    assert index.search('Extension = docx AND Author = Jane*') == ['/data/notes.docx']
+    assert index.search('File Name = photo.jpg') == ['/data/photo.jpg']
+
+
+def test_not_equal_includes_files_without_the_tag(index):
+    assert index.search('Extension != jpg AND Author != John Roe') == ['/data/report.pdf', '/data/notes.docx']
+    assert '/data/photo.jpg' in index.search('Author != Jane Doe')
+
+
+def test_adding_a_path_again_replaces_it(index):
+    index.add('/data/report.pdf', {'Page Count': 3})
+    assert index.search('Page Count = 10') == []
+    assert index.search('Page Count = 3') == ['/data/report.pdf']
+    assert index.search('Author = Jane Doe') == []
+    assert len(index) == 5
+
+
+def test_query_without_index(index):
+    query = Query('ISO >= 100 AND Extension = jpg')
+    assert query.matches('/x/a.jpg', {'ISO': '400'})
+    assert not query.matches('/x/a.jpg', {'ISO': 'high'})
+    with pytest.raises(ValueError):
+        Query('ISO > high')
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from sinks import SqliteSink, open_sink
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteSink(str(tmp_path / 'store.sqlite3'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'jpeg')
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    return str(path)
+
+
+def test_writing_the_same_version_again_replaces_its_tags(store, photo):
+    store.write({photo: {'ISO': 100, 'Camera Make': 'Canon'}})
+    store.write({photo: {'ISO': 200}})
+    assert store.tags(photo) == {'ISO': '200'}
+    assert store.files_where('Camera Make', 'Canon') == []
+    assert len(store) == 1
+
+
+def test_newer_mtime_supersedes_the_earlier_version(store, photo):
+    store.write({photo: {'ISO': 100}})
+    store.flush()
+    os.utime(photo, ns=(2_000_000_000, 2_000_000_000))
+    store.write({photo: {'ISO': 400}})
+    assert store.files_where('ISO', 100) == []
+    assert store.files_where('ISO', 400) == [photo]
+    assert len(store) == 1
+    rows = store.connection.execute('SELECT mtime_ns, current FROM files ORDER BY mtime_ns').fetchall()
+    assert rows == [(1_000_000_000, 0), (2_000_000_000, 1)]
+
+
+def test_numbers_and_numeric_strings_are_range_searchable(store, tmp_path):
+    paths = []
+    for name, iso in [('a.jpg', 100), ('b.jpg', '1600'), ('c.jpg', 'Auto')]:
+        path = tmp_path / name
+        path.write_bytes(b'')
+        paths.append(str(path))
+        store.write({str(path): {'ISO': iso}})
+    assert store.files_between('ISO', minimum=1600) == [paths[1]]
+    assert store.files_between('ISO', maximum=1600) == paths[:2]
+
+
+def test_results_are_kept_across_reopening(tmp_path, photo):
+    path = str(tmp_path / 'store.sqlite3')
+    with SqliteSink(path, batch_size=10) as store:
+        store.write({photo: {'Title': 'Harbour'}})
+    with SqliteSink(path) as store:
+        assert store.tags(photo) == {'Title': 'Harbour'}
+
+
+def test_open_sink_specs(tmp_path):
+    with open_sink(f"sqlite:{tmp_path / 'store.sqlite3'}") as store:
+        assert isinstance(store, SqliteSink)
+    with pytest.raises(ValueError):
+        open_sink('postgres:localhost')
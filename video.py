@@ -1,23 +1,208 @@
-from pymediainfo import MediaInfo
+import os
+from datetime import datetime, timezone
 from formatter import Formatter
+from source import open_source
+from ebml import EbmlError, read_matroska
+from isobmff import AUDIO_FORMATS, VIDEO_FORMATS, IsoBmffError, parse_audio_specific_config, parse_avcc, parse_hvcc, read_movie
+
+# Extensions with a native reader that can skip MediaInfo
+ISOBMFF_EXTENSIONS = {'.mp4', '.mov', '.m4v', '.3gp'}
+MATROSKA_EXTENSIONS = {'.mkv', '.webm', '.mka'}
+
+# Matroska codec IDs -> (format, format info, internet media type)
+MATROSKA_VIDEO_FORMATS = {
+    'V_MPEG4/ISO/AVC': ('AVC', 'Advanced Video Codec', 'video/H264'),
+    'V_MPEGH/ISO/HEVC': ('HEVC', 'High Efficiency Video Coding', 'video/H265'),
+    'V_AV1': ('AV1', 'AOMedia Video 1', 'video/AV1'),
+    'V_VP8': ('VP8', None, None),
+    'V_VP9': ('VP9', None, None),
+    'V_MPEG2': ('MPEG Video', None, None),
+    'V_MPEG4/ISO/ASP': ('MPEG-4 Visual', None, 'video/MP4V-ES'),
+    'V_PRORES': ('ProRes', None, None),
+}
+# Matroska codec IDs -> (format, compression mode)
+MATROSKA_AUDIO_FORMATS = {
+    'A_AAC': ('AAC', 'Lossy'),
+    'A_AC3': ('AC-3', 'Lossy'),
+    'A_EAC3': ('E-AC-3', 'Lossy'),
+    'A_DTS': ('DTS', 'Lossy'),
+    'A_OPUS': ('Opus', 'Lossy'),
+    'A_VORBIS': ('Vorbis', 'Lossy'),
+    'A_MPEG/L3': ('MPEG Audio', 'Lossy'),
+    'A_FLAC': ('FLAC', 'Lossless'),
+    'A_ALAC': ('ALAC', 'Lossless'),
+    'A_TRUEHD': ('MLP FBA', 'Lossless'),
+    'A_PCM/INT/LIT': ('PCM', 'Lossless'),
+    'A_PCM/INT/BIG': ('PCM', 'Lossless'),
+    'A_PCM/FLOAT/IEEE': ('PCM', 'Lossless'),
+}
+
+# QuickTime metadata keys, with the classic udta atom as a fallback
+LOCATION_TAGS = ('com.apple.quicktime.location.ISO6709', '\xa9xyz')
+MAKE_TAGS = ('com.apple.quicktime.make', '\xa9mak')
+MODEL_TAGS = ('com.apple.quicktime.model', '\xa9mod')
+SOFTWARE_TAGS = ('com.apple.quicktime.software', '\xa9swr')
+ENCODER_TAGS = ('\xa9too', '\xa9enc', 'com.apple.quicktime.encoder')
 
 class VideoMetadata:
-    def __init__(self, video_file):
+    VERSION = 3
+    # Parsing is I/O-bound (box/element headers, or libmediainfo), so the hybrid backend keeps it on threads
+    CPU_BOUND = False
+    READS_SOURCE = True
+
+    def __init__(self, video_file, source=None):
         # Initialize the video file path and formatter object
         self.video_file = video_file
+        # Already open FileSource for video_file, if the caller has one
+        self.source = source
         self.formatter = Formatter()
         
     # Parse the video file using MediaInfo
     def parse_video_file(self):
         try:
+            # libmediainfo is only loaded for files the native readers can't describe
+            from pymediainfo import MediaInfo
             # Return the parsed media info object
             return MediaInfo.parse(self.video_file)
         except Exception as e:
             # Raise an error if parsing fails
             raise ValueError(f"Error parsing video file: {e}")
         
+    # Extract metadata, reading MP4/MOV boxes or Matroska headers directly and only falling back to MediaInfo when that can't answer
+    def extract_metadata(self, media_info=None):
+        if media_info is None:
+            metadata = None
+            extension = os.path.splitext(self.video_file)[1].lower()
+            try:
+                with open_source(self.video_file, self.source) as source:
+                    # The container is recognised from its first bytes; old QuickTime files without ftyp go by extension
+                    if source.kind == 'isobmff' or (source.kind is None and extension in ISOBMFF_EXTENSIONS):
+                        metadata = self.isobmff_metadata(source)
+                    elif source.kind == 'ebml' or (source.kind is None and extension in MATROSKA_EXTENSIONS):
+                        metadata = self.matroska_metadata(source)
+            except OSError:
+                metadata = None
+            if metadata is not None:
+                return metadata
+            media_info = self.parse_video_file()
+        return self.mediainfo_metadata(media_info)
+
+    # Read the moov box of an MP4/QuickTime file; returns None if the file isn't one we can describe
+    def isobmff_metadata(self, source):
+        try:
+            movie = read_movie(source.rewind())
+        except (OSError, IsoBmffError, IndexError, ValueError):
+            return None
+        stat_result = source.stat
+        video_tracks = [track for track in movie['tracks'] if track.get('handler') == b'vide']
+        audio_tracks = [track for track in movie['tracks'] if track.get('handler') == b'soun']
+        if not video_tracks and not audio_tracks:
+            return None
+        tags = movie['tags']
+
+        metadata = {}
+        metadata['File Size'] = self.formatter.format_size(stat_result.st_size)
+        metadata['Format'] = 'MPEG-4'
+        metadata['Duration'] = self.formatter.format_duration(movie['duration'])
+        location = _first_tag(tags, LOCATION_TAGS)
+        if location is not None:
+            metadata['Location'] = self.formatter.format_gps(location)
+            birth_time = getattr(stat_result, 'st_birthtime', None)
+            metadata['Creation Date'] = _format_date(birth_time and datetime.fromtimestamp(birth_time, timezone.utc))
+            metadata['Modification Date'] = _format_date(datetime.fromtimestamp(stat_result.st_mtime, timezone.utc))
+            metadata['Writing Library'] = _first_tag(tags, ENCODER_TAGS)
+            metadata['Encoded Date'] = _format_date(movie['created'])
+            metadata['Tagged Date'] = _format_date(movie['modified'])
+            metadata['Device Make'] = _first_tag(tags, MAKE_TAGS)
+            metadata['Device Model'] = _first_tag(tags, MODEL_TAGS)
+            metadata['Device Version'] = _first_tag(tags, SOFTWARE_TAGS)
+
+        if video_tracks:
+            track = video_tracks[0]
+            video_format, format_info, media_type = VIDEO_FORMATS.get(track.get('codec'), (track.get('codec_id'), None, None))
+            metadata['Video Format'] = video_format
+            metadata['Video Format Info'] = format_info
+            metadata['Format Profile'] = track.get('format_profile')
+            metadata['Internet Media Type'] = media_type
+            metadata['Video Codec'] = track.get('codec_id')
+            metadata['Resolution'] = f"{track.get('width')}x{track.get('height')}"
+            frame_count = track.get('frame_count')
+            duration = track.get('duration')
+            metadata['Framerate'] = self.formatter.format_framerate(frame_count / duration if frame_count and duration else None)
+            metadata['Bit Depth'] = track.get('bit_depth')
+            metadata['Frame Count'] = frame_count
+            metadata['Stream Count'] = len(video_tracks)
+
+        if audio_tracks:
+            track = audio_tracks[0]
+            audio_format, compression_mode = AUDIO_FORMATS.get(track.get('codec'), (track.get('codec_id'), None))
+            metadata['Audio Format'] = audio_format
+            metadata['Audio Format Info'] = track.get('format_info')
+            metadata['Audio Codec'] = track.get('codec_id')
+            metadata['Audio Bitrate'] = self.formatter.format_bitrate(track.get('bit_rate'))
+            metadata['Audio Channels'] = track.get('channels')
+            metadata['Audio Sample Rate'] = self.formatter.format_samplerate(track.get('sample_rate'))
+            metadata['Compression Mode'] = compression_mode
+        return metadata
+
+    # Read the EBML header, Segment Info and Tracks of a Matroska/WebM file; returns None if it can't be described
+    def matroska_metadata(self, source):
+        try:
+            segment = read_matroska(source.rewind())
+        except (OSError, EbmlError, IndexError, ValueError):
+            return None
+        stat_result = source.stat
+        video_tracks = [track for track in segment['tracks'] if track['type'] == 'video']
+        audio_tracks = [track for track in segment['tracks'] if track['type'] == 'audio']
+        if segment['info'] is None or (not video_tracks and not audio_tracks):
+            return None
+        info = segment['info']
+
+        metadata = {}
+        metadata['File Size'] = self.formatter.format_size(stat_result.st_size)
+        metadata['Format'] = 'WebM' if segment['doc_type'] == 'webm' else 'Matroska'
+        metadata['Duration'] = self.formatter.format_duration(info.get('duration'))
+        metadata['Writing Application'] = info.get('writing_app')
+        metadata['Writing Library'] = info.get('muxing_app')
+        metadata['Encoded Date'] = _format_date(info.get('date'))
+
+        if video_tracks:
+            track = dict(video_tracks[0])
+            video_format, format_info, media_type = MATROSKA_VIDEO_FORMATS.get(track['codec_id'], (track['codec_id'], None, None))
+            # CodecPrivate holds the same avcC / hvcC records as an MP4 sample entry
+            if track['codec_private'] and video_format == 'AVC':
+                parse_avcc(track['codec_private'], track)
+            elif track['codec_private'] and video_format == 'HEVC':
+                parse_hvcc(track['codec_private'], track)
+            frame_rate = 1e9 / track['default_duration'] if track['default_duration'] else None
+            metadata['Video Format'] = video_format
+            metadata['Video Format Info'] = format_info
+            metadata['Format Profile'] = track.get('format_profile')
+            metadata['Internet Media Type'] = media_type
+            metadata['Video Codec'] = track['codec_id']
+            metadata['Resolution'] = f"{track['width']}x{track['height']}"
+            metadata['Framerate'] = self.formatter.format_framerate(frame_rate)
+            metadata['Bit Depth'] = track.get('bit_depth')
+            # Frames are only counted in the Clusters, so estimate from duration and frame rate
+            metadata['Frame Count'] = round(info['duration'] * frame_rate) if frame_rate and info.get('duration') else None
+            metadata['Stream Count'] = len(video_tracks)
+
+        if audio_tracks:
+            track = dict(audio_tracks[0])
+            audio_format, compression_mode = MATROSKA_AUDIO_FORMATS.get(track['codec_id'], (track['codec_id'], None))
+            if track['codec_private'] and audio_format == 'AAC':
+                parse_audio_specific_config(track['codec_private'], track)
+            metadata['Audio Format'] = audio_format
+            metadata['Audio Format Info'] = track.get('format_info')
+            metadata['Audio Codec'] = track['codec_id']
+            metadata['Audio Bitrate'] = self.formatter.format_bitrate(None)
+            metadata['Audio Channels'] = track['channels']
+            metadata['Audio Sample Rate'] = self.formatter.format_samplerate(track['sample_rate'] and int(track['sample_rate']))
+            metadata['Compression Mode'] = compression_mode
+        return metadata
+
     # Extract metadata from the parsed media info object
-    def extract_metadata(self, media_info):
+    def mediainfo_metadata(self, media_info):
         try:
             # Initialize an empty metadata dictionary
             metadata = {}
@@ -67,4 +252,18 @@ class VideoMetadata:
         
         except AttributeError as e:
             # Raise an error if attribute extraction fails
-            raise ValueError(f"Error extracting metadata: {e}")
\ No newline at end of file
+            raise ValueError(f"Error extracting metadata: {e}")
+
+
+def _first_tag(tags: dict, names: tuple):
+    for name in names:
+        if tags.get(name) is not None:
+            return tags[name]
+    return None
+
+
+def _format_date(value):
+    # Same "YYYY-MM-DD HH:MM:SS UTC" form MediaInfo reports
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
@@ -0,0 +1,293 @@
+"""
+Watch directories for new or changed files.
+
+FolderWatcher yields batches of files that are ready to extract: a file is
+ready once no change has been seen for `settle` seconds and its size and
+mtime are the same as at the last change, so files still being copied in are
+left alone. A file is only handed out again when its size or mtime changes.
+
+On Linux the directories are watched with inotify, so the work done is
+proportional to the number of changes, not the number of files. Elsewhere,
+or when inotify can't be used (e.g. the watch limit is reached), the trees
+are polled with os.scandir every `poll_interval` seconds.
+
+    watcher = FolderWatcher(['/ingest'], registry.extensions())
+    for file_paths in watcher.batches():
+        ...
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+from scanner import scan_directory, scan_paths
+
+# inotify event flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR | IN_EXCL_UNLINK)
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+class InotifyBackend:
+    """Report changed files under directory trees using inotify (Linux only)"""
+
+    def __init__(self, roots: list, recursive: bool = True):
+        library = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.roots = roots
+        self.directories = {}  # watch descriptor -> directory path
+        try:
+            for root in roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, directory: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # Directories that vanish or can't be read are skipped; running out of watches is not
+            if error in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):
+                return
+            raise OSError(error, f"Cannot watch {directory}: {os.strerror(error)}")
+        self.directories[wd] = directory
+
+    def _watch_tree(self, root: str):
+        # Watch root and, if recursive, every directory below it
+        self._watch(root)
+        if not self.recursive:
+            return
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._watch(entry.path)
+                            stack.append(entry.path)
+            except OSError:
+                pass
+
+    def wait(self, timeout: float) -> tuple:
+        """
+        Wait up to `timeout` seconds and return (changed paths, rescan) where
+        rescan is True if events were lost and the trees should be rescanned
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], False
+        changed = []
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.directories.pop(wd, None)
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    # A directory created or moved in: watch it and report what is already inside
+                    if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(path)
+                        changed.extend(scan_directory(path, on_error=_ignore_error))
+                else:
+                    changed.append(path)
+        return changed, rescan
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingBackend:
+    """Report changed files by rescanning directory trees; each poll costs a stat per file"""
+
+    def __init__(self, roots: list, recursive: bool = True, extensions=None):
+        self.roots = roots
+        self.recursive = recursive
+        self.extensions = extensions
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for file_path in scan_paths(self.roots, self.extensions, self.recursive, on_error=_ignore_error):
+            signature = file_signature(file_path)
+            if signature is not None:
+                snapshot[file_path] = signature
+        return snapshot
+
+    def wait(self, timeout: float) -> tuple:
+        time.sleep(timeout)
+        snapshot = self._scan()
+        changed = [file_path for file_path, signature in snapshot.items()
+                   if self.snapshot.get(file_path) != signature]
+        self.snapshot = snapshot
+        return changed, False
+
+    def close(self):
+        pass
+
+
+def file_signature(file_path: str):
+    """(size, mtime_ns) of a regular file, or None if it is gone or not a file"""
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    return stat_result.st_size, stat_result.st_mtime_ns
+
+
+class FolderWatcher:
+    """
+    Yield batches of new or changed files under `roots` once they have settled.
+
+    `extensions` limits the files reported (all files if None). With
+    `include_existing` the files already present are reported in the first
+    batch. `use_inotify` forces a backend; by default inotify is tried first.
+    """
+
+    def __init__(self, roots: list, extensions=None, recursive: bool = True, settle: float = 2.0,
+                 poll_interval: float = 2.0, include_existing: bool = False, use_inotify: bool = None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.extensions = extensions
+        self.recursive = recursive
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.include_existing = include_existing
+        self._stopped = threading.Event()
+        self.backend = self._open_backend(use_inotify)
+        self.known = {}  # path -> signature of the version last handed out
+        self.pending = {}  # path -> (signature, time of its last change)
+
+    def _open_backend(self, use_inotify):
+        if use_inotify is not False and sys.platform.startswith('linux'):
+            try:
+                return InotifyBackend(self.roots, self.recursive)
+            except OSError as e:
+                if use_inotify:
+                    raise
+                print(f"inotify unavailable ({e}), polling every {self.poll_interval}s instead", file=sys.stderr)
+        return PollingBackend(self.roots, self.recursive, self.extensions)
+
+    @property
+    def polling(self) -> bool:
+        return isinstance(self.backend, PollingBackend)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _existing_files(self):
+        return scan_paths(self.roots, self.extensions, self.recursive, on_error=_ignore_error)
+
+    def _note_change(self, file_path: str, now: float):
+        if self.extensions is not None and os.path.splitext(file_path)[1].lower() not in self.extensions:
+            return
+        signature = file_signature(file_path)
+        if signature is None:
+            self.pending.pop(file_path, None)
+        elif signature != self.known.get(file_path):
+            self.pending[file_path] = (signature, now)
+
+    def _settled(self, now: float) -> list:
+        # Pending files untouched for `settle` seconds whose size and mtime still match
+        ready = []
+        for file_path, (signature, changed_at) in list(self.pending.items()):
+            if now - changed_at < self.settle:
+                continue
+            current = file_signature(file_path)
+            if current is None:
+                del self.pending[file_path]
+            elif current != signature:
+                self.pending[file_path] = (current, now)
+            else:
+                del self.pending[file_path]
+                self.known[file_path] = current
+                ready.append(file_path)
+        return ready
+
+    def batches(self):
+        """Yield lists of files ready to extract until `stop` is called"""
+        try:
+            if self.include_existing:
+                existing = []
+                for file_path in self._existing_files():
+                    signature = file_signature(file_path)
+                    if signature is not None:
+                        self.known[file_path] = signature
+                        existing.append(file_path)
+                if existing:
+                    yield existing
+            elif not self.polling:
+                # Only later changes count; remember what is there now
+                for file_path in self._existing_files():
+                    signature = file_signature(file_path)
+                    if signature is not None:
+                        self.known[file_path] = signature
+            while not self._stopped.is_set():
+                if self.pending:
+                    oldest = min(changed_at for _, changed_at in self.pending.values())
+                    timeout = max(0.05, min(self.poll_interval, oldest + self.settle - time.monotonic()))
+                else:
+                    timeout = self.poll_interval
+                changed, rescan = self.backend.wait(timeout)
+                now = time.monotonic()
+                if rescan:
+                    changed = list(self._existing_files())
+                for file_path in changed:
+                    self._note_change(file_path, now)
+                ready = self._settled(now)
+                if ready:
+                    yield ready
+        finally:
+            self.backend.close()
+
+
+def _ignore_error(path, error):
+    pass
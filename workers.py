@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from PyQt5.QtCore import QThread, pyqtSignal
+from exporters import open_writer
+from metadata import MetadataExtractor
+from registry import registry
+from scanner import scan_paths
+from sinks import open_sink
+
+
+class ThroughputMeter:
+    """Track processed files and bytes to report files/s, MB/s and ETA"""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+        self.paused_time = 0.0
+        self._pause_started = None
+
+    def update(self, size: int = 0):
+        self.files += 1
+        self.bytes += size
+
+    def pause(self):
+        if self._pause_started is None:
+            self._pause_started = time.monotonic()
+
+    def resume(self):
+        if self._pause_started is not None:
+            self.paused_time += time.monotonic() - self._pause_started
+            self._pause_started = None
+
+    def elapsed(self) -> float:
+        # Active time only, so a long pause doesn't drag the rates down
+        now = self._pause_started or time.monotonic()
+        return max(now - self.start_time - self.paused_time, 1e-9)
+
+    def percent(self) -> int:
+        if not self.total_files:
+            return 100
+        return int(self.files / self.total_files * 100)
+
+    def describe(self, action: str) -> str:
+        elapsed = self.elapsed()
+        files_per_sec = self.files / elapsed
+        text = f"{action}... {self.files}/{self.total_files} | {files_per_sec:.1f} files/s"
+        if self.bytes:
+            text += f" | {self.bytes / elapsed / (1024 ** 2):.1f} MB/s"
+        if files_per_sec > 0 and self.files < self.total_files:
+            text += f" | ETA {self.format_eta((self.total_files - self.files) / files_per_sec)}"
+        return text
+
+    @staticmethod
+    def format_eta(seconds: float) -> str:
+        seconds = int(seconds)
+        if seconds < 60:
+            return f"{seconds}s"
+        if seconds < 3600:
+            return f"{seconds // 60}m {seconds % 60}s"
+        return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+
+
+class BackgroundWorker(QThread):
+    """
+    Base class for jobs that run off the Qt event loop.
+
+    Subclasses implement `work()` and call `checkpoint()` between units of work;
+    it blocks while the job is paused and returns False once it is cancelled.
+    Signals are delivered to the GUI thread through queued connections.
+    """
+
+    progress = pyqtSignal(int, str)  # percent, progress bar text
+    failed = pyqtSignal(str)
+    completed = pyqtSignal(bool)  # True if the job was cancelled
+
+    def __init__(self, total_files: int, action: str):
+        super().__init__()
+        self.action = action
+        self.meter = ThroughputMeter(total_files)
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self):
+        try:
+            self.work()
+        except Exception as e:
+            self.failed.emit(f"{self.action} failed: {e}")
+        self.completed.emit(self.is_cancelled())
+
+    def work(self):
+        raise NotImplementedError
+
+    def pause(self):
+        self.meter.pause()
+        self._running.clear()
+
+    def resume(self):
+        self.meter.resume()
+        self._running.set()
+
+    def is_paused(self) -> bool:
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # Wake a paused worker so it can exit
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def checkpoint(self) -> bool:
+        self._running.wait()
+        return not self.is_cancelled()
+
+    def report_progress(self, size: int = 0):
+        self.meter.update(size)
+        self.progress.emit(self.meter.percent(), self.meter.describe(self.action))
+
+
+class InspectWorker(BackgroundWorker):
+    """Extract metadata in the background, emitting each file's result as it completes"""
+
+    result_ready = pyqtSignal(str, object)  # file path, metadata dict
+
+    def __init__(self, file_paths: list, backend: str = 'thread'):
+        super().__init__(len(file_paths), "Inspecting files")
+        self.file_paths = file_paths
+        self.backend = backend
+
+    def work(self):
+        extractor = MetadataExtractor(self.file_paths, backend=self.backend)
+        # Copies of the same file are extracted once and share its result; pausing and
+        # cancelling also reach the duplicate check, which may hash files between results
+        results = extractor.iter_metadata(deduplicate=True, should_continue=self.checkpoint)
+        try:
+            for file_path, metadata in results:
+                self.result_ready.emit(file_path, metadata)
+                self.report_progress(_file_size(file_path))
+                if not self.checkpoint():
+                    break
+        finally:
+            results.close()
+
+
+class ExportWorker(BackgroundWorker):
+    """Write extracted metadata to a sink; the default Firebase sink queues it in the export outbox"""
+
+    file_exported = pyqtSignal(str)
+
+    def __init__(self, results: dict, sink: str = None, batch_size: int = 200):
+        super().__init__(len(results), "Exporting to database")
+        # {file path: metadata dict}, as produced by the inspect worker
+        self.results = results
+        # Sink spec for open_sink, e.g. 'firebase' or 'sqlite:/path/to/store.sqlite3'
+        self.sink = sink
+        self.batch_size = batch_size
+
+    def work(self):
+        items = list(self.results.items())
+        with open_sink(self.sink) as sink:
+            for start in range(0, len(items), self.batch_size):
+                if not self.checkpoint():
+                    break
+                batch = dict(items[start:start + self.batch_size])
+                sink.write(batch)
+                for file_path in batch:
+                    self.file_exported.emit(file_path)
+                    self.report_progress()
+
+
+class FileExportWorker(BackgroundWorker):
+    """Stream extracted metadata to a file with one of the export writers"""
+
+    def __init__(self, results: dict, file_path: str, export_format: str):
+        super().__init__(len(results), "Exporting to file")
+        self.results = results
+        self.file_path = file_path
+        self.export_format = export_format
+
+    def work(self):
+        with open_writer(self.file_path, self.export_format) as writer:
+            for file_path, metadata in self.results.items():
+                if not self.checkpoint():
+                    break
+                writer.write(file_path, metadata)
+                self.report_progress()
+
+
+class FolderScanWorker(QThread):
+    """
+    Enumerate dropped files and folders off the event loop. Supported files are
+    emitted in batches, at least every `batch_interval` seconds so the first
+    ones show up straight away, as absolute paths.
+    """
+
+    files_found = pyqtSignal(list)
+
+    def __init__(self, paths: list, batch_size: int = 5000, batch_interval: float = 0.2):
+        super().__init__()
+        self.paths = paths
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._cancelled = threading.Event()
+
+    def run(self):
+        batch = []
+        last_emit = time.monotonic()
+        for file_path in scan_paths(self.paths, registry.extensions()):
+            if self._cancelled.is_set():
+                return
+            batch.append(os.path.abspath(file_path))
+            if len(batch) >= self.batch_size or time.monotonic() - last_emit >= self.batch_interval:
+                self.files_found.emit(batch)
+                batch = []
+                last_emit = time.monotonic()
+        if batch:
+            self.files_found.emit(batch)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+def _file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0